@@ -1,52 +1,136 @@
 # ball_detector.py
+import logging
 import cv2
 import numpy as np
 from .config import Config
-def detect_balls_hough(frame, roi_polygon_points, roi_mask, next_ball_id_start=0):
+
+logger = logging.getLogger(__name__)
+
+class HoughBallDetector:
+    """
+    Detector Hough com a ROI pré-processada uma única vez: máscara e imagem booleana
+    "dentro da ROI", usada para validar os centros dos círculos com uma indexação NumPy
+    (em vez de um pointPolygonTest por círculo).
+    `roi_points` e `roi_mask` estão nas coordenadas do frame recebido (normalmente o
+    recorte da ROI); `offset` (x, y) leva os resultados de volta ao frame inteiro.
+    `config` fornece os parâmetros HOUGH_* (ex: uma instância com parâmetros de teste no hough_tuner).
+    """
+    def __init__(self, roi_polygon_points, roi_mask, offset=(0, 0), config=Config):
+        self.config = config
+        self.roi_points = roi_polygon_points
+        self.roi_mask = roi_mask
+        self.offset = offset
+        self.inside = roi_mask > 0 if roi_mask is not None else None # Borda incluída, como no fillPoly
+        # Margem em torno das regiões de movimento: a bola inteira mais o alcance do blur
+        self.region_margin = self.config.HOUGH_MAX_RADIUS + max(self.config.HOUGH_GRAY_BLUR_KERNEL) // 2
+
+    def _preprocess(self, frame, mask):
+        # Converte antes de mascarar: o bitwise_and roda em 1 canal em vez de 3
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        gray = cv2.bitwise_and(gray, gray, mask=mask)
+        return cv2.GaussianBlur(gray, self.config.HOUGH_GRAY_BLUR_KERNEL, self.config.HOUGH_GRAY_BLUR_SIGMA_X)
+
+    def _find_circles(self, frame, rect):
+        """Círculos (N, 3) int com centro dentro da ROI, em coordenadas do frame recebido."""
+        x, y, w, h = rect
+        blurred = self._preprocess(frame[y:y + h, x:x + w], self.roi_mask[y:y + h, x:x + w])
+        circles = cv2.HoughCircles(
+            blurred,
+            cv2.HOUGH_GRADIENT,
+            dp=self.config.HOUGH_DP,
+            minDist=self.config.HOUGH_MIN_DIST,
+            param1=self.config.HOUGH_PARAM1,
+            param2=self.config.HOUGH_PARAM2,
+            minRadius=self.config.HOUGH_MIN_RADIUS,
+            maxRadius=self.config.HOUGH_MAX_RADIUS
+        )
+        if circles is None:
+            return np.empty((0, 3), dtype=np.int64)
+
+        circles = np.around(circles[0]).astype(np.int64)
+        circles[:, 0] += x
+        circles[:, 1] += y
+        frame_h, frame_w = self.inside.shape
+        in_bounds = ((circles[:, 0] >= 0) & (circles[:, 0] < frame_w) &
+                     (circles[:, 1] >= 0) & (circles[:, 1] < frame_h))
+        circles = circles[in_bounds]
+        # Verifica de uma vez se os centros estão dentro da ROI poligonal
+        return circles[self.inside[circles[:, 1], circles[:, 0]]]
+
+    def _to_balls(self, circles, next_ball_id_start):
+        balls = []
+        current_id = next_ball_id_start
+        for center_x, center_y, radius in circles.tolist():
+            center_x += self.offset[0]
+            center_y += self.offset[1]
+            balls.append({
+                'id': current_id,
+                'center': (center_x, center_y),
+                'radius': radius,
+                'bbox_initial': (center_x - radius, center_y - radius, 2 * radius, 2 * radius)
+            })
+            current_id += 1
+        return balls, current_id
+
+    def detect(self, frame, rect=None, next_ball_id_start=0):
+        """
+        Detecta bolas no frame inteiro ou só na janela `rect` (x, y, w, h) do frame recebido.
+        Retorna (lista de bolas em coordenadas do frame inteiro, próximo ID).
+        """
+        if self.inside is None or self.roi_points is None:
+            logger.error("ROI mask ou pontos não fornecidos.")
+            return [], next_ball_id_start
+        if rect is None:
+            rect = (0, 0, frame.shape[1], frame.shape[0])
+        circles = self._find_circles(frame, rect)
+        if len(circles) == 0:
+            logger.debug("Nenhum círculo encontrado por HoughCircles.")
+        balls, next_id = self._to_balls(circles, next_ball_id_start)
+        logger.debug("Bolas detectadas e validadas na ROI: %d", len(balls))
+        return balls, next_id
+
+    def detect_in_regions(self, frame, regions, next_ball_id_start=0):
+        """
+        Roda o Hough só nas regiões de movimento `regions` [(x, y, w, h), ...], ampliadas por
+        `region_margin` e unidas quando se sobrepõem. Mesma saída de `detect`.
+        """
+        if self.inside is None or self.roi_points is None:
+            logger.error("ROI mask ou pontos não fornecidos.")
+            return [], next_ball_id_start
+        windows = _merge_rects(regions, self.region_margin, frame.shape)
+        found = [self._find_circles(frame, window) for window in windows]
+        circles = np.concatenate(found) if found else np.empty((0, 3), dtype=np.int64)
+        balls, next_id = self._to_balls(circles, next_ball_id_start)
+        logger.debug("Bolas detectadas em %d região(ões) de movimento: %d", len(windows), len(balls))
+        return balls, next_id
+
+def _merge_rects(rects, margin, frame_shape):
+    """Amplia os retângulos por `margin`, recorta ao frame e une os que se sobrepõem."""
+    frame_h, frame_w = frame_shape[:2]
+    boxes = [[max(0, x - margin), max(0, y - margin), min(frame_w, x + w + margin), min(frame_h, y + h + margin)]
+             for x, y, w, h in rects]
+    merged = True
+    while merged and len(boxes) > 1:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in boxes if x1 > x0 and y1 > y0]
+
+def detect_balls_hough(frame, roi_polygon_points, roi_mask, next_ball_id_start=0, offset=(0, 0), config=Config):
     """
     Detecta bolas usando HoughCircles dentro da ROI especificada.
     Retorna uma lista de dicionários, cada um representando uma bola detectada.
+    Se `frame` for um recorte (ver ROIHandler.get_crop), os pontos e a máscara devem estar
+    nas coordenadas do recorte; `offset` (x, y) leva os resultados de volta ao frame inteiro.
+    Para chamadas repetidas com a mesma ROI, prefira um HoughBallDetector.
     """
-    if roi_mask is None or roi_polygon_points is None:
-        print("ERRO [Detector]: ROI mask ou pontos não fornecidos.")
-        return [], next_ball_id_start
-
-    frame_in_roi = cv2.bitwise_and(frame, frame, mask=roi_mask)
-    gray = cv2.cvtColor(frame_in_roi, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.GaussianBlur(gray, Config.HOUGH_GRAY_BLUR_KERNEL, Config.HOUGH_GRAY_BLUR_SIGMA_X)
-
-    circles = cv2.HoughCircles(
-        blurred,
-        cv2.HOUGH_GRADIENT,
-        dp=Config.HOUGH_DP,
-        minDist=Config.HOUGH_MIN_DIST,
-        param1=Config.HOUGH_PARAM1,
-        param2=Config.HOUGH_PARAM2,
-        minRadius=Config.HOUGH_MIN_RADIUS,
-        maxRadius=Config.HOUGH_MAX_RADIUS
-    )
-
-    detected_balls_info = []
-    current_id = next_ball_id_start
-
-    if circles is not None:
-        circles = np.uint16(np.around(circles))
-        roi_polygon_np = np.array(roi_polygon_points, dtype=np.int32)
-        for c_data in circles[0, :]:
-            center_x, center_y, radius = int(c_data[0]), int(c_data[1]), int(c_data[2])
-
-            # Verifica se o centro do círculo está dentro da ROI poligonal
-            if cv2.pointPolygonTest(roi_polygon_np, (center_x, center_y), False) >= 0:
-                ball_info = {
-                    'id': current_id,
-                    'center': (center_x, center_y),
-                    'radius': radius,
-                    'bbox_initial': (center_x - radius, center_y - radius, 2 * radius, 2 * radius)
-                }
-                detected_balls_info.append(ball_info)
-                current_id += 1
-    else:
-        print("[Detector] Nenhum círculo encontrado por HoughCircles.")
-
-    print(f"[Detector] Bolas detectadas e validadas na ROI: {len(detected_balls_info)}")
-    return detected_balls_info, current_id
\ No newline at end of file
+    detector = HoughBallDetector(roi_polygon_points, roi_mask, offset, config=config)
+    return detector.detect(frame, next_ball_id_start=next_ball_id_start)
@@ -0,0 +1,200 @@
+# batch_runner.py
+import argparse
+import glob
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+from .config import Config, add_profile_arguments, profile_from_args, load_profile
+from .pipeline import run_headless
+from .frame_cache import FrameCache
+from .instrumentation import LOG_FORMAT
+
+def load_manifest(manifest_path):
+    """
+    Lê a lista de vídeos a processar. Formatos aceitos:
+      - JSON: lista de caminhos ou de objetos {"video": ..., "roi": ..., "profile": ...}
+      - texto: uma linha por vídeo, "video", "video,roi" ou "video,roi,perfil" (linhas com # são ignoradas)
+    Retorna uma lista de (video, roi_ou_None, perfil_ou_None). Caminhos relativos são relativos ao manifesto.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    def resolve(path):
+        return path if path is None or os.path.isabs(path) else os.path.join(base_dir, path)
+
+    entries = []
+    if manifest_path.lower().endswith('.json'):
+        with open(manifest_path, 'r') as f:
+            for item in json.load(f):
+                if isinstance(item, str):
+                    entries.append((resolve(item), None, None))
+                else:
+                    entries.append((resolve(item['video']), resolve(item.get('roi')), resolve(item.get('profile'))))
+        return entries
+
+    with open(manifest_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = [p.strip() for p in line.split(',')]
+            roi = parts[1] if len(parts) > 1 and parts[1] else None
+            profile = parts[2] if len(parts) > 2 and parts[2] else None
+            entries.append((resolve(parts[0]), resolve(roi), resolve(profile)))
+    return entries
+
+def dedupe_entries(entries):
+    """
+    Remove vídeos repetidos (mesmo caminho absoluto), mantendo a ordem da primeira ocorrência.
+    Uma entrada com ROI ou perfil próprios substitui uma anterior que não tinha nenhum
+    (ex: vídeo casado por um glob e também listado no manifesto).
+    """
+    unique = {}
+    for entry in entries:
+        key = os.path.abspath(entry[0])
+        previous = unique.get(key)
+        if previous is None:
+            unique[key] = entry
+            continue
+        if previous[1:] == (None, None) and entry[1:] != (None, None):
+            unique[key] = entry
+        print(f"AVISO: '{entry[0]}' repetido; processado uma vez só.")
+    return list(unique.values())
+
+def build_jobs(entries, default_roi, output_dir, output_format, config=Config):
+    """
+    Monta um job por vídeo com um arquivo de saída próprio (sem colisão de nomes).
+    Vídeos com perfil próprio no manifesto recebem esse perfil aplicado sobre `config`.
+    """
+    jobs = []
+    used_names = set()
+    profiles = {}
+    for video_path, roi_file, profile_path in entries:
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        name = stem
+        suffix = 1
+        while name in used_names:
+            name = f"{stem}_{suffix}"
+            suffix += 1
+        used_names.add(name)
+        job = {
+            'video': video_path,
+            'roi': roi_file or default_roi,
+            'output': os.path.join(output_dir, f"{name}_tracks.{output_format}"),
+        }
+        if profile_path is not None:
+            if profile_path not in profiles:
+                profiles[profile_path] = load_profile(profile_path, base=config)
+            job['config'] = profiles[profile_path]
+            job['profile'] = profile_path
+        jobs.append(job)
+    return jobs
+
+def _init_worker(log_level=logging.WARNING):
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+    # Cada processo já ocupa um núcleo; as threads internas do OpenCV só competiriam entre si
+    cv2.setNumThreads(1)
+
+def _run_job(job, tracker_type, prefetch, config, frame_cache=None):
+    start = time.perf_counter()
+    try:
+        summary = run_headless(job['video'], job['roi'], job['output'],
+                               tracker_type=tracker_type, prefetch=prefetch, config=config, frame_cache=frame_cache)
+    except Exception as e:
+        summary = None
+        error = f"{type(e).__name__}: {e}"
+    else:
+        error = None if summary is not None else "falha ao abrir vídeo ou ROI"
+    if summary is None:
+        summary = {'video': job['video'], 'frames': 0, 'fps': 0.0, 'tracks': 0,
+                   'seconds': time.perf_counter() - start, 'output': None}
+    summary['roi'] = job['roi']
+    summary['profile'] = job.get('profile')
+    summary['error'] = error
+    return summary
+
+def run_batch(jobs, workers=None, tracker_type=None, prefetch=0, log_level=logging.WARNING, config=Config,
+              frame_cache=None):
+    """
+    Processa os jobs num pool de processos. Retorna os resumos na ordem dos jobs.
+    Um job pode trazer o próprio perfil em job['config'] (senão usa `config`).
+    Com `frame_cache` (FrameCache), execuções repetidas leem os frames do cache em disco.
+    """
+    workers = workers or os.cpu_count() or 1
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_level,)) as pool:
+        futures = {pool.submit(_run_job, job, tracker_type, prefetch, job.get('config', config), frame_cache): i
+                   for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            summary = future.result()
+            results[futures[future]] = summary
+            status = "ERRO: " + summary['error'] if summary['error'] else f"{summary['fps']:.1f} FPS"
+            print(f"[Batch] {os.path.basename(summary['video'])}: {summary['frames']} frames, "
+                  f"{summary['tracks']} tracks, {status}")
+    return results
+
+def summarize(results, wall_seconds):
+    total_frames = sum(r['frames'] for r in results)
+    return {
+        'videos': results,
+        'total_videos': len(results),
+        'failed_videos': sum(1 for r in results if r['error']),
+        'total_frames': total_frames,
+        'total_tracks': sum(r['tracks'] for r in results),
+        'wall_seconds': wall_seconds,
+        'aggregate_fps': total_frames / wall_seconds if wall_seconds > 0 else 0.0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Processa vários vídeos em paralelo (modo headless).")
+    parser.add_argument("videos", nargs='*', help="Caminhos ou padrões glob dos vídeos (ex: 'Old_videos/*.mov').")
+    parser.add_argument("--manifest", help="Arquivo JSON ou texto com os vídeos e ROIs opcionais.")
+    parser.add_argument("--roi", default=None, help="ROI usada quando o vídeo não indica uma (padrão: a do perfil).")
+    parser.add_argument("--output-dir", default="batch_results", help="Pasta para os arquivos de trajetória.")
+    parser.add_argument("--format", default="npz", choices=["csv", "npz", "parquet"], help="Formato das trajetórias.")
+    parser.add_argument("--workers", type=int, default=None, help="Número de processos (padrão: núcleos da máquina).")
+    parser.add_argument("--prefetch", type=int, default=0, help="Fila de decodificação por vídeo (0 = desativado).")
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Nível de log dos processos.")
+    parser.add_argument("--summary", default=None, help="Arquivo JSON do resumo (padrão: <output-dir>/summary.json).")
+    parser.add_argument("--frame-cache", default=None,
+                        help="Pasta do cache de frames pré-processados (reexecuções não decodificam os vídeos).")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    config = profile_from_args(args)
+    logging.basicConfig(level=args.log_level, format=LOG_FORMAT)
+
+    entries = []
+    for pattern in args.videos:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            print(f"AVISO: Nenhum vídeo corresponde a '{pattern}'.")
+        entries.extend((path, None, None) for path in matches)
+    if args.manifest:
+        entries.extend(load_manifest(args.manifest))
+    entries = dedupe_entries(entries)
+    if not entries:
+        print("Nenhum vídeo para processar.")
+        return None
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = build_jobs(entries, args.roi or config.ROI_CONFIG_FILE, args.output_dir, args.format, config=config)
+    print(f"[Batch] {len(jobs)} vídeo(s) com {args.workers or os.cpu_count()} processo(s).")
+
+    start = time.perf_counter()
+    frame_cache = FrameCache(args.frame_cache, config=config) if args.frame_cache else None
+    results = run_batch(jobs, workers=args.workers, prefetch=args.prefetch, log_level=args.log_level, config=config,
+                        frame_cache=frame_cache)
+    summary = summarize(results, time.perf_counter() - start)
+
+    summary_path = args.summary or os.path.join(args.output_dir, "summary.json")
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"[Batch] {summary['total_frames']} frames em {summary['wall_seconds']:.1f}s "
+          f"({summary['aggregate_fps']:.1f} FPS agregados). Resumo em '{summary_path}'.")
+    return summary
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,153 @@
 # config.py
+import dataclasses
+import json
+from dataclasses import dataclass
+from typing import Tuple
 
 # --- Configurações de Vídeo e ROI ---
-class Config:
-    def __init__(
-        self,
-        HOUGH_GRAY_BLUR_KERNEL=(15, 15),
-        HOUGH_GRAY_BLUR_SIGMA_X=0.7,
-        HOUGH_DP=2.9,
-        HOUGH_MIN_DIST=30,
-        HOUGH_PARAM1=25,
-        HOUGH_PARAM2=40,
-        HOUGH_MIN_RADIUS=15,
-        HOUGH_MAX_RADIUS=20
-    ):
-        self.VIDEO_PATH = 'videos_particles/video_partículas/Old_videos/IMG_2793.mov' # Coloque o vídeo na pasta 'videos/'
-        self.ROI_CONFIG_FILE = "roi_config.json"
-        self.ROTATE_VIDEO_CLOCKWISE = True # Defina como True se o vídeo precisar ser rotacionado 90 graus no sentido horário
-
-        self.MIN_MOTION_AREA = 350         # Área mínima em pixels para considerar movimento válido. Ajuste conforme necessário.
-
-        # --- Configurações de Detecção de Bolas (HoughCircles) ---
-        self.HOUGH_GRAY_BLUR_KERNEL = HOUGH_GRAY_BLUR_KERNEL
-        self.HOUGH_GRAY_BLUR_SIGMA_X = HOUGH_GRAY_BLUR_SIGMA_X
-        self.HOUGH_DP = HOUGH_DP            # Relação inversa da resolução do acumulador.
-        self.HOUGH_MIN_DIST = HOUGH_MIN_DIST           # Distância mínima entre centros de círculos detectados.
-        self.HOUGH_PARAM1 = HOUGH_PARAM1             # Limite superior para Canny.
-        self.HOUGH_PARAM2 = HOUGH_PARAM2             # Limiar do acumulador para centros de círculos.
-        self.HOUGH_MIN_RADIUS = HOUGH_MIN_RADIUS         # Raio mínimo do círculo.
-        self.HOUGH_MAX_RADIUS = HOUGH_MAX_RADIUS         # Raio máximo do círculo.
-
-        # --- Configurações de Tracking ---
-        self.TRACKER_TYPE = "CSRT"         # Opções: "CSRT", "KCF", "MOSSE" (MOSSE é do cv2.legacy)
-
-        # --- Configurações de Visualização ---
-        self.ROI_COLOR = (255, 0, 0)       # Azul para ROI
-        self.BALL_DETECT_COLOR = (0, 255, 0) # Verde para detecção inicial
-        self.BALL_DETECT_CENTER_COLOR = (0, 0, 255) # Vermelho para centro da detecção
-        self.TRAJECTORY_LINE_THICKNESS = 2
-        self.BOUNDING_BOX_THICKNESS = 2
-        self.HUD_TEXT_COLOR = (0, 0, 255)  # Vermelho para informações na tela (FPS, etc.)
-        self.WINDOW_MAX_HEIGHT = 720       # Altura máxima para as janelas de exibição
-    # --- Configurações de Vídeo e ROI ---
-Config = Config()
-#Config = Config((15, 15),0.7,2.9,1000,25,40,5,40) # Exemplo de como criar uma instância com parâmetros personalizados
\ No newline at end of file
+@dataclass(frozen=True)
+class ConfigProfile:
+    """
+    Perfil de configuração imutável. `Config` (abaixo) é o perfil padrão; perfis
+    alternativos vêm de arquivos JSON/TOML (load_profile), de flags --set CAMPO=VALOR
+    ou de Config.replace(...), e são passados explicitamente aos componentes
+    (ROIHandler, HoughBallDetector, TrackerManager, MotionDetector, TrackingPipeline).
+    Os campos HOUGH_* vêm primeiro para manter a ordem posicional do construtor antigo.
+    """
+    # --- Configurações de Detecção de Bolas (HoughCircles) ---
+    HOUGH_GRAY_BLUR_KERNEL: Tuple[int, int] = (15, 15)
+    HOUGH_GRAY_BLUR_SIGMA_X: float = 0.7
+    HOUGH_DP: float = 2.9              # Relação inversa da resolução do acumulador.
+    HOUGH_MIN_DIST: int = 30           # Distância mínima entre centros de círculos detectados.
+    HOUGH_PARAM1: int = 25             # Limite superior para Canny.
+    HOUGH_PARAM2: int = 40             # Limiar do acumulador para centros de círculos.
+    HOUGH_MIN_RADIUS: int = 15         # Raio mínimo do círculo.
+    HOUGH_MAX_RADIUS: int = 20         # Raio máximo do círculo.
+    HOUGH_MOTION_REGIONS_ONLY: bool = True # Ao sair da espera, busca só nas regiões com movimento (a re-detecção periódica cobre o resto)
+
+    VIDEO_PATH: str = 'videos_particles/video_partículas/Old_videos/IMG_2793.mov' # Coloque o vídeo na pasta 'videos/'
+    ROI_CONFIG_FILE: str = "roi_config.json"
+    ROTATE_VIDEO_CLOCKWISE: bool = True # Defina como True se o vídeo precisar ser rotacionado 90 graus no sentido horário
+
+    MIN_MOTION_AREA: int = 350         # Área mínima em pixels para considerar movimento válido. Ajuste conforme necessário.
+    # Detecção de movimento barata enquanto aguarda (o Hough continua em resolução cheia)
+    MOTION_DOWNSCALE: float = 0.5      # Fator de redução do frame para o MOG2 (1.0 = resolução cheia)
+    MOTION_GRAYSCALE: bool = True      # MOG2 em tons de cinza em vez de BGR
+    MOTION_FRAME_STRIDE: int = 1       # Analisa 1 a cada N frames enquanto aguarda movimento
+    # Cache em disco dos frames pré-processados (--frame-cache PASTA)
+    FRAME_CACHE_MAX_GB: float = 20.0   # Tamanho máximo da pasta; as entradas usadas há mais tempo saem primeiro
+    FRAME_CACHE_GRAYSCALE: bool = False # Guarda os frames em tons de cinza (3x menor; use com o tracker KALMAN)
+
+    # --- Configurações de Tracking ---
+    TRACKER_TYPE: str = "CSRT"         # Opções: "CSRT", "KCF", "MOSSE" (MOSSE é do cv2.legacy), "KALMAN"
+    # Recuperação de tracks perdidos (CSRT/KCF/MOSSE)
+    REDETECT_INTERVAL: int = 30        # A cada N frames roda o Hough no recorte inteiro para achar bolas novas
+    MAX_LOST_FRAMES: int = 30          # Frames que um track perdido continua recuperável (mantém o ID)
+    REDETECT_WINDOW_MARGIN: int = 20   # Margem (px) da janela de busca em torno da posição prevista
+    # Atualização paralela dos trackers OpenCV (o update libera o GIL)
+    TRACKER_UPDATE_WORKERS: int = 1    # Threads para tracker.update (1 = sequencial, 0 = núcleos da máquina)
+    TRACKER_PARALLEL_MIN_TRACKS: int = 4 # Com menos tracks ativos que isso, atualiza em sequência (evita overhead)
+    # "KALMAN": associação de detecções Hough a cada frame + filtro de Kalman (velocidade constante)
+    KALMAN_MAX_ASSOCIATION_DIST: float = 40 # Distância máxima (px) entre previsão e detecção para associar
+    KALMAN_MAX_MISSES: int = 5         # Frames seguidos sem detecção antes de considerar o track perdido
+    KALMAN_PROCESS_NOISE: float = 1.0  # Variância do ruído de processo (aceleração não modelada)
+    KALMAN_MEASUREMENT_NOISE: float = 4.0 # Variância (px²) da posição medida pelo Hough
+
+    # --- Análise cinemática online (--kinematics) ---
+    KINEMATICS_WINDOW: int = 9         # Pontos por track no filtro de Savitzky–Golay
+    KINEMATICS_POLYORDER: int = 2      # Ordem do polinômio ajustado (2 = estima a aceleração)
+    KINEMATICS_STATS_WINDOW: int = 30  # Frames por janela de estatísticas agregadas
+
+    # --- Configurações de Processamento Paralelo por Trechos (segment_runner) ---
+    SEGMENT_OVERLAP_FRAMES: int = 60   # Frames extras antes de cada trecho (aquecimento do MOG2 + costura)
+    STITCH_MAX_DISTANCE: float = 25    # Distância média máxima (px) para unir tracks de trechos vizinhos
+    STITCH_MAX_GAP_FRAMES: int = 15    # Intervalo máximo (frames) entre o fim de um track e o início do outro
+
+    # --- Configurações de Visualização ---
+    ROI_COLOR: Tuple[int, int, int] = (255, 0, 0)       # Azul para ROI
+    BALL_DETECT_COLOR: Tuple[int, int, int] = (0, 255, 0) # Verde para detecção inicial
+    BALL_DETECT_CENTER_COLOR: Tuple[int, int, int] = (0, 0, 255) # Vermelho para centro da detecção
+    TRAJECTORY_LINE_THICKNESS: int = 2
+    BOUNDING_BOX_THICKNESS: int = 2
+    HUD_TEXT_COLOR: Tuple[int, int, int] = (0, 0, 255)  # Vermelho para informações na tela (FPS, etc.)
+    WINDOW_MAX_HEIGHT: int = 720       # Altura máxima para as janelas de exibição
+
+    def __post_init__(self):
+        # Listas (JSON/TOML) viram tuplas e inteiros viram float onde o campo é float
+        for f in dataclasses.fields(self):
+            object.__setattr__(self, f.name, _coerce(f, getattr(self, f.name)))
+
+    def replace(self, **changes):
+        """Cópia do perfil com os campos alterados."""
+        return dataclasses.replace(self, **changes)
+
+    def to_dict(self):
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def field_names(cls):
+        return [f.name for f in dataclasses.fields(cls)]
+
+    def updated(self, data):
+        """
+        Aplica um dicionário (de arquivo ou CLI) sobre este perfil. Chaves começando com
+        "_" (metadados, ex: "_tuning" do hough_tuner) são ignoradas; chaves desconhecidas são erro.
+        """
+        changes = {k: v for k, v in data.items() if not k.startswith('_')}
+        unknown = set(changes) - set(self.field_names())
+        if unknown:
+            raise ValueError(f"Campos de configuração desconhecidos: {', '.join(sorted(unknown))}")
+        return self.replace(**changes)
+
+def _coerce(field, value):
+    if field.type == float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if str(field.type).startswith('typing.Tuple') and isinstance(value, list):
+        return tuple(value)
+    if field.type in (int, float, bool, str) and not isinstance(value, field.type):
+        raise TypeError(f"{field.name} deve ser {field.type.__name__}, não {type(value).__name__} ({value!r})")
+    return value
+
+def load_profile(path, base=None):
+    """Lê um perfil de um arquivo .json ou .toml (campos ausentes vêm de `base`, padrão Config)."""
+    base = base or Config
+    if path.lower().endswith('.toml'):
+        import tomllib # Python 3.11+
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    return base.updated(data)
+
+def save_profile(profile, path):
+    with open(path, 'w') as f:
+        json.dump(profile.to_dict(), f, indent=2, ensure_ascii=False)
+
+def parse_overrides(items):
+    """['HOUGH_DP=2.5', 'ROI_COLOR=[0,255,0]', 'TRACKER_TYPE=KCF'] -> dict (valores JSON, senão texto)."""
+    overrides = {}
+    for item in items or []:
+        key, sep, raw = item.partition('=')
+        if not sep:
+            raise ValueError(f"Use CAMPO=VALOR em --set (recebido '{item}')")
+        try:
+            overrides[key.strip()] = json.loads(raw)
+        except json.JSONDecodeError:
+            overrides[key.strip()] = raw
+    return overrides
+
+def add_profile_arguments(parser):
+    """Adiciona --profile e --set aos argumentos de linha de comando."""
+    parser.add_argument("--profile", default=None, help="Perfil de configuração (.json ou .toml).")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="CAMPO=VALOR",
+                        help="Sobrescreve um campo do perfil (ex: --set HOUGH_PARAM2=35). Pode repetir.")
+
+def profile_from_args(args, base=None):
+    """Perfil final: padrão <- arquivo --profile <- flags --set."""
+    profile = load_profile(args.profile, base) if args.profile else (base or Config)
+    return profile.updated(parse_overrides(args.overrides))
+
+# Perfil padrão (valores acima). Para valores personalizados, prefira um perfil em arquivo.
+Config = ConfigProfile()
+#Config = ConfigProfile((15, 15),0.7,2.9,1000,25,40,5,40) # Exemplo de como criar uma instância com parâmetros personalizados
@@ -0,0 +1,55 @@
+# evaluation.py
+import numpy as np
+
+def match_centers(predicted, ground_truth, max_distance):
+    """
+    Associação um-para-um gulosa (menor distância primeiro) entre centros previstos e
+    reais, aceitando pares até `max_distance` px.
+    Retorna (índices previstos, índices reais, distâncias) dos pares associados.
+    """
+    predicted = np.asarray(predicted, dtype=np.float64).reshape(-1, 2)
+    ground_truth = np.asarray(ground_truth, dtype=np.float64).reshape(-1, 2)
+    if len(predicted) == 0 or len(ground_truth) == 0:
+        empty = np.zeros(0, dtype=int)
+        return empty, empty, np.zeros(0)
+
+    dist = np.linalg.norm(predicted[:, None, :] - ground_truth[None, :, :], axis=2)
+    pred_idx, gt_idx = [], []
+    used_pred, used_gt = set(), set()
+    for flat in np.argsort(dist, axis=None):
+        i, j = np.unravel_index(flat, dist.shape)
+        if dist[i, j] > max_distance:
+            break
+        if i in used_pred or j in used_gt:
+            continue
+        pred_idx.append(i)
+        gt_idx.append(j)
+        used_pred.add(i)
+        used_gt.add(j)
+    pred_idx = np.array(pred_idx, dtype=int)
+    gt_idx = np.array(gt_idx, dtype=int)
+    return pred_idx, gt_idx, dist[pred_idx, gt_idx]
+
+def detection_scores(predicted, ground_truth, max_distance):
+    """Contagens e métricas (precisão, revocação, F1, erro médio do centro) de um frame."""
+    pred_idx, _, distances = match_centers(predicted, ground_truth, max_distance)
+    tp = len(pred_idx)
+    fp = len(np.asarray(predicted).reshape(-1, 2)) - tp
+    fn = len(np.asarray(ground_truth).reshape(-1, 2)) - tp
+    return summarize_scores(tp, fp, fn, float(distances.sum()))
+
+def summarize_scores(tp, fp, fn, error_sum=0.0):
+    """Métricas a partir de contagens acumuladas (permite somar vários frames antes)."""
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        'tp': tp,
+        'fp': fp,
+        'fn': fn,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'mean_center_error': error_sum / tp if tp else None,
+        'error_sum': error_sum,
+    }
@@ -0,0 +1,180 @@
+# frame_cache.py
+import hashlib
+import json
+import logging
+import os
+import cv2
+import numpy as np
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+_DATA_SUFFIX = '.frames'
+_META_SUFFIX = '.json'
+
+def cache_key(video_path, roi_points, config=Config):
+    """
+    Chave da entrada: vídeo (caminho, tamanho, mtime), rotação, ROI e tons de cinza.
+    Vídeo regravado ou ROI alterada geram outra chave; a entrada antiga sai pelo limite de tamanho.
+    """
+    stat = os.stat(video_path)
+    identity = {
+        'video': os.path.abspath(video_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'rotate': config.ROTATE_VIDEO_CLOCKWISE,
+        'roi': [[int(x), int(y)] for x, y in roi_points],
+        'grayscale': config.FRAME_CACHE_GRAYSCALE,
+    }
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode()).hexdigest()[:24]
+
+class CachedFrames:
+    """
+    Frames de uma entrada do cache mapeados do disco (somente leitura). `frames[i]` é uma
+    view sem cópia; processos diferentes abrindo a mesma entrada compartilham o page cache.
+    """
+    def __init__(self, data_path, meta):
+        self.meta = meta
+        self.frame_shape = tuple(meta['frame_shape']) # Frame inteiro pré-processado (para get_crop)
+        self.crop_rect = tuple(meta['crop_rect'])
+        self.fps = meta['fps']
+        self.frames = np.memmap(data_path, dtype=np.uint8, mode='r', shape=tuple(meta['shape']))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def iter_range(self, start=0, end=None):
+        """Frames [start, end) sem decodificação nem seek."""
+        for index in range(start, len(self.frames) if end is None else min(end, len(self.frames))):
+            yield self.frames[index]
+
+class FrameCacheWriter:
+    """
+    Grava uma entrada enquanto os frames passam por `tee` (sem uma passada extra de
+    decodificação). Só vira entrada válida em commit(); abort() descarta o arquivo parcial.
+    Uma entrada que não cabe em `max_bytes` do cache (pela estimativa `expected_frames` ou
+    pelo que já foi gravado) é descartada no ato: os frames continuam passando, sem gravação.
+    """
+    def __init__(self, cache, key, frame_shape, crop_rect, fps, grayscale, expected_frames=None):
+        self.cache = cache
+        self.key = key
+        self.meta = {'frame_shape': list(frame_shape[:2]), 'crop_rect': list(crop_rect), 'fps': fps,
+                     'grayscale': grayscale}
+        self.grayscale = grayscale
+        self.expected_frames = expected_frames if expected_frames and expected_frames > 0 else None
+        self.too_large = False # True: a entrada passaria do limite e foi descartada
+        self._tmp_path = f"{cache.data_path(key)}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._count = 0
+        self._bytes = 0
+        self._frame_shape = None
+
+    def _discard(self, projected_bytes):
+        self.too_large = True
+        self.abort()
+        logger.warning("Cache de frames: entrada de %.1f GB não cabe no limite de %.1f GB; não será gravada.",
+                       projected_bytes / 1024 ** 3, self.cache.max_bytes / 1024 ** 3)
+
+    def tee(self, frames):
+        """Grava cada frame e o repassa (já em tons de cinza, se for o caso, como numa leitura do cache)."""
+        for frame in frames:
+            if self.grayscale and frame.ndim == 3:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if not self.too_large:
+                self._write(frame)
+            yield frame
+
+    def _write(self, frame):
+        data = np.ascontiguousarray(frame, dtype=np.uint8)
+        if self._frame_shape is None:
+            self._frame_shape = frame.shape
+            if self.expected_frames and data.nbytes * self.expected_frames > self.cache.max_bytes:
+                self._discard(data.nbytes * self.expected_frames) # Pela contagem estimada: nem começa
+                return
+        if self._bytes + data.nbytes > self.cache.max_bytes:
+            self._discard(self._bytes + data.nbytes)
+            return
+        self._file.write(data.data)
+        self._bytes += data.nbytes
+        self._count += 1
+
+    def commit(self):
+        """Publica a entrada. Retorna False se nada foi gravado (vídeo vazio ou entrada grande demais)."""
+        if self.too_large:
+            return False
+        self._file.close()
+        if self._count == 0:
+            os.remove(self._tmp_path)
+            return False
+        self.meta['shape'] = [self._count, *self._frame_shape]
+        os.replace(self._tmp_path, self.cache.data_path(self.key))
+        # O .json é escrito por último: sua presença indica uma entrada completa
+        with open(self.cache.meta_path(self.key), 'w') as f:
+            json.dump(self.meta, f)
+        logger.info("Cache de frames: %d frame(s) gravado(s) em '%s'.", self._count, self.cache.data_path(self.key))
+        self.cache.evict(keep=self.key) # A entrada nova cabe em max_bytes; só as outras podem sair
+        return True
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+class FrameCache:
+    """
+    Cache em disco dos frames pré-processados (rotacionados, recortados na ROI e,
+    opcionalmente, em tons de cinza) como arrays brutos uint8 lidos por memmap.
+    Entradas usadas há mais tempo são removidas quando o total passa de `max_bytes`.
+    """
+    def __init__(self, cache_dir, max_bytes=None, config=Config):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes if max_bytes is not None else int(config.FRAME_CACHE_MAX_GB * 1024 ** 3)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def data_path(self, key):
+        return os.path.join(self.cache_dir, key + _DATA_SUFFIX)
+
+    def meta_path(self, key):
+        return os.path.join(self.cache_dir, key + _META_SUFFIX)
+
+    def open(self, key):
+        """CachedFrames da entrada, ou None se não existir."""
+        meta_path = self.meta_path(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            cached = CachedFrames(self.data_path(key), meta)
+        except (OSError, ValueError) as e:
+            if os.path.exists(meta_path):
+                logger.warning("Entrada inválida no cache de frames (%s); será recriada.", e)
+            return None
+        os.utime(meta_path) # Marca o uso para a remoção por idade
+        return cached
+
+    def writer(self, key, frame_shape, crop_rect, fps, grayscale=False, expected_frames=None):
+        return FrameCacheWriter(self, key, frame_shape, crop_rect, fps, grayscale, expected_frames)
+
+    def evict(self, keep=None):
+        """Remove as entradas menos usadas até o total caber em max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(_META_SUFFIX):
+                continue
+            key = name[:-len(_META_SUFFIX)]
+            try:
+                entries.append((os.path.getmtime(self.meta_path(key)), os.path.getsize(self.data_path(key)), key))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in (self.meta_path(key), self.data_path(key)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            logger.info("Cache de frames: entrada '%s' removida (limite de tamanho).", key)
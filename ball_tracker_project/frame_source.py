@@ -0,0 +1,275 @@
+# frame_source.py
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+from .instrumentation import NULL_PROFILER
+
+_END_OF_STREAM = object()
+
+class FramePrefetcher:
+    """
+    Decodifica, pré-processa (rotação) e opcionalmente recorta os frames numa thread
+    separada, entregando-os por uma fila limitada. A fila cheia bloqueia o produtor
+    (backpressure), então a memória usada fica limitada a `queue_size` frames.
+
+    As estatísticas indicam onde está o gargalo:
+      - consumer_wait_s alto  -> o tracking espera frames (limitado pela decodificação)
+      - producer_stall_s alto -> a decodificação espera espaço na fila (limitado pelo tracking)
+    """
+    def __init__(self, cap, preprocess=None, crop_rect=None, queue_size=8, profiler=NULL_PROFILER):
+        self.cap = cap
+        self.profiler = profiler
+        self.preprocess = preprocess
+        self.crop_rect = crop_rect # (x, y, w, h) ou None para o frame inteiro
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.frames_decoded = 0
+        self.frames_consumed = 0
+        self.producer_stall_s = 0.0
+        self.consumer_wait_s = 0.0
+        self._queue_depth_sum = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="FramePrefetcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def _put(self, item):
+        """Coloca na fila respeitando o pedido de parada. Retorna False se foi interrompido."""
+        t0 = time.perf_counter()
+        while not self._stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                self.producer_stall_s += time.perf_counter() - t0
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            profiler = self.profiler
+            while not self._stop_event.is_set():
+                with profiler.stage('decode'):
+                    ret, frame = self.cap.read()
+                if not ret:
+                    break
+                with profiler.stage('preprocess'):
+                    if self.preprocess is not None:
+                        frame = self.preprocess(frame)
+                    if self.crop_rect is not None:
+                        x, y, w, h = self.crop_rect
+                        frame = np.ascontiguousarray(frame[y:y + h, x:x + w])
+                self.frames_decoded += 1
+                if not self._put(frame):
+                    return
+            self._put(_END_OF_STREAM)
+        except Exception as e: # Repassa o erro para a thread consumidora
+            self._put(e)
+
+    def __iter__(self):
+        if self._thread is None:
+            self.start()
+        while True:
+            t0 = time.perf_counter()
+            self._queue_depth_sum += self.queue.qsize()
+            item = self.queue.get()
+            self.consumer_wait_s += time.perf_counter() - t0
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            self.frames_consumed += 1
+            yield item
+
+    def stop(self):
+        self._stop_event.set()
+        # Esvazia a fila para destravar o produtor caso esteja bloqueado no put
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        mean_depth = self._queue_depth_sum / self.frames_consumed if self.frames_consumed else 0.0
+        bound = "decodificação" if self.consumer_wait_s > self.producer_stall_s else "tracking"
+        return {
+            'frames_decoded': self.frames_decoded,
+            'frames_consumed': self.frames_consumed,
+            'queue_size': self.queue.maxsize,
+            'mean_queue_depth': mean_depth,
+            'producer_stall_s': self.producer_stall_s,
+            'consumer_wait_s': self.consumer_wait_s,
+            'bound_by': bound,
+        }
+
+def iter_frames(cap, preprocess=None, crop_rect=None, profiler=NULL_PROFILER):
+    """Versão síncrona da FramePrefetcher: decodifica na própria thread de quem itera."""
+    while True:
+        with profiler.stage('decode'):
+            ret, frame = cap.read()
+        if not ret:
+            return
+        with profiler.stage('preprocess'):
+            if preprocess is not None:
+                frame = preprocess(frame)
+            if crop_rect is not None:
+                x, y, w, h = crop_rect
+                frame = frame[y:y + h, x:x + w]
+        yield frame
+
+DROP_LATEST = "latest"   # Só o frame mais recente espera pelo tracking; os anteriores são descartados
+DROP_EVERY_K = "every-k" # Atrasado, o tracking recebe só 1 a cada k frames capturados
+DROP_NONE = "none"       # Nenhum descarte: a captura espera o tracking (latência cresce)
+DROP_POLICIES = [DROP_LATEST, DROP_EVERY_K, DROP_NONE]
+
+def open_capture(source):
+    """cv2.VideoCapture de um arquivo, URL (RTSP/HTTP/pipe do GStreamer) ou índice de câmera ("0", "1"...)."""
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return cv2.VideoCapture(int(source))
+    return cv2.VideoCapture(source)
+
+class LiveFrameSource:
+    """
+    Fonte em tempo real: uma thread captura continuamente (câmera, RTSP ou arquivo
+    reproduzido no ritmo do vídeo com `realtime_fps`) e, quando o tracking fica para trás,
+    descarta frames conforme `policy` para manter a latência limitada:
+      - "latest":  fila de 1 frame, sempre o mais recente;
+      - "every-k": com frames esperando, só 1 a cada `keep_every` capturados entra na fila
+                   (fila de `queue_size`; cheia, o mais antigo sai);
+      - "none":    fila bloqueante, sem descarte (equivale ao FramePrefetcher).
+
+    `frame_number` é o número de captura (1, 2, ...) do último frame entregue, para que
+    os frames descartados não desloquem a numeração. As estatísticas trazem os descartes
+    e a latência por frame (da captura até o tracking pedir o frame seguinte).
+    """
+    def __init__(self, cap, preprocess=None, crop_rect=None, policy=DROP_LATEST, keep_every=2, queue_size=4,
+                 realtime_fps=None, profiler=NULL_PROFILER, latency_window=1024):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Política de descarte desconhecida: '{policy}' (opções: {', '.join(DROP_POLICIES)})")
+        self.cap = cap
+        self.preprocess = preprocess
+        self.crop_rect = crop_rect
+        self.policy = policy
+        self.keep_every = max(1, int(keep_every))
+        self.realtime_fps = realtime_fps
+        self.profiler = profiler
+        self.queue_size = 1 if policy == DROP_LATEST else max(1, queue_size)
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._finished = False
+        self._error = None
+        self._thread = None
+
+        self.frame_number = 0
+        self.frames_captured = 0
+        self.frames_consumed = 0
+        self.frames_dropped = 0
+        self._latency_ms = np.zeros(latency_window)
+        self._latency_sum_ms = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="LiveFrameSource", daemon=True)
+        self._thread.start()
+        return self
+
+    def _offer(self, item):
+        """Coloca (número, timestamp, frame) no buffer aplicando a política de descarte."""
+        with self._cond:
+            if self.policy == DROP_NONE:
+                while len(self._buffer) >= self.queue_size and not self._stop_event.is_set():
+                    self._cond.wait(timeout=0.1)
+            elif self.policy == DROP_EVERY_K and self._buffer and item[0] % self.keep_every:
+                self.frames_dropped += 1 # Atrasado: só 1 a cada k entra
+                return
+            if len(self._buffer) >= self.queue_size:
+                self._buffer.pop(0) # O mais antigo perde a vez
+                self.frames_dropped += 1
+            self._buffer.append(item)
+            self._cond.notify_all()
+
+    def _run(self):
+        profiler = self.profiler
+        start = time.perf_counter()
+        try:
+            while not self._stop_event.is_set():
+                if self.realtime_fps:
+                    # Reprodução de arquivo: espera o instante em que uma câmera entregaria o frame
+                    delay = start + self.frames_captured / self.realtime_fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                with profiler.stage('decode'):
+                    ret, frame = self.cap.read()
+                captured_at = time.perf_counter()
+                if not ret:
+                    break
+                self.frames_captured += 1
+                with profiler.stage('preprocess'):
+                    if self.preprocess is not None:
+                        frame = self.preprocess(frame)
+                    if self.crop_rect is not None:
+                        x, y, w, h = self.crop_rect
+                        frame = np.ascontiguousarray(frame[y:y + h, x:x + w])
+                self._offer((self.frames_captured, captured_at, frame))
+        except Exception as e: # Repassa o erro para a thread consumidora
+            self._error = e
+        finally:
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+
+    def _record_latency(self, captured_at):
+        latency_ms = (time.perf_counter() - captured_at) * 1e3
+        self._latency_ms[self.frames_consumed % len(self._latency_ms)] = latency_ms
+        self._latency_sum_ms += latency_ms
+        self.frames_consumed += 1
+        self.profiler.record('latency', int(latency_ms * 1e6))
+
+    def __iter__(self):
+        if self._thread is None:
+            self.start()
+        while True:
+            with self._cond:
+                while not self._buffer and not self._finished:
+                    self._cond.wait(timeout=0.1)
+                if not self._buffer:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                number, captured_at, frame = self._buffer.pop(0)
+                self._cond.notify_all()
+            self.frame_number = number
+            yield frame
+            # O tracking voltou para pedir o próximo: o frame anterior foi totalmente processado
+            self._record_latency(captured_at)
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cond:
+            self._buffer.clear()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        recent = self._latency_ms[:min(self.frames_consumed, len(self._latency_ms))]
+        p50, p95 = np.percentile(recent, [50, 95]) if len(recent) else (0.0, 0.0)
+        return {
+            'policy': self.policy,
+            'frames_captured': self.frames_captured,
+            'frames_consumed': self.frames_consumed,
+            'frames_dropped': self.frames_dropped,
+            'drop_ratio': self.frames_dropped / self.frames_captured if self.frames_captured else 0.0,
+            'mean_latency_ms': self._latency_sum_ms / self.frames_consumed if self.frames_consumed else 0.0,
+            'p50_latency_ms': float(p50),
+            'p95_latency_ms': float(p95),
+            'max_latency_ms': float(recent.max()) if len(recent) else 0.0,
+        }
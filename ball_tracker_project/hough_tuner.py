@@ -0,0 +1,339 @@
+# hough_tuner.py
+"""
+Ajuste automático dos parâmetros do HoughCircles com frames anotados.
+
+    python -m ball_tracker_project.hough_tuner anotacoes.json --target-ms 8 --output perfil_camera1.json
+
+Formato das anotações (coordenadas do frame já rotacionado, como em preprocess_frame):
+    {"video": "videos/IMG_2793.mov", "roi": "roi_config.json",
+     "frames": {"120": [[cx, cy, r], ...], "450": [[cx, cy, r], ...]}}
+Também aceita o ground truth do vídeo sintético (`<video>.gt.npy`, ver benchmarks):
+    python -m ball_tracker_project.hough_tuner videos/sintetico.mp4.gt.npy --video videos/sintetico.mp4 --every 10
+O vídeo sintético e o seu ground truth não são rotacionados: com .npy o ROTATE_VIDEO_CLOCKWISE
+do perfil é ignorado.
+
+O perfil gravado tem os campos HOUGH_* do Config (mais os metadados em "_tuning") e pode
+ser usado direto com --profile no main.py, batch_runner e segment_runner.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+from .config import Config, add_profile_arguments, profile_from_args
+from .roi_handler import ROIHandler, crop_to_rect
+from .ball_detector import HoughBallDetector
+from .evaluation import match_centers, summarize_scores
+from .pipeline import preprocess_frame
+from .instrumentation import LOG_FORMAT
+
+logger = logging.getLogger(__name__)
+
+TUNED_FIELDS = ['HOUGH_GRAY_BLUR_KERNEL', 'HOUGH_GRAY_BLUR_SIGMA_X', 'HOUGH_DP', 'HOUGH_MIN_DIST',
+                'HOUGH_PARAM1', 'HOUGH_PARAM2', 'HOUGH_MIN_RADIUS', 'HOUGH_MAX_RADIUS']
+
+def load_annotations(path, video_path=None, every=1):
+    """
+    Retorna (vídeo, arquivo de ROI ou None, {índice do frame (0-based): array (N, 3) de (cx, cy, r)}).
+    """
+    if path.lower().endswith('.npy'):
+        if video_path is None:
+            raise ValueError("Anotações .npy exigem --video.")
+        truth = np.load(path)
+        return video_path, None, {i: truth[i] for i in range(0, len(truth), max(1, every))}
+
+    with open(path, 'r') as f:
+        data = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    def resolve(p):
+        return p if p is None or os.path.isabs(p) else os.path.join(base_dir, p)
+
+    frames = {int(k): np.asarray(v, dtype=np.float64).reshape(-1, 3) for k, v in data['frames'].items()}
+    return video_path or resolve(data['video']), resolve(data.get('roi')), frames
+
+def read_frames(video_path, indices, config=Config):
+    """Lê em uma passada os frames pedidos (pré-processados). Retorna {índice: frame}."""
+    wanted = set(indices)
+    last = max(wanted)
+    frames = {}
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Não foi possível abrir o vídeo em '{video_path}'")
+    try:
+        for index in range(last + 1):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index in wanted:
+                frames[index] = preprocess_frame(frame, config)
+    finally:
+        cap.release()
+    missing = wanted - frames.keys()
+    if missing:
+        logger.warning("%d frame(s) anotado(s) além do fim do vídeo foram ignorados.", len(missing))
+    return frames
+
+def load_roi_crop(roi_file, frame_shape, config=Config):
+    """ROICrop da ROI salva ou, sem ROI, do frame inteiro."""
+    roi_manager = ROIHandler(None, config_file=roi_file, config=config)
+    if roi_file is None or not roi_manager.load_roi():
+        h, w = frame_shape[:2]
+        roi_manager.points = [(0, 0), (w - 1, 0), (w - 1, h - 1), (0, h - 1)]
+        roi_manager.is_defined = True
+        logger.info("Sem ROI salva: usando o frame inteiro.")
+    return roi_manager.get_crop(frame_shape)
+
+def default_grid_values(config=Config):
+    """Valores da busca em grade usados quando não informados (os padrões da linha de comando)."""
+    return {
+        'dp': [1.5, 2.0, 2.5, config.HOUGH_DP],
+        'param1': [20, config.HOUGH_PARAM1, 35, 50],
+        'param2': [25, 30, config.HOUGH_PARAM2, 50],
+        'min_dist': [15, config.HOUGH_MIN_DIST, 45],
+        'blur': [9, config.HOUGH_GRAY_BLUR_KERNEL[0]], # Tamanhos (ímpares) do kernel do blur
+        'radius_slack': [1, 3], # Folga (px) em torno da faixa de raios anotada
+    }
+
+def build_grid(truth, dp, param1, param2, min_dist, blur, radius_slack, config=Config):
+    """Produto cartesiano dos valores; a faixa de raios vem das anotações (± folga)."""
+    radii = np.concatenate([t[:, 2] for t in truth]) if truth else np.array([config.HOUGH_MIN_RADIUS])
+    grid = []
+    values = [sorted(set(v)) for v in (dp, param1, param2, min_dist, blur, radius_slack)]
+    for d, p1, p2, md, k, slack in itertools.product(*values):
+        grid.append({
+            'HOUGH_GRAY_BLUR_KERNEL': (k, k),
+            'HOUGH_GRAY_BLUR_SIGMA_X': config.HOUGH_GRAY_BLUR_SIGMA_X,
+            'HOUGH_DP': d,
+            'HOUGH_MIN_DIST': md,
+            'HOUGH_PARAM1': p1,
+            'HOUGH_PARAM2': p2,
+            'HOUGH_MIN_RADIUS': max(1, int(np.floor(radii.min())) - slack),
+            'HOUGH_MAX_RADIUS': int(np.ceil(radii.max())) + slack,
+        })
+    return grid
+
+def params_key(params):
+    """Chave estável de um conjunto de parâmetros (usada no cache)."""
+    text = json.dumps({k: params[k] for k in TUNED_FIELDS}, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+class DetectionCache:
+    """
+    Cache em disco (JSON) das detecções por conjunto de parâmetros e frame:
+    {chave_params: {chave_frame: {"circles": [[x, y, r], ...], "ns": latência}}}.
+    A chave do frame inclui o caminho, o tamanho e a data de modificação do vídeo, a rotação
+    e a ROI (retângulo do recorte e polígono): com outra ROI as detecções são recalculadas.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    def get(self, p_key, f_key):
+        return self.entries.get(p_key, {}).get(f_key)
+
+    def put(self, p_key, f_key, circles, elapsed_ns):
+        self.entries.setdefault(p_key, {})[f_key] = {'circles': circles, 'ns': elapsed_ns}
+
+    def save(self):
+        if self.path:
+            with open(self.path, 'w') as f:
+                json.dump(self.entries, f)
+
+def frame_key(video_path, index, roi_crop, config=Config):
+    stat = os.stat(video_path)
+    roi = hashlib.sha1(json.dumps([list(roi_crop.rect), [list(p) for p in roi_crop.points]]).encode()).hexdigest()[:12]
+    return (f"{os.path.abspath(video_path)}|{stat.st_size}|{int(stat.st_mtime)}|{config.ROTATE_VIDEO_CLOCKWISE}"
+            f"|{roi}|{index}")
+
+# Estado de cada processo do pool: frames recortados e a ROI (enviados uma vez no initializer)
+_worker_frames = None
+_worker_roi = None
+_worker_config = None
+
+def _init_worker(frames, roi_crop, config, log_level=logging.WARNING):
+    global _worker_frames, _worker_roi, _worker_config
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+    cv2.setNumThreads(1) # Latência medida em um núcleo, como no batch_runner
+    _worker_frames = frames
+    _worker_roi = roi_crop
+    _worker_config = config
+
+def _run_params(params, f_keys):
+    """Roda o detector com `params` nos frames `f_keys`. Retorna {chave_frame: (círculos, ns)}."""
+    config = _worker_config.replace(**{k: params[k] for k in TUNED_FIELDS})
+    points, mask, rect = _worker_roi
+    detector = HoughBallDetector(points, mask, offset=rect[:2], config=config)
+    results = {}
+    for f_key in f_keys:
+        t0 = time.perf_counter_ns()
+        balls, _ = detector.detect(_worker_frames[f_key])
+        elapsed = time.perf_counter_ns() - t0
+        results[f_key] = ([[b['center'][0], b['center'][1], b['radius']] for b in balls], elapsed)
+    return results
+
+def score_params(cached, truth_by_key, match_distance):
+    """Acurácia somada em todos os frames e latência por frame (ms) de um conjunto de parâmetros."""
+    tp = fp = fn = 0
+    error_sum = 0.0
+    latencies = []
+    for f_key, gt in truth_by_key.items():
+        entry = cached[f_key]
+        predicted = np.asarray(entry['circles'], dtype=np.float64).reshape(-1, 3)[:, :2]
+        pred_idx, _, distances = match_centers(predicted, gt[:, :2], match_distance)
+        tp += len(pred_idx)
+        fp += len(predicted) - len(pred_idx)
+        fn += len(gt) - len(pred_idx)
+        error_sum += float(distances.sum())
+        latencies.append(entry['ns'] / 1e6)
+    scores = summarize_scores(tp, fp, fn, error_sum)
+    scores['mean_ms'] = float(np.mean(latencies))
+    scores['p90_ms'] = float(np.percentile(latencies, 90))
+    return scores
+
+def select_best(results, target_ms):
+    """
+    Maior F1 entre os conjuntos com latência média <= target_ms (desempate: menor latência).
+    Se nenhum cumprir a meta, o de maior F1 entre os mais rápidos que 2x a meta, ou o mais rápido.
+    """
+    def rank(r):
+        return (-r['scores']['f1'], r['scores']['mean_ms'])
+
+    if target_ms is None:
+        return min(results, key=rank), True
+    within = [r for r in results if r['scores']['mean_ms'] <= target_ms]
+    if within:
+        return min(within, key=rank), True
+    near = [r for r in results if r['scores']['mean_ms'] <= 2 * target_ms]
+    if near:
+        return min(near, key=rank), False
+    return min(results, key=lambda r: r['scores']['mean_ms']), False
+
+def tune(annotations, video_path=None, roi_file=None, every=1, grid_values=None, target_ms=None,
+         match_distance=None, workers=None, cache_path="hough_tuning_cache.json", log_level=logging.WARNING,
+         config=Config):
+    """
+    Busca em grade (em paralelo) dos parâmetros do Hough. Retorna (melhor resultado,
+    lista de todos os resultados, meta cumprida?). Cada resultado é {'params', 'scores'}.
+    `grid_values` ({'dp': [...], ...}) substitui só os valores que traz; os demais vêm de
+    default_grid_values(config).
+    """
+    video_path, annotated_roi, truth = load_annotations(annotations, video_path, every)
+    if annotations.lower().endswith('.npy') and config.ROTATE_VIDEO_CLOCKWISE:
+        # O ground truth sintético está nas coordenadas do vídeo como foi gerado (sem rotação)
+        logger.info("Anotações .npy: ignorando ROTATE_VIDEO_CLOCKWISE do perfil.")
+        config = config.replace(ROTATE_VIDEO_CLOCKWISE=False)
+    roi_file = roi_file or annotated_roi
+    images = read_frames(video_path, truth.keys(), config)
+    if not images:
+        raise ValueError("Nenhum frame anotado pôde ser lido.")
+    roi_crop = load_roi_crop(roi_file, next(iter(images.values())).shape, config)
+
+    truth_by_key = {frame_key(video_path, i, roi_crop, config): truth[i] for i in images}
+    roi_frames = {frame_key(video_path, i, roi_crop, config): crop_to_rect(frame, roi_crop.rect).copy()
+                  for i, frame in images.items()}
+    grid_values = {**default_grid_values(config), **(grid_values or {})}
+    grid = build_grid(list(truth_by_key.values()), config=config, **grid_values)
+    if match_distance is None:
+        match_distance = max(p['HOUGH_MAX_RADIUS'] for p in grid)
+
+    cache = DetectionCache(cache_path)
+    pending = {}
+    for params in grid:
+        p_key = params_key(params)
+        missing = [f for f in truth_by_key if cache.get(p_key, f) is None]
+        if missing:
+            pending[p_key] = (params, missing)
+    logger.info("%d conjunto(s) de parâmetros x %d frame(s); %d conjunto(s) fora do cache.",
+                len(grid), len(truth_by_key), len(pending))
+
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        roi_state = (roi_crop.points, roi_crop.mask, roi_crop.rect)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(roi_frames, roi_state, config, log_level)) as pool:
+            futures = {pool.submit(_run_params, params, missing): p_key
+                       for p_key, (params, missing) in pending.items()}
+            for done, future in enumerate(as_completed(futures), start=1):
+                for f_key, (circles, elapsed) in future.result().items():
+                    cache.put(futures[future], f_key, circles, elapsed)
+                if done % 50 == 0:
+                    logger.info("%d/%d conjuntos avaliados.", done, len(futures))
+                    cache.save() # Execuções interrompidas aproveitam o que já foi calculado
+        cache.save()
+
+    results = []
+    for params in grid:
+        cached = cache.entries[params_key(params)]
+        results.append({'params': params, 'scores': score_params(cached, truth_by_key, match_distance)})
+    best, met_target = select_best(results, target_ms)
+    return best, results, met_target
+
+def write_profile(path, best, met_target, target_ms):
+    profile = {k: list(v) if isinstance(v, tuple) else v for k, v in best['params'].items()}
+    profile['_tuning'] = {
+        'target_ms': target_ms,
+        'target_met': met_target,
+        'annotated_balls': best['scores']['tp'] + best['scores']['fn'],
+        **{k: best['scores'][k] for k in ('f1', 'precision', 'recall', 'mean_center_error', 'mean_ms', 'p90_ms')},
+    }
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ajusta os parâmetros do Hough com frames anotados.")
+    parser.add_argument("annotations", help="JSON de anotações ou ground truth .npy do vídeo sintético.")
+    parser.add_argument("--video", default=None, help="Vídeo (obrigatório para .npy; sobrescreve o do JSON).")
+    parser.add_argument("--roi", default=None, help="Arquivo de ROI (padrão: o das anotações, ou o frame inteiro).")
+    parser.add_argument("--every", type=int, default=1, help="Com .npy, usa 1 a cada N frames.")
+    parser.add_argument("--target-ms", type=float, default=None, help="Latência média máxima por frame (ms).")
+    parser.add_argument("--match-distance", type=float, default=None, help="Distância máxima (px) de um acerto.")
+    grid_defaults = default_grid_values(Config)
+    parser.add_argument("--dp", type=float, nargs='+', default=grid_defaults['dp'])
+    parser.add_argument("--param1", type=int, nargs='+', default=grid_defaults['param1'])
+    parser.add_argument("--param2", type=int, nargs='+', default=grid_defaults['param2'])
+    parser.add_argument("--min-dist", type=int, nargs='+', default=grid_defaults['min_dist'])
+    parser.add_argument("--blur", type=int, nargs='+', default=grid_defaults['blur'],
+                        help="Tamanhos (ímpares) do kernel do blur.")
+    parser.add_argument("--radius-slack", type=int, nargs='+', default=grid_defaults['radius_slack'],
+                        help="Folga (px) em torno da faixa de raios anotada.")
+    parser.add_argument("--workers", type=int, default=None, help="Número de processos (padrão: núcleos da máquina).")
+    parser.add_argument("--cache", default="hough_tuning_cache.json", help="Cache das detecções (vazio = sem cache).")
+    parser.add_argument("--output", default="hough_profile.json", help="Perfil gerado (campos HOUGH_* do Config).")
+    parser.add_argument("--report", default=None, help="JSON com todos os conjuntos avaliados.")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    add_profile_arguments(parser) # Perfil base: rotação e campos não ajustados
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format=LOG_FORMAT)
+    config = profile_from_args(args)
+
+    grid_values = {'dp': args.dp, 'param1': args.param1, 'param2': args.param2, 'min_dist': args.min_dist,
+                   'blur': args.blur, 'radius_slack': args.radius_slack}
+    best, results, met_target = tune(args.annotations, video_path=args.video, roi_file=args.roi, every=args.every,
+                                     grid_values=grid_values, target_ms=args.target_ms,
+                                     match_distance=args.match_distance, workers=args.workers,
+                                     cache_path=args.cache or None, log_level=args.log_level, config=config)
+    write_profile(args.output, best, met_target, args.target_ms)
+    if args.report:
+        with open(args.report, 'w') as f:
+            ranked = sorted(results, key=lambda r: (-r['scores']['f1'], r['scores']['mean_ms']))
+            json.dump(ranked, f, indent=2)
+
+    scores = best['scores']
+    if not met_target:
+        print(f"AVISO: Nenhum conjunto cumpriu a meta de {args.target_ms} ms; usando o melhor compromisso.")
+    print(f"Melhor de {len(results)} conjuntos: F1={scores['f1']:.3f} "
+          f"(P={scores['precision']:.3f}, R={scores['recall']:.3f}), {scores['mean_ms']:.2f} ms/frame. "
+          f"Perfil salvo em '{args.output}'.")
+    return best
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# instrumentation.py
+import csv
+import json
+import time
+import numpy as np
+
+# Formato de log comum aos pontos de entrada (main.py, batch_runner, segment_runner)
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(processName)s %(name)s] %(message)s"
+
+class _StageTimer:
+    __slots__ = ('_profiler', '_name', '_t0')
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profiler.record(self._name, time.perf_counter_ns() - self._t0)
+        return False
+
+class _StageStats:
+    """Contadores acumulados + janela circular das últimas amostras + histograma log2."""
+    __slots__ = ('count', 'total_ns', 'max_ns', 'window', 'histogram')
+
+    def __init__(self, window_size):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.window = np.zeros(window_size, dtype=np.int64)
+        self.histogram = {} # bit_length(ns) -> contagem, i.e. baldes [2^(k-1), 2^k) ns
+
+    def add(self, elapsed_ns):
+        self.window[self.count % len(self.window)] = elapsed_ns
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        bucket = elapsed_ns.bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def summary(self):
+        recent = self.window[:min(self.count, len(self.window))] / 1e6
+        p50, p90, p99 = np.percentile(recent, [50, 90, 99]) if len(recent) else (0.0, 0.0, 0.0)
+        return {
+            'count': self.count,
+            'total_ms': self.total_ns / 1e6,
+            'mean_ms': self.total_ns / 1e6 / self.count if self.count else 0.0,
+            'p50_ms': float(p50),
+            'p90_ms': float(p90),
+            'p99_ms': float(p99),
+            'max_ms': self.max_ns / 1e6,
+            # Limite superior de cada balde em µs -> contagem
+            'histogram_us': {f"{(1 << k) / 1e3:.0f}": n for k, n in sorted(self.histogram.items())},
+        }
+
+class StageProfiler:
+    """
+    Tempos por estágio (decode, preprocess, motion, hough, tracker_update, render...)
+    medidos com perf_counter_ns, mais contadores livres. Percentis são calculados
+    sobre as últimas `window_size` amostras de cada estágio.
+
+    Uso:
+        with profiler.stage('hough'):
+            ...
+        profiler.count('frames')
+        profiler.maybe_dump() # grava em stats_path a cada dump_interval_s segundos
+    """
+    enabled = True
+
+    def __init__(self, stats_path=None, dump_interval_s=10.0, window_size=1024):
+        self.stats_path = stats_path
+        self.dump_interval_s = dump_interval_s
+        self.window_size = window_size
+        self._stages = {}
+        self._counters = {}
+        self._started = time.monotonic()
+        self._last_dump = self._started
+
+    def stage(self, name):
+        return _StageTimer(self, name)
+
+    def record(self, name, elapsed_ns):
+        stats = self._stages.get(name)
+        if stats is None:
+            stats = self._stages[name] = _StageStats(self.window_size)
+        stats.add(elapsed_ns)
+
+    def count(self, name, n=1):
+        self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self):
+        return {
+            'elapsed_s': time.monotonic() - self._started,
+            'stages': {name: stats.summary() for name, stats in list(self._stages.items())},
+            'counters': dict(self._counters),
+        }
+
+    def maybe_dump(self):
+        if self.stats_path is None:
+            return
+        now = time.monotonic()
+        if now - self._last_dump >= self.dump_interval_s:
+            self._last_dump = now
+            self.dump()
+
+    def dump(self, path=None):
+        """Grava o snapshot em JSON, ou em CSV (uma linha por estágio) se o caminho terminar em .csv."""
+        path = path or self.stats_path
+        if path is None:
+            return
+        snapshot = self.snapshot()
+        if path.lower().endswith('.csv'):
+            columns = ['stage', 'count', 'total_ms', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms']
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for name, stats in snapshot['stages'].items():
+                    writer.writerow([name] + [stats[c] for c in columns[1:]])
+                for name, value in snapshot['counters'].items():
+                    writer.writerow([f"counter:{name}", value] + [''] * (len(columns) - 2))
+        else:
+            with open(path, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class NullProfiler:
+    """Profiler desligado: mesma interface, sem medir nem alocar nada."""
+    enabled = False
+    stats_path = None
+
+    def stage(self, name):
+        return _NULL_TIMER
+
+    def record(self, name, elapsed_ns):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def snapshot(self):
+        return {'elapsed_s': 0.0, 'stages': {}, 'counters': {}}
+
+    def maybe_dump(self):
+        pass
+
+    def dump(self, path=None):
+        pass
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,263 @@
+# kalman_tracker.py
+import logging
+from collections import deque
+import numpy as np
+from .config import Config
+from .track_store import STATUS_ACTIVE, STATUS_LOST, STATUS_PREDICTED
+from .tracker_manager import _color_for_id
+
+logger = logging.getLogger(__name__)
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError: # Sem scipy a associação usa a atribuição gulosa abaixo
+    linear_sum_assignment = None
+
+# Modelo de velocidade constante com estado [cx, cy, vx, vy] e dt = 1 frame
+_F = np.array([[1, 0, 1, 0],
+               [0, 1, 0, 1],
+               [0, 0, 1, 0],
+               [0, 0, 0, 1]], dtype=np.float64)
+_H = np.array([[1, 0, 0, 0],
+               [0, 1, 0, 0]], dtype=np.float64)
+
+def _greedy_assignment(cost):
+    """Atribuição gulosa pelo menor custo (usada quando o scipy não está disponível)."""
+    rows, cols = [], []
+    used_rows, used_cols = set(), set()
+    for flat in np.argsort(cost, axis=None):
+        r, c = np.unravel_index(flat, cost.shape)
+        if not np.isfinite(cost[r, c]):
+            break
+        if r in used_rows or c in used_cols:
+            continue
+        rows.append(r)
+        cols.append(c)
+        used_rows.add(r)
+        used_cols.add(c)
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+class KalmanTrackerManager:
+    """
+    Backend "KALMAN": em vez de um tracker OpenCV por bola, as detecções de cada frame
+    (centros do Hough) são associadas aos tracks existentes por uma matriz de custo
+    vetorizada, e cada track segue um filtro de Kalman de velocidade constante.
+    Todos os tracks vivos são previstos e corrigidos juntos em arrays NumPy, então o custo
+    por frame praticamente não cresce com o número de partículas.
+
+    Mantém a mesma interface do TrackerManager (dicionários com 'id', 'bbox',
+    'trajectory', 'active', 'color'). Tracks perdidos saem de `trackers` (só contam em
+    `finished_tracks`). Parâmetros não informados vêm do perfil `config`.
+    """
+    def __init__(self, detect_fn, track_store=None, trajectory_maxlen=None, offset=(0, 0),
+                 max_distance=None, max_misses=None, process_noise=None, measurement_noise=None,
+                 spawn_new_tracks=True, config=Config):
+        def pick(value, default):
+            return value if value is not None else default
+        max_distance = pick(max_distance, config.KALMAN_MAX_ASSOCIATION_DIST)
+        max_misses = pick(max_misses, config.KALMAN_MAX_MISSES)
+        process_noise = pick(process_noise, config.KALMAN_PROCESS_NOISE)
+        measurement_noise = pick(measurement_noise, config.KALMAN_MEASUREMENT_NOISE)
+        self.trackers = []
+        self.tracker_type = "KALMAN"
+        self.detect_fn = detect_fn # frame -> lista de bolas (coordenadas do frame inteiro)
+        self.track_store = track_store
+        self.trajectory_maxlen = trajectory_maxlen
+        self.offset = offset # As detecções já chegam no frame inteiro; mantido por compatibilidade
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+        self.spawn_new_tracks = spawn_new_tracks
+        self.next_id = 0
+        self.finished_tracks = 0 # Tracks perdidos e descartados
+
+        self._Q = process_noise * np.diag([0.25, 0.25, 1.0, 1.0])
+        self._R = measurement_noise * np.eye(2)
+        self._live = [] # Dicionários dos tracks vivos, na mesma ordem das linhas dos arrays
+        self._x = np.zeros((0, 4))
+        self._P = np.zeros((0, 4, 4))
+        self._misses = np.zeros(0, dtype=int)
+
+    def _new_trajectory(self, first_point):
+        if self.trajectory_maxlen is None:
+            return [first_point]
+        return deque([first_point], maxlen=self.trajectory_maxlen)
+
+    def _spawn(self, centers, radii, ids=None):
+        """Cria tracks para as detecções dadas. Retorna os dicionários criados."""
+        created = []
+        for k in range(len(centers)):
+            track_id = self.next_id if ids is None else ids[k]
+            self.next_id = max(self.next_id, track_id + 1)
+            cx, cy = centers[k]
+            r = float(radii[k])
+            t_info = {
+                'id': track_id,
+                'tracker_obj': None,
+                'bbox': (cx - r, cy - r, 2 * r, 2 * r),
+                'radius': r,
+                'trajectory': self._new_trajectory((int(cx), int(cy))),
+                'active': True,
+                'color': _color_for_id(track_id),
+            }
+            self.trackers.append(t_info)
+            self._live.append(t_info)
+            created.append(t_info)
+
+        if created:
+            n = len(created)
+            x_new = np.zeros((n, 4))
+            x_new[:, :2] = centers
+            P_new = np.tile(np.diag([self._R[0, 0], self._R[1, 1], 100.0, 100.0]), (n, 1, 1))
+            self._x = np.concatenate([self._x, x_new])
+            self._P = np.concatenate([self._P, P_new])
+            self._misses = np.concatenate([self._misses, np.zeros(n, dtype=int)])
+        return created
+
+    def _record(self, frame_index, t_infos, statuses):
+        if self.track_store is None or frame_index is None or not t_infos:
+            return
+        self.track_store.append(frame_index,
+                                [t['id'] for t in t_infos],
+                                [t['bbox'] for t in t_infos],
+                                statuses)
+
+    @staticmethod
+    def _detections_to_arrays(detected_balls_info):
+        centers = np.array([b['center'] for b in detected_balls_info], dtype=np.float64).reshape(-1, 2)
+        radii = np.array([b['radius'] for b in detected_balls_info], dtype=np.float64)
+        return centers, radii
+
+    def initialize_trackers(self, frame, detected_balls_info, frame_index=None):
+        self.trackers = []
+        self._live = []
+        self._x = np.zeros((0, 4))
+        self._P = np.zeros((0, 4, 4))
+        self._misses = np.zeros(0, dtype=int)
+        if not detected_balls_info:
+            logger.info("Nenhuma bola detectada para inicializar tracks.")
+            return False
+
+        centers, radii = self._detections_to_arrays(detected_balls_info)
+        created = self._spawn(centers, radii, ids=[b['id'] for b in detected_balls_info])
+        self._record(frame_index, created, [STATUS_ACTIVE] * len(created))
+        logger.info("%d tracks inicializados.", len(created))
+        return True
+
+    def _predict(self):
+        self._x = self._x @ _F.T
+        self._P = _F @ self._P @ _F.T + self._Q
+
+    def _associate(self, detections):
+        """Retorna (índices de tracks, índices de detecções) associados dentro do raio máximo."""
+        if len(self._live) == 0 or len(detections) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        diff = self._x[:, None, :2] - detections[None, :, :]
+        cost = np.sqrt((diff ** 2).sum(axis=2))
+        cost[cost > self.max_distance] = np.inf
+
+        if linear_sum_assignment is not None:
+            # O scipy não aceita linhas inteiramente infinitas: usa um custo alto e filtra depois
+            finite_cost = np.where(np.isfinite(cost), cost, 1e9)
+            track_idx, det_idx = linear_sum_assignment(finite_cost)
+            keep = np.isfinite(cost[track_idx, det_idx])
+            return track_idx[keep], det_idx[keep]
+        return _greedy_assignment(cost)
+
+    def _correct(self, track_idx, measurements):
+        """Correção de Kalman em lote para os tracks associados."""
+        P = self._P[track_idx]
+        S = P[:, :2, :2] + self._R
+        K = P[:, :, :2] @ np.linalg.inv(S) # (n, 4, 2)
+        innovation = measurements - self._x[track_idx, :2]
+        self._x[track_idx] += (K @ innovation[:, :, None])[:, :, 0]
+        self._P[track_idx] = (np.eye(4) - K @ _H) @ P
+
+    def update_trackers(self, frame, frame_index=None):
+        detected = self.detect_fn(frame)
+        centers, radii = self._detections_to_arrays(detected)
+
+        self._predict()
+        track_idx, det_idx = self._associate(centers)
+        if len(track_idx):
+            self._correct(track_idx, centers[det_idx])
+
+        matched = np.zeros(len(self._live), dtype=bool)
+        matched[track_idx] = True
+        self._misses[matched] = 0
+        self._misses[~matched] += 1
+        lost = self._misses > self.max_misses
+
+        for k, d in zip(track_idx, det_idx):
+            self._live[k]['radius'] = float(radii[d])
+
+        statuses = []
+        for k, t_info in enumerate(self._live):
+            cx, cy = self._x[k, 0], self._x[k, 1]
+            r = t_info['radius']
+            t_info['bbox'] = (cx - r, cy - r, 2 * r, 2 * r)
+            if matched[k]:
+                t_info['trajectory'].append((int(cx), int(cy)))
+                statuses.append(STATUS_ACTIVE)
+            elif lost[k]:
+                t_info['active'] = False
+                statuses.append(STATUS_LOST)
+            else:
+                statuses.append(STATUS_PREDICTED)
+        self._record(frame_index, self._live, statuses)
+
+        if lost.any():
+            keep = ~lost
+            self._live = [t for t, k in zip(self._live, keep) if k]
+            self._x = self._x[keep]
+            self._P = self._P[keep]
+            self._misses = self._misses[keep]
+            # A linha LOST já foi gravada: o track sai também da lista exposta
+            self.finished_tracks += int(lost.sum())
+            self.trackers = [t for t in self.trackers if t['active']]
+
+        if self.spawn_new_tracks and len(centers):
+            unmatched = np.ones(len(centers), dtype=bool)
+            unmatched[det_idx] = False
+            created = self._spawn(centers[unmatched], radii[unmatched])
+            self._record(frame_index, created, [STATUS_ACTIVE] * len(created))
+
+        return int(matched.sum())
+
+    def add_detections(self, frame, detected_balls_info, frame_index=None):
+        """
+        Incorpora detecções sem descartar os tracks existentes: as associadas a um track vivo
+        o corrigem (mesmo ID) e só as restantes criam tracks novos.
+        Retorna quantos tracks foram corrigidos ou criados.
+        """
+        if not detected_balls_info:
+            return 0
+        centers, radii = self._detections_to_arrays(detected_balls_info)
+        track_idx, det_idx = self._associate(centers)
+        if len(track_idx):
+            self._correct(track_idx, centers[det_idx])
+            self._misses[track_idx] = 0
+        matched = [self._live[k] for k in track_idx]
+        for k, t_info, d in zip(track_idx, matched, det_idx):
+            r = t_info['radius'] = float(radii[d])
+            cx, cy = self._x[k, 0], self._x[k, 1]
+            t_info['bbox'] = (cx - r, cy - r, 2 * r, 2 * r)
+
+        unmatched = np.ones(len(centers), dtype=bool)
+        unmatched[det_idx] = False
+        created = self._spawn(centers[unmatched], radii[unmatched])
+        changed = matched + created
+        self._record(frame_index, changed, [STATUS_ACTIVE] * len(changed))
+        return len(changed)
+
+    def close(self):
+        pass # Sem recursos próprios; mesma interface do TrackerManager
+
+    def has_live_tracks(self):
+        """True enquanto houver tracks ativos (incluindo os mantidos só pela previsão)."""
+        return len(self._live) > 0
+
+    def get_tracked_objects_info(self):
+        return [t for t in self.trackers if t['active']] # Retorna apenas os ativos
+
+    def get_all_objects_info(self): # Tracks vivos (os perdidos são descartados)
+        return self.trackers
@@ -0,0 +1,185 @@
+# kinematics.py
+import csv
+import math
+import numpy as np
+from .config import Config
+
+# Colunas das estatísticas por janela de tempo (uma linha por janela)
+KINEMATICS_COLUMNS = ['start_frame', 'end_frame', 'frames', 'samples', 'mean_speed', 'max_speed',
+                      'mean_accel', 'mean_tracks_in_roi', 'density']
+
+def savgol_coeffs(window, polyorder, deriv=0, delta=1.0):
+    """
+    Pesos de Savitzky–Golay para a derivada `deriv` avaliada no último ponto da janela
+    (filtro causal: não espera frames futuros). `delta` é o intervalo entre amostras.
+    """
+    t = np.arange(-(window - 1), 1, dtype=np.float64) # Amostras até o instante atual (t = 0)
+    fit = np.linalg.pinv(np.vander(t, polyorder + 1, increasing=True)) # Linha k -> coeficiente de t^k
+    return math.factorial(deriv) * fit[deriv] / delta ** deriv
+
+def polygon_area(points):
+    """Área (px²) do polígono pela fórmula do laço."""
+    pts = np.asarray(points, dtype=np.float64)
+    x, y = pts[:, 0], pts[:, 1]
+    return 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+def points_in_polygon(points, polygon):
+    """Máscara booleana dos pontos (N, 2) dentro do polígono (ray casting vetorizado)."""
+    pts = np.asarray(points, dtype=np.float64)
+    poly = np.asarray(polygon, dtype=np.float64)
+    x, y = pts[:, :1], pts[:, 1:]
+    x0, y0 = poly[:, 0], poly[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    crosses = (y0 > y) != (y1 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return np.count_nonzero(crosses & (x < x_cross), axis=1) % 2 == 1
+
+class KinematicsAnalyzer:
+    """
+    Análise online das trajetórias: a cada frame recebe os tracks ativos e estima posição,
+    velocidade e aceleração suavizadas (Savitzky–Golay sobre os últimos `window` centros
+    de cada track). Acumula estatísticas por janela de `stats_window` frames (velocidade
+    média/máxima, aceleração média, densidade de tracks na ROI) e as devolve ao fechar
+    cada janela.
+
+    Só guarda os últimos `window` pontos dos tracks ativos (memória e custo por frame não
+    crescem com o vídeo). Um track que some por um ou mais frames recomeça a janela, pois
+    o filtro supõe amostras igualmente espaçadas. Com `fps` as unidades são px/s e px/s²;
+    sem, px/frame e px/frame².
+    """
+    def __init__(self, roi_points, fps=None, window=None, polyorder=None, stats_window=None, config=Config):
+        self.window = window if window is not None else config.KINEMATICS_WINDOW
+        self.polyorder = polyorder if polyorder is not None else config.KINEMATICS_POLYORDER
+        self.stats_window = stats_window if stats_window is not None else config.KINEMATICS_STATS_WINDOW
+        if self.window <= self.polyorder:
+            raise ValueError(f"A janela ({self.window}) deve ser maior que a ordem do polinômio ({self.polyorder})")
+        delta = 1.0 / fps if fps else 1.0
+        # (3, window): posição, velocidade e aceleração
+        self._coeffs = np.stack([savgol_coeffs(self.window, self.polyorder, d, delta) for d in range(3)])
+        self.roi_points = roi_points
+        self.roi_area = polygon_area(roi_points) if roi_points else 0.0
+
+        # Estado por track ativo, em linhas de arrays que só crescem com o número de tracks simultâneos
+        self._slots = {}     # id do track -> linha
+        self._history = np.zeros((0, self.window, 2))
+        self._count = np.zeros(0, dtype=np.int64)
+        self._last_frame = np.zeros(0, dtype=np.int64)
+        self.estimates = {}  # id -> array (3, 2): posição, velocidade e aceleração do último frame
+        self._reset_stats(None)
+
+    def _reset_stats(self, start_frame):
+        self._window_start = start_frame
+        self._window_end = start_frame
+        self._frames = 0
+        self._samples = 0
+        self._speed_sum = 0.0
+        self._speed_max = 0.0
+        self._accel_sum = 0.0
+        self._in_roi_sum = 0
+
+    def _assign_slots(self, ids, frame_index):
+        """Linha de cada id ativo; linhas de tracks que saíram são reaproveitadas."""
+        previous = self._slots
+        self._slots = {track_id: previous[track_id] for track_id in ids if track_id in previous}
+        new_ids = [track_id for track_id in ids if track_id not in self._slots]
+        if new_ids:
+            used = set(self._slots.values())
+            if len(self._count) - len(used) < len(new_ids):
+                self._grow(max(4, 2 * len(self._count), len(used) + len(new_ids)))
+            free = [slot for slot in range(len(self._count)) if slot not in used]
+            for track_id, slot in zip(new_ids, free):
+                self._slots[track_id] = slot
+                self._count[slot] = 0
+        slots = np.array([self._slots[track_id] for track_id in ids], dtype=np.int64)
+        self._count[slots[self._last_frame[slots] != frame_index - 1]] = 0 # Lacuna: a janela recomeça
+        return slots
+
+    def _grow(self, capacity):
+        extra = capacity - len(self._count)
+        self._history = np.concatenate([self._history, np.zeros((extra, self.window, 2))])
+        self._count = np.concatenate([self._count, np.zeros(extra, dtype=np.int64)])
+        self._last_frame = np.concatenate([self._last_frame, np.full(extra, -1, dtype=np.int64)])
+
+    def update(self, frame_index, tracks):
+        """
+        Processa os tracks do frame (dicionários do gerenciador; só os ativos contam).
+        Retorna as estatísticas da janela quando ela fecha, senão None.
+        """
+        active = [t for t in tracks if t['active']]
+        ids = [t['id'] for t in active]
+        centers = np.array([(x + w / 2, y + h / 2) for x, y, w, h in (t['bbox'] for t in active)],
+                           dtype=np.float64).reshape(-1, 2)
+
+        slots = self._assign_slots(ids, frame_index)
+        self._history[slots, self._count[slots] % self.window] = centers
+        self._count[slots] += 1
+        self._last_frame[slots] = frame_index
+
+        # Savitzky–Golay nos tracks com a janela completa (pontos na ordem do mais antigo ao atual)
+        ready = self._count[slots] >= self.window
+        ready_slots = slots[ready]
+        order = (self._count[ready_slots, None] + np.arange(self.window)) % self.window
+        ordered = self._history[ready_slots[:, None], order] # (n, window, 2)
+        estimates = np.einsum('dw,nwc->ndc', self._coeffs, ordered)
+        self.estimates = {int(track_id): est for track_id, est in zip(np.asarray(ids, dtype=np.int64)[ready], estimates)}
+
+        speeds = np.linalg.norm(estimates[:, 1], axis=1)
+        accels = np.linalg.norm(estimates[:, 2], axis=1)
+        if self._window_start is None:
+            self._reset_stats(frame_index)
+        self._window_end = frame_index
+        self._frames += 1
+        self._samples += len(speeds)
+        self._speed_sum += float(speeds.sum())
+        if len(speeds):
+            self._speed_max = max(self._speed_max, float(speeds.max()))
+        self._accel_sum += float(accels.sum())
+        if self.roi_points and len(centers):
+            self._in_roi_sum += int(np.count_nonzero(points_in_polygon(centers, self.roi_points)))
+
+        if frame_index - self._window_start + 1 >= self.stats_window:
+            stats = self._window_stats()
+            self._reset_stats(frame_index + 1)
+            return stats
+        return None
+
+    def flush(self):
+        """Estatísticas da janela incompleta (fim do vídeo), ou None se vazia."""
+        if not self._frames:
+            return None
+        stats = self._window_stats()
+        self._reset_stats(None)
+        return stats
+
+    def _window_stats(self):
+        mean_tracks = self._in_roi_sum / self._frames
+        return {
+            'start_frame': self._window_start,
+            'end_frame': self._window_end,
+            'frames': self._frames,
+            'samples': self._samples,
+            'mean_speed': self._speed_sum / self._samples if self._samples else 0.0,
+            'max_speed': self._speed_max,
+            'mean_accel': self._accel_sum / self._samples if self._samples else 0.0,
+            'mean_tracks_in_roi': mean_tracks,
+            # Tracks por 10⁴ px² da ROI
+            'density': 1e4 * mean_tracks / self.roi_area if self.roi_area else 0.0,
+        }
+
+class KinematicsWriter:
+    """Grava as estatísticas por janela em CSV, uma linha por janela."""
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=KINEMATICS_COLUMNS)
+        self._writer.writeheader()
+
+    def write(self, stats):
+        if stats is not None:
+            self._writer.writerow(stats)
+            self.rows += 1
+
+    def close(self):
+        self._file.close()
@@ -1,21 +1,83 @@
+import logging
 import cv2
+from .config import Config
+
+logger = logging.getLogger(__name__)
 
 class MotionDetector:
-    def __init__(self, history=100, var_threshold=40, detect_shadows=False, min_contour_area=500):
+    """
+    Detecta movimento com MOG2. Para o estado de espera ficar barato, o frame pode ser
+    reduzido (`downscale`) e convertido para cinza antes da subtração de fundo, e só
+    1 a cada `stride` frames é analisado. `min_contour_area` é sempre em pixels do frame
+    original; o limiar usado na escala reduzida é multiplicado por downscale².
+    `roi_mask` (opcional, do tamanho do frame) é aplicada já na escala reduzida.
+    Depois de cada `detect`, `last_motion_rects` tem os retângulos (x, y, w, h) dos
+    contornos acima do limiar, em coordenadas do frame recebido.
+    """
+    def __init__(self, history=100, var_threshold=40, detect_shadows=False, min_contour_area=500, show_debug=True,
+                 roi_mask=None, downscale=1.0, grayscale=False, stride=1):
         self.bg_subtractor = cv2.createBackgroundSubtractorMOG2(
             history=history, 
             varThreshold=var_threshold, 
             detectShadows=detect_shadows
         )
         self.min_contour_area = min_contour_area
+        self.show_debug = show_debug # False no modo headless: nenhuma janela nem desenho de contornos
+        self.downscale = downscale
+        self.grayscale = grayscale
+        self.stride = max(1, int(stride))
+        self.scaled_min_area = min_contour_area * downscale * downscale
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)) # Criado uma vez, reutilizado a cada frame
+        self._roi_mask = roi_mask
+        self._scaled_mask = None # Máscara da ROI na escala reduzida (calculada no primeiro frame)
+        self._calls = 0
+        self.last_motion_rects = []
+
+    @classmethod
+    def from_config(cls, config=Config, **kwargs):
+        """Detector com limiar, redução, cinza e passo vindos do perfil `config`."""
+        params = dict(min_contour_area=config.MIN_MOTION_AREA, downscale=config.MOTION_DOWNSCALE,
+                      grayscale=config.MOTION_GRAYSCALE, stride=config.MOTION_FRAME_STRIDE)
+        params.update(kwargs)
+        return cls(**params)
+
+    def _prepare(self, frame):
+        """Reduz, converte para cinza e aplica a máscara da ROI, nessa ordem (o mais barato primeiro)."""
+        if self.downscale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.downscale, fy=self.downscale, interpolation=cv2.INTER_AREA)
+        if self.grayscale and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self._roi_mask is not None:
+            if self._scaled_mask is None or self._scaled_mask.shape[:2] != frame.shape[:2]:
+                self._scaled_mask = cv2.resize(self._roi_mask, (frame.shape[1], frame.shape[0]),
+                                               interpolation=cv2.INTER_NEAREST)
+            frame = cv2.bitwise_and(frame, frame, mask=self._scaled_mask)
+        return frame
+
+    def _to_frame_rect(self, contour):
+        """Retângulo envolvente do contorno levado da escala reduzida para a do frame recebido."""
+        x, y, w, h = cv2.boundingRect(contour)
+        s = 1.0 / self.downscale
+        return (int(x * s), int(y * s), int(round(w * s)) + 1, int(round(h * s)) + 1)
 
     def detect(self, frame):
-        fg_mask = self.bg_subtractor.apply(frame)
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-        fg_mask_cleaned = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
-        
-        contours, _ = cv2.findContours(fg_mask_cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        self._calls += 1
+        self.last_motion_rects = []
+        if (self._calls - 1) % self.stride:
+            return False # Frame pulado: nem o modelo de fundo é atualizado
+
+        fg_mask = self.bg_subtractor.apply(self._prepare(frame))
+        fg_mask_cleaned = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, self.kernel)
 
+        if not self.show_debug:
+            if not cv2.countNonZero(fg_mask_cleaned):
+                return False # Máscara vazia: não há contorno algum (mesmo resultado do caminho completo)
+            contours, _ = cv2.findContours(fg_mask_cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            self.last_motion_rects = [self._to_frame_rect(contour) for contour in contours
+                                      if cv2.contourArea(contour) > self.scaled_min_area]
+            return bool(self.last_motion_rects)
+
+        contours, _ = cv2.findContours(fg_mask_cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         found_motion = False
         # --- CÓDIGO DE DEPURAÇÃO ---
         # Desenha todos os contornos encontrados no frame para visualização
@@ -23,11 +85,12 @@ class MotionDetector:
         
         for contour in contours:
             area = cv2.contourArea(contour)
-            if area > self.min_contour_area:
+            if area > self.scaled_min_area:
                 # Se for maior que o limiar, pinta de VERDE
                 cv2.drawContours(frame_with_contours, [contour], -1, (0, 255, 0), 2)
                 found_motion = True
-                print(f"MOVIMENTO VÁLIDO DETECTADO! Área: {area:.2f} (Limiar: {self.min_contour_area})")
+                self.last_motion_rects.append(self._to_frame_rect(contour))
+                logger.debug("Movimento válido detectado. Área: %.2f (Limiar: %.2f)", area, self.scaled_min_area)
             else:
                 # Se for menor, pinta de VERMELHO (ignorado)
                 cv2.drawContours(frame_with_contours, [contour], -1, (0, 0, 255), 1)
@@ -38,4 +101,4 @@ class MotionDetector:
         cv2.imshow("Debug de Movimento", frame_with_contours)
         # ------------------------
 
-        return found_motion
\ No newline at end of file
+        return found_motion
@@ -0,0 +1,417 @@
+# pipeline.py
+import functools
+import itertools
+import logging
+import time
+import cv2
+from .config import Config
+from .roi_handler import ROIHandler, crop_to_rect, load_roi_zones
+from .ball_detector import HoughBallDetector
+from .tracker_manager import create_tracker_manager
+from .motion_detector import MotionDetector
+from .frame_source import FramePrefetcher, LiveFrameSource, iter_frames, open_capture
+from .track_store import TrackStore, open_track_writer
+from .frame_cache import cache_key
+from .kinematics import KinematicsAnalyzer, KinematicsWriter
+from .instrumentation import NULL_PROFILER
+from .video_writer import AnnotatedVideoWriter, snapshot_tracks
+
+logger = logging.getLogger(__name__)
+
+STATUS_WAITING = "Aguardando Movimento"
+STATUS_TRACKING = "Rastreando"
+
+def preprocess_frame(frame, config=Config):
+    """Aplica pré-processamentos consistentes ao frame (ex: rotação)."""
+    if config.ROTATE_VIDEO_CLOCKWISE:
+        return cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
+    return frame
+
+class TrackingPipeline:
+    """
+    Máquina de estados movimento -> detecção (Hough) -> tracking.
+    Não desenha nada: quem chama decide se e como visualizar o resultado.
+
+    Os frames recebidos são recortes da ROI (ROIHandler.get_crop): `roi_points` e `roi_mask`
+    estão nas coordenadas do recorte e `offset` é o canto do recorte no frame inteiro.
+    Detecções e trajetórias saem sempre em coordenadas do frame inteiro.
+    Todos os parâmetros vêm do perfil `config` (padrão: Config); pipelines com perfis
+    diferentes podem rodar lado a lado no mesmo processo.
+    """
+    def __init__(self, roi_points, roi_mask, tracker_type=None, show_debug=False,
+                 track_store=None, trajectory_maxlen=None, offset=(0, 0), profiler=NULL_PROFILER, config=Config):
+        self.config = config
+        self.roi_points = roi_points
+        self.profiler = profiler # StageProfiler para medir os estágios; NULL_PROFILER = desligado
+        self.roi_mask = roi_mask
+        self.offset = offset
+        self.detector = HoughBallDetector(roi_points, roi_mask, offset=offset, config=config)
+        self.tracker_mgr = create_tracker_manager(tracker_type, detect_fn=self._detect_balls, config=config,
+                                                  track_store=track_store,
+                                                  trajectory_maxlen=trajectory_maxlen, offset=offset)
+        # A máscara da ROI é aplicada pelo detector de movimento já na escala reduzida
+        self.motion_detector = MotionDetector.from_config(config, show_debug=show_debug, roi_mask=roi_mask)
+        self.is_tracking_active = False
+        self.total_initial_trackers = 0
+
+    @classmethod
+    def for_roi(cls, roi_crop, **kwargs):
+        """Cria o pipeline a partir de um ROICrop."""
+        return cls(roi_crop.points, roi_crop.mask, offset=roi_crop.rect[:2], **kwargs)
+
+    @property
+    def next_ball_id(self):
+        """IDs continuam crescendo entre reinicializações (resultados sem IDs repetidos)."""
+        return self.tracker_mgr.next_id
+
+    def _detect_balls(self, frame, rect=None):
+        """
+        Detecção usada pelo gerenciador de tracking (recuperação e backend KALMAN).
+        `rect` (x, y, w, h) restringe o Hough a uma janela do frame recebido.
+        Os IDs são atribuídos pelo gerenciador.
+        """
+        balls, _ = self.detector.detect(frame, rect)
+        return balls
+
+    @property
+    def status(self):
+        return STATUS_TRACKING if self.is_tracking_active else STATUS_WAITING
+
+    def process_frame(self, frame, frame_count):
+        """
+        Processa um frame já pré-processado.
+        Retorna (bolas_detectadas_neste_frame, atualizações_bem_sucedidas).
+        """
+        initial_balls = []
+        successful_updates = 0
+        profiler = self.profiler
+        profiler.count('frames')
+
+        if not self.is_tracking_active:
+            # --- ESTADO: AGUARDANDO MOVIMENTO ---
+            with profiler.stage('motion'):
+                found_motion = self.motion_detector.detect(frame)
+
+            if found_motion:
+                profiler.count('motion_triggers')
+                logger.debug("[Frame %d] Movimento detectado! Tentando encontrar bolas...", frame_count)
+                with profiler.stage('hough'):
+                    if self.config.HOUGH_MOTION_REGIONS_ONLY:
+                        initial_balls, _ = self.detector.detect_in_regions(
+                            frame, self.motion_detector.last_motion_rects, self.next_ball_id)
+                    else:
+                        initial_balls, _ = self.detector.detect(frame, next_ball_id_start=self.next_ball_id)
+
+                if initial_balls:
+                    logger.info("[Frame %d] Bolas encontradas! Inicializando %d tracker(s).",
+                                frame_count, len(initial_balls))
+                    # Tracks perdidos recentemente são recuperados com o mesmo ID; só o resto vira track novo
+                    if self.tracker_mgr.add_detections(frame, initial_balls, frame_index=frame_count):
+                        self.is_tracking_active = True # Muda para o estado de tracking
+                    else:
+                        logger.warning("Falha ao inicializar trackers, continuará procurando movimento.")
+                        initial_balls = []
+                else:
+                    logger.debug("Movimento detectado, mas nenhuma bola encontrada. Continuando...")
+        else:
+            # --- ESTADO: RASTREAMENTO ATIVO ---
+            # Inclui a recuperação de tracks perdidos e a re-detecção periódica
+            with profiler.stage('tracker_update'):
+                successful_updates = self.tracker_mgr.update_trackers(frame, frame_index=frame_count)
+
+            # Só volta a esperar movimento quando não há mais nenhum track recuperável
+            if not self.tracker_mgr.has_live_tracks():
+                logger.info("[Frame %d] Todos os trackers perderam o objeto. Voltando a aguardar por novo movimento.",
+                            frame_count)
+                self.is_tracking_active = False # Volta para o estado de espera
+
+        self.total_initial_trackers = self.tracker_mgr.next_id # Inclui os tracks já descartados
+        return initial_balls, successful_updates
+
+    def close(self):
+        """Libera as threads de atualização dos trackers (TRACKER_UPDATE_WORKERS > 1)."""
+        self.tracker_mgr.close()
+
+def open_frame_stream(cap, prefetch=0, crop_rect=None, profiler=NULL_PROFILER, config=Config, live=None):
+    """
+    Retorna (iterável de frames pré-processados, prefetcher/fonte ao vivo ou None).
+    Com prefetch > 0 a decodificação roda numa thread com fila de `prefetch` frames.
+    Com `live` (opções do LiveFrameSource: policy, keep_every, realtime_fps...) a captura
+    roda em tempo real e descarta frames quando o tracking fica para trás.
+    """
+    preprocess = functools.partial(preprocess_frame, config=config)
+    if live is not None:
+        source = LiveFrameSource(cap, preprocess=preprocess, crop_rect=crop_rect, profiler=profiler, **live).start()
+        return source, source
+    if prefetch > 0:
+        prefetcher = FramePrefetcher(cap, preprocess=preprocess, crop_rect=crop_rect,
+                                     queue_size=prefetch, profiler=profiler).start()
+        return prefetcher, prefetcher
+    return iter_frames(cap, preprocess=preprocess, crop_rect=crop_rect, profiler=profiler), None
+
+def live_options(cap, policy, keep_every=2, realtime=False):
+    """Opções de open_frame_stream(live=...); `realtime` reproduz um arquivo no ritmo do vídeo."""
+    options = {'policy': policy, 'keep_every': keep_every}
+    if realtime:
+        options['realtime_fps'] = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    return options
+
+def print_live_stats(stats):
+    print(f"[Ao vivo] Política '{stats['policy']}': {stats['frames_dropped']} de {stats['frames_captured']} "
+          f"frame(s) descartado(s) ({100 * stats['drop_ratio']:.1f}%) | "
+          f"Latência média: {stats['mean_latency_ms']:.1f} ms (p50 {stats['p50_latency_ms']:.1f}, "
+          f"p95 {stats['p95_latency_ms']:.1f}, máx {stats['max_latency_ms']:.1f})")
+
+def print_prefetch_stats(stats):
+    print(f"[Prefetch] Fila média: {stats['mean_queue_depth']:.1f}/{stats['queue_size']} | "
+          f"Espera do tracking: {stats['consumer_wait_s']:.2f}s | "
+          f"Bloqueio da decodificação: {stats['producer_stall_s']:.2f}s | "
+          f"Limitado por: {stats['bound_by']}")
+
+def load_saved_roi(roi_file, config=Config):
+    """Carrega a ROI salva (sem seleção interativa). Retorna o ROIHandler ou None."""
+    roi_manager = ROIHandler(None, config_file=roi_file, config=config)
+    if not roi_manager.load_roi():
+        logger.error("ROI não encontrada em '%s'. O modo headless exige uma ROI salva.", roi_file)
+        return None
+    return roi_manager
+
+def build_frame_cache(video_path, roi_manager, frame_cache, prefetch=0, config=Config):
+    """
+    Garante a entrada do cache para o vídeo inteiro (uma leitura sem tracking, se ainda
+    não existir) e a retorna como CachedFrames; None se o vídeo não puder ser lido ou se a
+    entrada não couber no limite do cache (nesse caso a leitura para assim que isso se sabe).
+    """
+    key = cache_key(video_path, roi_manager.get_points(), config)
+    cached = frame_cache.open(key)
+    if cached is not None:
+        return cached
+    cap = open_capture(video_path)
+    ret, first_frame_raw = cap.read() if cap.isOpened() else (False, None)
+    if not ret:
+        logger.error("Não foi possível ler o vídeo '%s'.", video_path)
+        cap.release()
+        return None
+    first_frame = preprocess_frame(first_frame_raw, config)
+    roi_crop = roi_manager.get_crop(first_frame.shape)
+    writer = frame_cache.writer(key, first_frame.shape, roi_crop.rect, cap.get(cv2.CAP_PROP_FPS) or 30.0,
+                                grayscale=config.FRAME_CACHE_GRAYSCALE,
+                                expected_frames=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    frames, prefetcher = open_frame_stream(cap, prefetch=prefetch, crop_rect=roi_crop.rect, config=config)
+    try:
+        for _ in writer.tee(itertools.chain([crop_to_rect(first_frame, roi_crop.rect)], frames)):
+            if writer.too_large:
+                break
+        if not writer.commit():
+            return None
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if prefetcher is not None:
+            prefetcher.stop()
+        cap.release()
+    return frame_cache.open(key)
+
+def process_video(video_path, roi_manager, track_store, tracker_type=None, prefetch=0,
+                  start_frame=0, end_frame=None, profiler=NULL_PROFILER, config=Config,
+                  annotated_output=None, render_every=1, render_scale=1.0, trail_length=None, live=None,
+                  frame_cache=None, kinematics_output=None):
+    """
+    Roda o pipeline sem visualização nos frames [start_frame, end_frame) do vídeo e
+    grava as trajetórias em `track_store`. Os frames são numerados a partir de
+    start_frame + 1, como na execução do vídeo inteiro.
+    Com `annotated_output`, um vídeo anotado do recorte da ROI é desenhado e gravado numa
+    thread separada (AnnotatedVideoWriter), 1 a cada `render_every` frames, na escala `render_scale`,
+    com rastros limitados a `trail_length` pontos (None = completos).
+    `live` = {'policy', 'keep_every', 'realtime'}: `video_path` pode ser câmera ou URL e os
+    frames atrasados são descartados (a numeração segue a captura, com lacunas).
+    Com `frame_cache` (FrameCache), os frames pré-processados vêm do cache em disco quando
+    existe uma entrada para este vídeo/ROI/perfil; senão, uma leitura completa do vídeo grava a entrada.
+    Com `kinematics_output` (.csv), velocidades e acelerações suavizadas são calculadas durante o
+    tracking (KinematicsAnalyzer) e as estatísticas de cada janela de tempo são gravadas nesse arquivo.
+    Retorna um dicionário com o resumo da execução (ou None em erro).
+    """
+    cached = cache_writer = None
+    if frame_cache is not None and live is None:
+        key = cache_key(video_path, roi_manager.get_points(), config)
+        cached = frame_cache.open(key)
+
+    cap = prefetcher = None
+    if cached is not None:
+        # Frames já rotacionados e recortados: acesso direto ao trecho, sem decodificação nem seek
+        logger.info("Usando o cache de frames (%d frames).", len(cached))
+        roi_crop = roi_manager.get_crop(cached.frame_shape)
+        fps = cached.fps
+        frames = cached.iter_range(start_frame, end_frame)
+    else:
+        cap = open_capture(video_path)
+        if not cap.isOpened():
+            logger.error("Não foi possível abrir o vídeo em '%s'", video_path)
+            return None
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+        ret, first_frame_raw = cap.read()
+        if not ret:
+            logger.error("Não foi possível ler o primeiro frame de '%s'.", video_path)
+            cap.release()
+            return None
+        first_frame = preprocess_frame(first_frame_raw, config)
+        # Todo o processamento por frame acontece só no retângulo envolvente da ROI
+        roi_crop = roi_manager.get_crop(first_frame.shape)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+        live_opts = live_options(cap, **live) if live is not None else None
+        frames, prefetcher = open_frame_stream(cap, prefetch=prefetch, crop_rect=roi_crop.rect, profiler=profiler,
+                                               config=config, live=live_opts)
+        frames = itertools.chain([crop_to_rect(first_frame, roi_crop.rect)], frames)
+        if end_frame is not None:
+            frames = itertools.islice(frames, max(0, end_frame - start_frame))
+
+    # Na memória fica só o último ponto de cada tracker; o histórico vai para o track_store
+    pipeline = TrackingPipeline.for_roi(roi_crop, tracker_type=tracker_type, track_store=track_store,
+                                        trajectory_maxlen=1, profiler=profiler, config=config)
+    video_sink = None
+    if annotated_output:
+        video_sink = AnnotatedVideoWriter(annotated_output, fps, roi_crop.rect[2:],
+                                          render_every=render_every, scale=render_scale,
+                                          origin=roi_crop.rect[:2], roi_points=roi_manager.get_points(),
+                                          trail_length=trail_length, config=config).start()
+    if cap is not None and frame_cache is not None and live is None and start_frame == 0 and end_frame is None:
+        # Só uma leitura completa do vídeo vira entrada do cache
+        cache_writer = frame_cache.writer(key, first_frame.shape, roi_crop.rect, fps,
+                                          grayscale=config.FRAME_CACHE_GRAYSCALE,
+                                          expected_frames=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        frames = cache_writer.tee(frames)
+    cache_status = 'hit' if cached is not None else None
+    kinematics = kinematics_sink = None
+    if kinematics_output:
+        kinematics = KinematicsAnalyzer(roi_manager.get_points(), fps=fps, config=config)
+        kinematics_sink = KinematicsWriter(kinematics_output)
+    frames_processed = 0
+    start_time = time.perf_counter()
+    try:
+        for frames_processed, roi_frame in enumerate(frames, start=1):
+            # Ao vivo, frame_number é 0 no primeiro frame (lido acima) e segue a captura depois
+            frame_index = start_frame + (1 + prefetcher.frame_number if live is not None else frames_processed)
+            initial_balls, successful_updates = pipeline.process_frame(roi_frame, frame_index)
+            if kinematics is not None:
+                with profiler.stage('kinematics'):
+                    kinematics_sink.write(kinematics.update(frame_index, pipeline.tracker_mgr.get_all_objects_info()))
+            if video_sink is not None:
+                elapsed = time.perf_counter() - start_time
+                hud = (frames_processed / elapsed if elapsed > 0 else 0.0, successful_updates,
+                       pipeline.total_initial_trackers, pipeline.status)
+                video_sink.submit(frame_index, roi_frame, snapshot_tracks(pipeline.tracker_mgr.get_all_objects_info()),
+                                  initial_balls, hud)
+            profiler.maybe_dump()
+        if cache_writer is not None:
+            cache_status = 'written' if cache_writer.commit() else 'too_large' if cache_writer.too_large else None
+            cache_writer = None
+    finally:
+        if cache_writer is not None:
+            cache_writer.abort() # Leitura interrompida: não grava uma entrada parcial
+        if prefetcher is not None:
+            prefetcher.stop()
+        if cap is not None:
+            cap.release()
+        pipeline.close()
+        if kinematics_sink is not None:
+            kinematics_sink.write(kinematics.flush())
+            kinematics_sink.close()
+        if video_sink is not None:
+            video_sink.close()
+        profiler.dump()
+
+    elapsed = time.perf_counter() - start_time
+    summary = {
+        'video': video_path,
+        'frames': frames_processed,
+        'seconds': elapsed,
+        'fps': frames_processed / elapsed if elapsed > 0 else 0.0,
+        'tracks': pipeline.next_ball_id, # IDs atribuídos ao longo de todo o trecho
+    }
+    if prefetcher is not None:
+        summary['live' if live is not None else 'prefetch'] = prefetcher.stats()
+    if video_sink is not None:
+        summary['annotated_video'] = video_sink.stats()
+    if cache_status is not None:
+        summary['frame_cache'] = cache_status
+    if kinematics_sink is not None:
+        summary['kinematics'] = {'output': kinematics_sink.path, 'windows': kinematics_sink.rows}
+    return summary
+
+def run_headless(video_path, roi_file, output_path, tracker_type=None, prefetch=0,
+                 profiler=NULL_PROFILER, config=Config, annotated_output=None, render_every=1, render_scale=1.0,
+                 trail_length=None, live=None, frame_cache=None, kinematics_output=None):
+    """
+    Processa o vídeo inteiro sem nenhuma janela ou desenho e grava as trajetórias
+    em `output_path` (.csv, .npz ou .parquet) em blocos durante a execução.
+    `frame_cache` (FrameCache) reaproveita os frames pré-processados entre execuções.
+    `kinematics_output` grava as estatísticas cinemáticas por janela de tempo (.csv).
+    Se o arquivo de ROI tiver várias zonas, todas rodam em paralelo sobre uma única
+    decodificação (zones.process_zones), com um arquivo de trajetórias por zona.
+    Retorna um dicionário com o resumo da execução (ou None em erro).
+    """
+    zones = load_roi_zones(roi_file, config)
+    if len(zones) > 1:
+        return _run_headless_zones(video_path, zones, output_path, tracker_type=tracker_type, prefetch=prefetch,
+                                   profiler=profiler, config=config, live=live, kinematics_output=kinematics_output,
+                                   ignored={'annotated_output': annotated_output, 'frame_cache': frame_cache})
+
+    roi_manager = load_saved_roi(roi_file, config)
+    if roi_manager is None:
+        return None
+
+    # As trajetórias vão para o disco em blocos durante a execução
+    track_store = TrackStore(writer=open_track_writer(output_path))
+    try:
+        summary = process_video(video_path, roi_manager, track_store, tracker_type=tracker_type,
+                                prefetch=prefetch, profiler=profiler, config=config,
+                                annotated_output=annotated_output, render_every=render_every,
+                                render_scale=render_scale, trail_length=trail_length, live=live,
+                                frame_cache=frame_cache, kinematics_output=kinematics_output)
+    finally:
+        track_store.close()
+    if summary is None:
+        return None
+
+    summary['rows'] = len(track_store)
+    summary['output'] = track_store.writer.path
+    print(f"Processamento headless concluído: {summary['frames']} frames em {summary['seconds']:.1f}s "
+          f"({summary['fps']:.1f} FPS). Resultados em '{summary['output']}'.")
+    if 'prefetch' in summary:
+        print_prefetch_stats(summary['prefetch'])
+    if 'live' in summary:
+        print_live_stats(summary['live'])
+    if 'kinematics' in summary:
+        print(f"Estatísticas cinemáticas: {summary['kinematics']['windows']} janela(s) em "
+              f"'{summary['kinematics']['output']}'.")
+    if 'frame_cache' in summary:
+        print({'hit': "Frames lidos do cache.", 'written': "Frames gravados no cache.",
+               'too_large': "Vídeo maior que o limite do cache de frames: nada foi gravado."}[summary['frame_cache']])
+    if 'annotated_video' in summary:
+        video = summary['annotated_video']
+        print(f"Vídeo anotado em '{video['path']}': {video['written']} frame(s) gravado(s), "
+              f"{video['dropped']} descartado(s).")
+    if profiler.stats_path:
+        print(f"Estatísticas por estágio em '{profiler.stats_path}'.")
+    return summary
+
+def _run_headless_zones(video_path, zones, output_path, ignored, profiler=NULL_PROFILER, **kwargs):
+    from .zones import process_zones, print_zone_summary # Import tardio: zones depende deste módulo
+    for option, value in ignored.items():
+        if value:
+            logger.warning("%s não é suportado com várias zonas; ignorado.", option)
+    summary = process_zones(video_path, zones, output_path, profiler=profiler, **kwargs)
+    if summary is None:
+        return None
+    print_zone_summary(summary)
+    if 'prefetch' in summary:
+        print_prefetch_stats(summary['prefetch'])
+    if 'live' in summary:
+        print_live_stats(summary['live'])
+    if profiler.stats_path:
+        print(f"Estatísticas de decodificação em '{profiler.stats_path}' (por zona no resumo).")
+    return summary
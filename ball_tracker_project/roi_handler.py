@@ -3,15 +3,73 @@ import cv2
 import numpy as np
 import json
 import os
+from collections import namedtuple
 from .config import Config 
 
+# Retângulo envolvente da ROI (x, y, w, h) no frame inteiro, máscara do tamanho do recorte
+# e pontos do polígono em coordenadas do recorte.
+ROICrop = namedtuple('ROICrop', ['rect', 'mask', 'points'])
+
+# Nome da zona quando o arquivo de ROI tem um único polígono (formato antigo: lista de pontos)
+DEFAULT_ZONE = "roi"
+
+def read_roi_zones(config_file):
+    """
+    Lê o arquivo de ROI como {nome da zona: [(x, y), ...]} (na ordem do arquivo).
+    Aceita o formato antigo (uma lista de pontos, vira a zona DEFAULT_ZONE) e o de
+    várias zonas ({"canal_1": [[x, y], ...], "canal_2": [...]}). Levanta ValueError se inválido.
+    """
+    with open(config_file, 'r') as f:
+        data = json.load(f)
+    zones = data if isinstance(data, dict) else {DEFAULT_ZONE: data}
+    for name, points in zones.items():
+        if not (isinstance(points, list) and len(points) > 2 and
+                all(isinstance(p, list) and len(p) == 2 for p in points)):
+            raise ValueError(f"zona '{name}' não contém pontos válidos")
+    return {name: [tuple(p) for p in points] for name, points in zones.items()}
+
+def _is_multi_zone(zones):
+    """True se as zonas lidas vêm do formato de várias zonas (e não de uma lista de pontos)."""
+    return bool(zones) and list(zones) != [DEFAULT_ZONE]
+
+def load_roi_zones(config_file=None, config=Config):
+    """{nome: ROIHandler} de todas as zonas do arquivo (vazio se não existir ou for inválido)."""
+    config_file = config_file or config.ROI_CONFIG_FILE
+    if not os.path.exists(config_file):
+        return {}
+    try:
+        names = list(read_roi_zones(config_file))
+    except Exception as e:
+        print(f"Erro ao carregar ROI de '{config_file}': {e}")
+        return {}
+    zones = {}
+    for name in names:
+        handler = ROIHandler(None, config_file=config_file, config=config, zone=name)
+        if handler.load_roi(verbose=False):
+            zones[name] = handler
+    return zones
+
+def crop_to_rect(frame, rect):
+    """Recorte (view, sem cópia) do frame no retângulo (x, y, w, h)."""
+    x, y, w, h = rect
+    return frame[y:y + h, x:x + w]
+
 class ROIHandler:
-    def __init__(self, frame_for_selection, config_file=Config.ROI_CONFIG_FILE):
+    """
+    ROI poligonal de uma zona. `zone` escolhe a zona num arquivo com várias
+    (None = a primeira ao carregar, que passa a ser a zona salva; num arquivo de ROI
+    única, salvar mantém esse formato).
+    """
+    def __init__(self, frame_for_selection, config_file=None, config=Config, zone=None):
+        self.config = config
+        self.zone = zone
         self.points = []
-        self.frame_copy = frame_for_selection.copy()
+        # frame_for_selection pode ser None quando a ROI só será carregada do arquivo (modo headless)
+        self.frame_copy = frame_for_selection.copy() if frame_for_selection is not None else None
         self.original_frame = frame_for_selection # Guardar para reset
         self.is_defined = False
-        self.config_file = config_file
+        self.config_file = config_file or config.ROI_CONFIG_FILE
+        self._crop_cache = None # (frame_shape, ROICrop)
         self.window_name = "Selecione ROI - Esq: Ponto. Enter: Finalizar. r: Reset, q: Sair"
 
     def _mouse_callback(self, event, x, y, flags, param):
@@ -27,16 +85,20 @@ class ROIHandler:
 
     def select_roi_interactively(self):
         """Permite ao usuário selecionar a ROI interativamente."""
+        if self.original_frame is None:
+            print("ERRO [ROI]: Nenhum frame disponível para seleção interativa.")
+            return False
         self.points = [] # Reset para nova seleção
         self.is_defined = False
         self.frame_copy = self.original_frame.copy()
 
         cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
         h_roi, w_roi = self.frame_copy.shape[:2]
-        if h_roi > Config.WINDOW_MAX_HEIGHT:
+        max_height = self.config.WINDOW_MAX_HEIGHT
+        if h_roi > max_height:
             aspect_ratio_roi = w_roi / h_roi
-            display_width_roi = int(Config.WINDOW_MAX_HEIGHT * aspect_ratio_roi)
-            cv2.resizeWindow(self.window_name, display_width_roi, Config.WINDOW_MAX_HEIGHT)
+            display_width_roi = int(max_height * aspect_ratio_roi)
+            cv2.resizeWindow(self.window_name, display_width_roi, max_height)
 
         cv2.setMouseCallback(self.window_name, self._mouse_callback)
         print(f"\n--- Instruções Seleção ROI: Janela '{self.window_name}' ---")
@@ -52,6 +114,7 @@ class ROIHandler:
             if key == 13:  # Enter
                 if len(self.points) > 2:
                     self.is_defined = True
+                    self._crop_cache = None
                     cv2.line(self.frame_copy, self.points[-1], self.points[0], (0, 255, 0), 2)
                     cv2.imshow(self.window_name, self.frame_copy)
                     print("ROI definida com pontos:", self.points)
@@ -72,28 +135,52 @@ class ROIHandler:
         cv2.destroyWindow(self.window_name)
         return self.is_defined
 
+    def _existing_zones(self):
+        """Zonas já gravadas no arquivo ({} se não existir ou for inválido: será sobrescrito)."""
+        if not os.path.exists(self.config_file):
+            return {}
+        try:
+            return read_roi_zones(self.config_file)
+        except (ValueError, OSError):
+            return {}
+
     def save_roi(self):
         if self.is_defined and self.points:
             try:
+                zones = self._existing_zones()
+                if self.zone is None and _is_multi_zone(zones):
+                    self.zone = next(iter(zones)) # Mesma zona que load_roi usaria
+                if self.zone is None:
+                    data = self.points
+                else:
+                    # Preserva as outras zonas do arquivo (um arquivo antigo vira a zona DEFAULT_ZONE)
+                    data = dict(zones)
+                    data[self.zone] = self.points
                 with open(self.config_file, 'w') as f:
-                    json.dump(self.points, f)
-                print(f"Pontos da ROI salvos em '{self.config_file}'")
+                    json.dump(data, f)
+                zone_info = f" (zona '{self.zone}')" if self.zone is not None else ""
+                print(f"Pontos da ROI{zone_info} salvos em '{self.config_file}'")
             except Exception as e:
                 print(f"Erro ao salvar pontos da ROI: {e}")
 
-    def load_roi(self):
+    def load_roi(self, verbose=True):
         if os.path.exists(self.config_file):
             try:
-                with open(self.config_file, 'r') as f:
-                    loaded_points = json.load(f)
-                if isinstance(loaded_points, list) and \
-                   all(isinstance(p, list) and len(p) == 2 for p in loaded_points):
-                    self.points = [tuple(p) for p in loaded_points]
+                zones = read_roi_zones(self.config_file)
+                name = self.zone if self.zone is not None else next(iter(zones), None)
+                if name in zones:
+                    if self.zone is None and len(zones) > 1:
+                        print(f"AVISO: '{self.config_file}' tem {len(zones)} zonas; usando '{name}'.")
+                    if self.zone is None and _is_multi_zone(zones):
+                        self.zone = name # Ao salvar, atualiza só esta zona e mantém as outras
+                    self.points = zones[name]
                     self.is_defined = True
-                    print(f"Pontos da ROI carregados de '{self.config_file}': {self.points}")
+                    self._crop_cache = None
+                    if verbose:
+                        print(f"Pontos da ROI carregados de '{self.config_file}': {self.points}")
                     return True
                 else:
-                    print(f"Arquivo '{self.config_file}' não contém pontos válidos.")
+                    print(f"Arquivo '{self.config_file}' não contém a zona '{name}'.")
             except Exception as e:
                 print(f"Erro ao carregar ROI de '{self.config_file}': {e}")
         return False
@@ -106,5 +193,28 @@ class ROIHandler:
         cv2.fillPoly(mask, polygon_points_np, 255)
         return mask
 
+    def get_crop(self, frame_shape):
+        """
+        Retorna o ROICrop para frames de `frame_shape`. Calculado uma única vez por
+        tamanho de frame, para que o processamento por frame trabalhe só no recorte.
+        """
+        if not self.is_defined or not self.points:
+            return None
+        shape_key = tuple(frame_shape[:2])
+        if self._crop_cache is None or self._crop_cache[0] != shape_key:
+            frame_h, frame_w = shape_key
+            polygon_np = np.array(self.points, dtype=np.int32)
+            x, y, w, h = cv2.boundingRect(polygon_np)
+            x0, y0 = max(0, x), max(0, y)
+            x1, y1 = min(frame_w, x + w), min(frame_h, y + h)
+            rect = (x0, y0, x1 - x0, y1 - y0)
+
+            local_polygon = polygon_np - np.array([x0, y0], dtype=np.int32)
+            mask = np.zeros((rect[3], rect[2]), dtype=np.uint8)
+            cv2.fillPoly(mask, [local_polygon], 255)
+            local_points = [(int(px), int(py)) for px, py in local_polygon]
+            self._crop_cache = (shape_key, ROICrop(rect, mask, local_points))
+        return self._crop_cache[1]
+
     def get_points(self):
         return self.points if self.is_defined else None
\ No newline at end of file
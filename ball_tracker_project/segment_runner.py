@@ -0,0 +1,238 @@
+# segment_runner.py
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from .config import Config, add_profile_arguments, profile_from_args
+from .pipeline import load_saved_roi, process_video, build_frame_cache
+from .frame_cache import FrameCache
+from .instrumentation import LOG_FORMAT
+from .track_store import TrackStore, STATUS_ACTIVE, open_track_writer
+
+def plan_segments(total_frames, n_segments, overlap):
+    """
+    Divide [0, total_frames) em trechos. Retorna uma lista de (start, end, boundary):
+    o worker processa os índices [start, end) e só os frames após `boundary` pertencem
+    ao trecho; os `overlap` frames anteriores servem de aquecimento e para a costura.
+    O último trecho tem end=None (lê até o fim, pois CAP_PROP_FRAME_COUNT é estimado).
+    """
+    # Trechos menores que 2x a sobreposição gastariam mais tempo aquecendo do que processando
+    n_segments = max(1, min(n_segments, total_frames // max(1, 2 * overlap)))
+    edges = np.linspace(0, total_frames, n_segments + 1).astype(int)
+    segments = []
+    for i in range(n_segments):
+        boundary = int(edges[i])
+        start = max(0, boundary - overlap)
+        end = int(edges[i + 1]) if i < n_segments - 1 else None
+        segments.append((start, end, boundary))
+    return segments
+
+def count_unique_frames(segment_frames, segments):
+    """
+    Frames distintos do vídeo a partir dos frames processados por trecho: os de sobreposição
+    (boundary - start, aquecimento) já foram contados no trecho anterior.
+    """
+    return sum(max(0, n - (boundary - start)) for n, (start, _, boundary) in zip(segment_frames, segments))
+
+def _active_tracks(rows):
+    """{track_id: (frames, centers)} com apenas as linhas ativas, ordenadas por frame."""
+    active = rows[rows['status'] == STATUS_ACTIVE]
+    active = active[np.lexsort((active['frame'], active['track_id']))]
+    ids, starts = np.unique(active['track_id'], return_index=True)
+    tracks = {}
+    for track_id, chunk in zip(ids, np.split(active, starts[1:])):
+        centers = np.stack([chunk['center_x'], chunk['center_y']], axis=1).astype(np.float64)
+        tracks[int(track_id)] = (chunk['frame'], centers)
+    return tracks
+
+def _stitch_cost(prev_track, cur_track, max_gap):
+    """Distância média nos frames em comum; sem sobreposição, erro da extrapolação a velocidade constante."""
+    frames_p, centers_p = prev_track
+    frames_c, centers_c = cur_track
+    _, idx_p, idx_c = np.intersect1d(frames_p, frames_c, assume_unique=True, return_indices=True)
+    if len(idx_p) > 0:
+        return float(np.linalg.norm(centers_p[idx_p] - centers_c[idx_c], axis=1).mean())
+
+    gap = int(frames_c[0] - frames_p[-1])
+    if gap <= 0 or gap > max_gap:
+        return np.inf
+    velocity = centers_p[-1] - centers_p[-2] if len(centers_p) > 1 else np.zeros(2)
+    predicted = centers_p[-1] + velocity * gap
+    return float(np.linalg.norm(centers_c[0] - predicted))
+
+def match_tracks(prev_rows, cur_rows, max_distance, max_gap):
+    """
+    Associa tracks do trecho atual (IDs locais) a tracks do anterior (IDs globais).
+    Atribuição gulosa pelo menor custo. Retorna {id_local: id_global}.
+    """
+    prev_tracks = _active_tracks(prev_rows)
+    cur_tracks = _active_tracks(cur_rows)
+    if not prev_tracks or not cur_tracks:
+        return {}
+
+    prev_ids = list(prev_tracks)
+    cur_ids = list(cur_tracks)
+    cost = np.full((len(prev_ids), len(cur_ids)), np.inf)
+    for i, prev_id in enumerate(prev_ids):
+        for j, cur_id in enumerate(cur_ids):
+            cost[i, j] = _stitch_cost(prev_tracks[prev_id], cur_tracks[cur_id], max_gap)
+
+    matches = {}
+    used_prev = set()
+    for flat in np.argsort(cost, axis=None):
+        i, j = np.unravel_index(flat, cost.shape)
+        if cost[i, j] > max_distance:
+            break
+        if i in used_prev or cur_ids[j] in matches:
+            continue
+        matches[cur_ids[j]] = prev_ids[i]
+        used_prev.add(i)
+    return matches
+
+def stitch_segments(segment_rows, boundaries, max_distance=None, max_gap=None, config=Config):
+    """
+    Junta os resultados dos trechos com IDs globais. `segment_rows[i]` tem IDs locais
+    ao trecho i; as linhas com frame <= boundaries[i] (sobreposição, já cobertas pelo
+    trecho anterior) são descartadas depois de usadas na costura.
+    Retorna (lista de arrays por trecho com IDs globais, número de tracks costurados).
+    """
+    max_distance = max_distance if max_distance is not None else config.STITCH_MAX_DISTANCE
+    max_gap = max_gap if max_gap is not None else config.STITCH_MAX_GAP_FRAMES
+    next_global_id = 0
+    prev_rows = None
+    stitched = []
+    n_stitched = 0
+    for rows, boundary in zip(segment_rows, boundaries):
+        id_map = {}
+        if prev_rows is not None and len(rows) and len(prev_rows):
+            id_map = match_tracks(prev_rows, rows, max_distance, max_gap)
+            n_stitched += len(id_map)
+
+        local_ids = np.unique(rows['track_id'])
+        global_ids = np.empty(len(local_ids), dtype=np.int32)
+        for k, local_id in enumerate(local_ids):
+            if int(local_id) in id_map:
+                global_ids[k] = id_map[int(local_id)]
+            else:
+                global_ids[k] = next_global_id
+                next_global_id += 1
+
+        remapped = rows.copy()
+        if len(rows):
+            remapped['track_id'] = global_ids[np.searchsorted(local_ids, rows['track_id'])]
+        stitched.append(remapped[remapped['frame'] > boundary])
+        prev_rows = remapped
+    return stitched, n_stitched
+
+def _init_worker(log_level=logging.WARNING):
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+    cv2.setNumThreads(1)
+
+def _run_segment(video_path, roi_file, start, end, tracker_type, config, frame_cache=None):
+    roi_manager = load_saved_roi(roi_file, config)
+    if roi_manager is None:
+        return None, None
+    track_store = TrackStore() # Em memória: as linhas voltam ao processo principal para a costura
+    summary = process_video(video_path, roi_manager, track_store, tracker_type=tracker_type,
+                            start_frame=start, end_frame=end, config=config, frame_cache=frame_cache)
+    return summary, track_store.to_array()
+
+def run_segmented(video_path, roi_file, output_path, n_segments=None, workers=None,
+                  overlap=None, tracker_type=None, log_level=logging.WARNING, config=Config, frame_cache=None):
+    """
+    Processa um único vídeo em trechos paralelos (um processo por trecho) e costura
+    os tracks que atravessam as fronteiras. Retorna o resumo da execução (ou None em erro).
+    Com `frame_cache` (FrameCache), o vídeo é decodificado uma vez para o cache (se preciso)
+    e cada processo lê o seu trecho direto do arquivo mapeado, sem decodificação nem seek.
+    """
+    cached = None
+    if frame_cache is not None:
+        roi_manager = load_saved_roi(roi_file, config)
+        if roi_manager is None:
+            return None
+        cached = build_frame_cache(video_path, roi_manager, frame_cache, config=config)
+        if cached is None:
+            # Vídeo ilegível (o erro reaparece abaixo) ou maior que o limite do cache: decodifica cada trecho
+            frame_cache = None
+    if cached is not None:
+        total_frames = len(cached) # Contagem exata, ao contrário de CAP_PROP_FRAME_COUNT
+    else:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            print(f"Erro: Não foi possível abrir o vídeo em '{video_path}'")
+            return None
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+    overlap = overlap if overlap is not None else config.SEGMENT_OVERLAP_FRAMES
+
+    workers = workers or os.cpu_count() or 1
+    segments = plan_segments(total_frames, n_segments or workers, overlap)
+    print(f"[Segmentos] {total_frames} frames em {len(segments)} trecho(s), {workers} processo(s).")
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_level,)) as pool:
+        futures = [pool.submit(_run_segment, video_path, roi_file, start, end, tracker_type, config, frame_cache)
+                   for start, end, _ in segments]
+        results = [f.result() for f in futures]
+
+    if any(summary is None for summary, _ in results):
+        print("Erro: Falha ao processar um ou mais trechos.")
+        return None
+
+    segment_rows = [rows for _, rows in results]
+    stitched, n_stitched = stitch_segments(segment_rows, [b for _, _, b in segments], config=config)
+
+    writer = open_track_writer(output_path)
+    total_rows = 0
+    for rows in stitched:
+        if len(rows):
+            writer.write(rows)
+            total_rows += len(rows)
+    writer.close()
+
+    elapsed = time.perf_counter() - start_time
+    frames = count_unique_frames([summary['frames'] for summary, _ in results], segments)
+    n_tracks = len(np.unique(np.concatenate(stitched)['track_id'])) if total_rows else 0
+    summary = {
+        'video': video_path,
+        'segments': len(segments),
+        'frames': frames,
+        'seconds': elapsed,
+        'fps': frames / elapsed if elapsed > 0 else 0.0,
+        'tracks': n_tracks,
+        'stitched_tracks': n_stitched,
+        'rows': total_rows,
+        'output': writer.path,
+    }
+    print(f"[Segmentos] Concluído em {elapsed:.1f}s ({summary['fps']:.1f} FPS agregados): "
+          f"{n_tracks} tracks, {n_stitched} costurados entre trechos. Resultados em '{writer.path}'.")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Processa um vídeo longo em trechos paralelos.")
+    parser.add_argument("video", help="Caminho do vídeo.")
+    parser.add_argument("--roi", default=None, help="Arquivo JSON com os pontos da ROI (padrão: o do perfil).")
+    parser.add_argument("--output", default="tracking_results.npz", help="Arquivo de trajetórias (.csv/.npz/.parquet).")
+    parser.add_argument("--segments", type=int, default=None, help="Número de trechos (padrão: número de processos).")
+    parser.add_argument("--workers", type=int, default=None, help="Número de processos (padrão: núcleos da máquina).")
+    parser.add_argument("--overlap", type=int, default=None,
+                        help="Frames de sobreposição entre trechos (padrão: SEGMENT_OVERLAP_FRAMES do perfil).")
+    parser.add_argument("--frame-cache", default=None,
+                        help="Pasta do cache de frames pré-processados (decodifica o vídeo uma vez e os "
+                             "processos leem os trechos do arquivo mapeado).")
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Nível de log dos processos.")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format=LOG_FORMAT)
+    config = profile_from_args(args)
+    frame_cache = FrameCache(args.frame_cache, config=config) if args.frame_cache else None
+    return run_segmented(args.video, args.roi or config.ROI_CONFIG_FILE, args.output, n_segments=args.segments,
+                         workers=args.workers, overlap=args.overlap, log_level=args.log_level, config=config,
+                         frame_cache=frame_cache)
+
+if __name__ == "__main__":
+    main()
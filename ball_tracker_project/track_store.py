@@ -0,0 +1,172 @@
+# track_store.py
+import logging
+import os
+import zipfile
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # pyarrow é opcional: só é necessário para saída em Parquet
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+STATUS_LOST = 0
+STATUS_ACTIVE = 1
+STATUS_PREDICTED = 2 # Sem medição neste frame: posição prevista pelo modelo de movimento
+
+# Uma linha por (frame, track). Colunas de tamanho fixo para crescer em blocos sem listas de tuplas.
+TRACK_DTYPE = np.dtype([
+    ('frame', np.int64),
+    ('track_id', np.int32),
+    ('x', np.float32),
+    ('y', np.float32),
+    ('w', np.float32),
+    ('h', np.float32),
+    ('center_x', np.float32),
+    ('center_y', np.float32),
+    ('status', np.int8),
+])
+
+_CSV_FORMATS = ['%d', '%d', '%.2f', '%.2f', '%.2f', '%.2f', '%.2f', '%.2f', '%d']
+
+class CSVTrackWriter:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w', newline='')
+        self._file.write(','.join(TRACK_DTYPE.names) + '\n')
+
+    def write(self, rows):
+        np.savetxt(self._file, rows, fmt=_CSV_FORMATS, delimiter=',')
+
+    def close(self):
+        self._file.close()
+
+class NPZTrackWriter:
+    """Grava cada bloco como um array 'chunk_NNNNNN' dentro do .npz (lido com load_tracks)."""
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+        self._chunk_index = 0
+
+    def write(self, rows):
+        with self._zip.open(f'chunk_{self._chunk_index:06d}.npy', 'w', force_zip64=True) as f:
+            np.lib.format.write_array(f, np.ascontiguousarray(rows), allow_pickle=False)
+        self._chunk_index += 1
+
+    def close(self):
+        self._zip.close()
+
+class ParquetTrackWriter:
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+
+    def write(self, rows):
+        table = pa.Table.from_arrays([pa.array(rows[name]) for name in TRACK_DTYPE.names],
+                                     names=list(TRACK_DTYPE.names))
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def open_track_writer(path):
+    """Escolhe o writer pela extensão: .csv, .npz ou .parquet."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        if pa is not None:
+            return ParquetTrackWriter(path)
+        fallback = os.path.splitext(path)[0] + '.npz'
+        logger.warning("pyarrow não instalado; gravando trajetórias em '%s' em vez de Parquet.", fallback)
+        return NPZTrackWriter(fallback)
+    if ext == '.npz':
+        return NPZTrackWriter(path)
+    return CSVTrackWriter(path)
+
+def load_tracks(path):
+    """Lê de volta um arquivo gravado por open_track_writer como um array TRACK_DTYPE."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npz':
+        with np.load(path) as data:
+            chunks = [data[name] for name in sorted(data.files)]
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=TRACK_DTYPE)
+    if ext == '.parquet':
+        table = pq.read_table(path)
+        rows = np.empty(table.num_rows, dtype=TRACK_DTYPE)
+        for name in TRACK_DTYPE.names:
+            rows[name] = table.column(name).to_numpy()
+        return rows
+    return np.atleast_1d(np.loadtxt(path, dtype=TRACK_DTYPE, delimiter=',', skiprows=1))
+
+class TrackStore:
+    """
+    Armazenamento colunar das trajetórias: um bloco pré-alocado de `chunk_size` linhas
+    é preenchido a cada frame e, quando cheio, é enviado ao writer (streaming) ou
+    guardado em memória se não houver writer.
+    """
+    def __init__(self, writer=None, chunk_size=65536):
+        self.writer = writer
+        self.chunk_size = chunk_size
+        self._chunk = np.empty(chunk_size, dtype=TRACK_DTYPE)
+        self._n = 0
+        self._kept_chunks = [] # Só usado sem writer
+        self.total_rows = 0
+
+    def append(self, frame_index, track_ids, bboxes, statuses):
+        """
+        Adiciona as linhas de um frame. track_ids e statuses têm tamanho N;
+        bboxes é (N, 4) com (x, y, w, h).
+        """
+        n = len(track_ids)
+        if n == 0:
+            return
+        bboxes = np.asarray(bboxes, dtype=np.float32).reshape(n, 4)
+        track_ids = np.asarray(track_ids)
+        statuses = np.asarray(statuses)
+        start = 0
+        while start < n:
+            take = min(n - start, self.chunk_size - self._n)
+            rows = self._chunk[self._n:self._n + take]
+            b = bboxes[start:start + take]
+            rows['frame'] = frame_index
+            rows['track_id'] = track_ids[start:start + take]
+            rows['x'] = b[:, 0]
+            rows['y'] = b[:, 1]
+            rows['w'] = b[:, 2]
+            rows['h'] = b[:, 3]
+            rows['center_x'] = b[:, 0] + b[:, 2] / 2
+            rows['center_y'] = b[:, 1] + b[:, 3] / 2
+            rows['status'] = statuses[start:start + take]
+            self._n += take
+            start += take
+            if self._n == self.chunk_size:
+                self.flush()
+        self.total_rows += n
+
+    def flush(self):
+        if self._n == 0:
+            return
+        rows = self._chunk[:self._n]
+        if self.writer is not None:
+            self.writer.write(rows)
+        else:
+            self._kept_chunks.append(rows.copy())
+        self._n = 0
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+    def to_array(self):
+        """Todas as linhas mantidas em memória (apenas quando não há writer)."""
+        chunks = self._kept_chunks + ([self._chunk[:self._n].copy()] if self._n else [])
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=TRACK_DTYPE)
+
+    def __len__(self):
+        return self.total_rows
@@ -1,11 +1,60 @@
 # tracker_manager.py
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
 from .config import Config
+from .track_store import STATUS_ACTIVE, STATUS_LOST
+
+logger = logging.getLogger(__name__)
+
+def _color_for_id(track_id):
+    """Cor BGR determinística por ID (a mesma bola mantém a cor entre execuções)."""
+    rng = np.random.RandomState(track_id)
+    return tuple(int(c) for c in rng.randint(64, 256, size=3))
+
 class TrackerManager:
-    def __init__(self, tracker_type=Config.TRACKER_TYPE):
+    """
+    Um tracker OpenCV (CSRT/KCF/MOSSE) por bola.
+
+    Quando `detect_fn` é fornecida, um track que falha não é descartado: fica "perdido"
+    por até `max_lost_frames` frames, durante os quais o Hough roda só numa janela pequena
+    em torno da posição prevista (velocidade constante). Se a bola reaparecer, o tracker é
+    reiniciado com o mesmo ID. A cada `redetect_interval` frames uma detecção no recorte
+    inteiro cria trackers apenas para as bolas que não correspondem a nenhum track.
+    Tracks expirados saem de `trackers` (só contam em `finished_tracks`; o histórico fica
+    no track_store), então o custo por frame depende só dos tracks vivos.
+
+    Com `update_workers` > 1 os tracker.update de cada frame rodam num pool de threads
+    persistente (o OpenCV libera o GIL durante o update), todos lendo o mesmo frame.
+    Os resultados voltam na ordem dos tracks e são aplicados em sequência, então bbox,
+    trajetória, estado e IDs são idênticos aos do modo sequencial.
+    Parâmetros não informados vêm do perfil `config`.
+    """
+    def __init__(self, tracker_type=None, track_store=None, trajectory_maxlen=None, offset=(0, 0),
+                 detect_fn=None, redetect_interval=None, max_lost_frames=None, redetect_margin=None,
+                 update_workers=None, config=Config):
+        tracker_type = tracker_type or config.TRACKER_TYPE
         self.trackers = []
+        # Os trackers trabalham no recorte da ROI; bbox e trajetória são guardadas no frame inteiro
+        self.offset = offset
         self.tracker_type = tracker_type
+        self.track_store = track_store # TrackStore opcional: recebe uma linha por tracker por frame
+        self.trajectory_maxlen = trajectory_maxlen # None = trajetória completa em memória
+        self.next_id = 0 # Próximo ID livre; cresce entre reinicializações para não repetir IDs
+        self.finished_tracks = 0 # Tracks expirados e descartados
+        # detect_fn(frame, rect=None) -> bolas em coordenadas do frame inteiro; rect (x, y, w, h) no frame recebido
+        self.detect_fn = detect_fn
+        self.redetect_interval = redetect_interval if redetect_interval is not None else config.REDETECT_INTERVAL
+        self.max_lost_frames = max_lost_frames if max_lost_frames is not None else config.MAX_LOST_FRAMES
+        self.redetect_margin = redetect_margin if redetect_margin is not None else config.REDETECT_WINDOW_MARGIN
+        self._frames_since_redetect = 0
+        update_workers = update_workers if update_workers is not None else config.TRACKER_UPDATE_WORKERS
+        self.update_workers = update_workers if update_workers > 0 else (os.cpu_count() or 1)
+        self.parallel_min_tracks = config.TRACKER_PARALLEL_MIN_TRACKS
+        self._pool = None # Criado no primeiro frame com tracks suficientes
         self._tracker_creation_func = self._get_tracker_creation_func(tracker_type)
 
     def _get_tracker_creation_func(self, tracker_name):
@@ -17,84 +66,294 @@ class TrackerManager:
             try:
                 return cv2.legacy.TrackerMOSSE_create
             except AttributeError:
-                print("ERRO: cv2.legacy não encontrado ou TrackerMOSSE_create indisponível.")
-                print("Tente 'pip install opencv-contrib-python'.")
-                print("Retornando para CSRT como padrão se possível.")
+                logger.error("cv2.legacy não encontrado ou TrackerMOSSE_create indisponível. "
+                             "Tente 'pip install opencv-contrib-python'. Usando CSRT.")
                 return cv2.TrackerCSRT_create # Fallback
         else:
-            print(f"AVISO: Tipo de tracker '{tracker_name}' desconhecido. Usando CSRT.")
+            logger.warning("Tipo de tracker '%s' desconhecido. Usando CSRT.", tracker_name)
             return cv2.TrackerCSRT_create
 
-    def initialize_trackers(self, frame, detected_balls_info):
+    def _new_trajectory(self, first_point):
+        if self.trajectory_maxlen is None:
+            return [first_point]
+        return deque([first_point], maxlen=self.trajectory_maxlen)
+
+    def _record(self, frame_index, t_infos, statuses):
+        if self.track_store is None or frame_index is None or not t_infos:
+            return
+        self.track_store.append(frame_index,
+                                [t['id'] for t in t_infos],
+                                [t['bbox'] for t in t_infos],
+                                statuses)
+
+    def _create_tracker(self, frame, ball_info):
+        """
+        Cria e inicializa um tracker OpenCV para a bola. Retorna (tracker, bbox no frame
+        inteiro) ou None se a bbox for inválida ou a inicialização falhar.
+        """
+        try:
+            tracker = self._tracker_creation_func()
+        except Exception as e:
+            logger.error("Erro ao criar tracker do tipo %s: %s", self.tracker_type, e)
+            return None
+
+        frame_h, frame_w = frame.shape[:2]
+        offset_x, offset_y = self.offset
+        x_init, y_init, w_init, h_init = ball_info['bbox_initial']
+        x_init -= offset_x
+        y_init -= offset_y
+
+        # Garante que a bounding box esteja dentro dos limites e tenha tamanho > 0
+        x = max(0, x_init)
+        y = max(0, y_init)
+        w = min(w_init, frame_w - x)
+        h = min(h_init, frame_h - y)
+
+        if w <= 0 or h <= 0:
+            logger.warning("BBox inválida para bola ID %s após ajuste: %s. Pulando.", ball_info['id'], (x, y, w, h))
+            return None
+
+        adjusted_bbox = (x, y, w, h)
+
+        try:
+            tracker.init(frame, adjusted_bbox)
+        except Exception as e:
+            logger.error("Exceção ao inicializar tracker ID %s: %s", ball_info['id'], e)
+            return None
+        return tracker, (x + offset_x, y + offset_y, w, h)
+
+    def _add_track(self, frame, ball_info, track_id):
+        created = self._create_tracker(frame, ball_info)
+        if created is None:
+            return None
+        tracker, bbox = created
+        t_info = {
+            'id': track_id,
+            'tracker_obj': tracker,
+            'bbox': bbox,
+            'trajectory': self._new_trajectory(ball_info['center']),
+            'active': True,
+            'color': _color_for_id(track_id),
+            'radius': ball_info['radius'],
+            'last_center': (float(ball_info['center'][0]), float(ball_info['center'][1])),
+            'velocity': (0.0, 0.0),
+            'lost_frames': 0, # > 0: perdido, mas ainda recuperável
+            'expired': False, # Perdido há mais de max_lost_frames: não será mais recuperado
+        }
+        self.trackers.append(t_info)
+        self.next_id = max(self.next_id, track_id + 1)
+        return t_info
+
+    def initialize_trackers(self, frame, detected_balls_info, frame_index=None):
+        """Descarta todos os tracks e cria um tracker por bola detectada (mantendo os IDs das bolas)."""
         self.trackers = []
         if not detected_balls_info:
-            print("[TrackerManager] Nenhuma bola detectada para inicializar trackers.")
+            logger.info("Nenhuma bola detectada para inicializar trackers.")
             return False
         if not self._tracker_creation_func:
-            print("[TrackerManager] ERRO: Função de criação do tracker não definida.")
+            logger.error("Função de criação do tracker não definida.")
             return False
 
-        frame_h, frame_w = frame.shape[:2]
-        initialization_successful = False
-
         for ball_info in detected_balls_info:
-            try:
-                tracker = self._tracker_creation_func()
-            except Exception as e:
-                print(f"[TrackerManager] ERRO ao criar tracker do tipo {self.tracker_type}: {e}")
-                continue # Pula para a próxima bola
+            logger.debug("Inicializando ID %s com BBox: %s", ball_info['id'], ball_info['bbox_initial'])
+            self._add_track(frame, ball_info, ball_info['id'])
 
-            x_init, y_init, w_init, h_init = ball_info['bbox_initial']
+        if self.trackers:
+            self._record(frame_index, self.trackers, [STATUS_ACTIVE] * len(self.trackers))
+            logger.info("%d trackers inicializados com sucesso.", len(self.trackers))
+            return True
+        logger.warning("Nenhum tracker foi inicializado com sucesso.")
+        return False
 
-            # Garante que a bounding box esteja dentro dos limites e tenha tamanho > 0
-            x = max(0, x_init)
-            y = max(0, y_init)
-            w = min(w_init, frame_w - x)
-            h = min(h_init, frame_h - y)
+    def _recoverable(self):
+        return [t for t in self.trackers if not t['active'] and not t['expired']]
 
-            if w <= 0 or h <= 0:
-                print(f"[TrackerManager] AVISO: BBox inválida para bola ID {ball_info['id']} após ajuste: {(x,y,w,h)}. Pulando.")
-                continue
-            
-            adjusted_bbox = (x, y, w, h)
+    @staticmethod
+    def _predicted_center(t_info):
+        vx, vy = t_info['velocity']
+        n = t_info['lost_frames']
+        return (t_info['last_center'][0] + vx * n, t_info['last_center'][1] + vy * n)
+
+    def _reacquire(self, frame, t_info, ball_info):
+        """Reinicia o tracker de um track perdido na nova detecção, mantendo o ID."""
+        created = self._create_tracker(frame, ball_info)
+        if created is None:
+            return False
+        t_info['tracker_obj'], t_info['bbox'] = created
+        center = (float(ball_info['center'][0]), float(ball_info['center'][1]))
+        n = max(1, t_info['lost_frames'])
+        t_info['velocity'] = ((center[0] - t_info['last_center'][0]) / n,
+                              (center[1] - t_info['last_center'][1]) / n)
+        t_info['last_center'] = center
+        t_info['radius'] = ball_info['radius']
+        t_info['trajectory'].append(ball_info['center'])
+        t_info['active'] = True
+        t_info['lost_frames'] = 0
+        return True
 
-            print(f"--- Tentando inicializar ID {ball_info['id']} com BBox: {adjusted_bbox} ---")
+    @staticmethod
+    def _is_tracked(ball_info, tracks):
+        """True se a bola está a menos de um diâmetro do centro de algum dos tracks."""
+        bx, by = ball_info['center']
+        return any((bx - t['last_center'][0]) ** 2 + (by - t['last_center'][1]) ** 2 <= (2 * t['radius']) ** 2
+                   for t in tracks)
 
+    def add_detections(self, frame, detected_balls_info, frame_index=None):
+        """
+        Incorpora detecções sem descartar os tracks existentes: bolas sobre um track ativo
+        são ignoradas, bolas perto da posição prevista de um track perdido o recuperam
+        (mesmo ID) e apenas as restantes criam trackers novos.
+        Retorna quantos tracks foram recuperados ou criados.
+        """
+        changed = []
+        active = [t for t in self.trackers if t['active']]
+        recoverable = self._recoverable()
+        for ball_info in detected_balls_info:
+            if self._is_tracked(ball_info, active):
+                continue # Já rastreada
+            bx, by = ball_info['center']
 
-            try:
-                tracker.init(frame, adjusted_bbox)
-                initialization_successful = True
-            except Exception as e:
-                print(f"[TrackerManager] Exceção ao inicializar tracker ID {ball_info['id']}: {e}")
-                initialization_successful = False
-        
-        if initialization_successful:
-            print(f"[TrackerManager] {len(self.trackers)} trackers inicializados com sucesso.")
-        else:
-            print("[TrackerManager] Nenhum tracker foi inicializado com sucesso.")
-        return initialization_successful
+            best, best_dist = None, None
+            for t in recoverable:
+                px, py = self._predicted_center(t)
+                dist = ((bx - px) ** 2 + (by - py) ** 2) ** 0.5
+                reach = self.redetect_margin + 2 * t['radius'] + t['lost_frames'] * np.hypot(*t['velocity'])
+                if dist <= reach and (best_dist is None or dist < best_dist):
+                    best, best_dist = t, dist
+
+            if best is not None:
+                if self._reacquire(frame, best, ball_info):
+                    recoverable.remove(best)
+                    active.append(best)
+                    changed.append(best)
+            else:
+                t_info = self._add_track(frame, ball_info, self.next_id)
+                if t_info is not None:
+                    active.append(t_info)
+                    changed.append(t_info)
+
+        self._record(frame_index, changed, [STATUS_ACTIVE] * len(changed))
+        return len(changed)
+
+    def _search_window(self, frame, t_info):
+        """Janela (x, y, w, h), no frame recebido, em torno da posição prevista do track perdido."""
+        px, py = self._predicted_center(t_info)
+        px -= self.offset[0]
+        py -= self.offset[1]
+        half = int(self.redetect_margin + 2 * t_info['radius']
+                   + t_info['lost_frames'] * np.hypot(*t_info['velocity']))
+        frame_h, frame_w = frame.shape[:2]
+        x0, y0 = max(0, int(px) - half), max(0, int(py) - half)
+        x1, y1 = min(frame_w, int(px) + half), min(frame_h, int(py) + half)
+        if x1 - x0 <= 0 or y1 - y0 <= 0:
+            return None
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def _recover_lost(self, frame):
+        """
+        Procura cada track perdido só na janela em torno da posição prevista. Detecções sobre
+        um track ativo ou já tomadas por outro track neste frame não servem para recuperar.
+        """
+        recovered = []
+        active = [t for t in self.trackers if t['active']]
+        claimed = set() # Centros das detecções usadas neste frame
+        for t_info in self._recoverable():
+            rect = self._search_window(frame, t_info)
+            if rect is None:
+                continue
+            detections = [b for b in self.detect_fn(frame, rect)
+                          if tuple(b['center']) not in claimed and not self._is_tracked(b, active)]
+            if not detections:
+                continue
+            px, py = self._predicted_center(t_info)
+            nearest = min(detections, key=lambda b: (b['center'][0] - px) ** 2 + (b['center'][1] - py) ** 2)
+            if self._reacquire(frame, t_info, nearest):
+                claimed.add(tuple(nearest['center']))
+                active.append(t_info)
+                recovered.append(t_info)
+        return recovered
 
+    def _run_updates(self, frame, active):
+        """(success, bbox) de cada tracker, na ordem de `active`; em paralelo quando vale a pena."""
+        if self.update_workers <= 1 or len(active) < self.parallel_min_tracks:
+            return [t_info['tracker_obj'].update(frame) for t_info in active]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.update_workers, thread_name_prefix="TrackerUpdate")
+        # map devolve na ordem de entrada: a junção abaixo é determinística
+        return list(self._pool.map(lambda t_info: t_info['tracker_obj'].update(frame), active))
 
-    def update_trackers(self, frame):
+    def update_trackers(self, frame, frame_index=None):
         successful_updates = 0
+        updated = []
+        statuses = []
         for t_info in self.trackers:
-            if not t_info['active']:
-                continue
+            if not t_info['active'] and not t_info['expired']:
+                t_info['lost_frames'] += 1
+                t_info['expired'] = t_info['lost_frames'] > self.max_lost_frames
 
-            success, bbox = t_info['tracker_obj'].update(frame)
+        active = [t_info for t_info in self.trackers if t_info['active']]
+        for t_info, (success, bbox) in zip(active, self._run_updates(frame, active)):
             if success:
+                bbox = (bbox[0] + self.offset[0], bbox[1] + self.offset[1], bbox[2], bbox[3])
                 t_info['bbox'] = bbox
-                center_x = int(bbox[0] + bbox[2] / 2)
-                center_y = int(bbox[1] + bbox[3] / 2)
-                t_info['trajectory'].append((center_x, center_y))
+                center = (bbox[0] + bbox[2] / 2, bbox[1] + bbox[3] / 2)
+                t_info['velocity'] = (center[0] - t_info['last_center'][0], center[1] - t_info['last_center'][1])
+                t_info['last_center'] = center
+                t_info['trajectory'].append((int(center[0]), int(center[1])))
                 successful_updates += 1
             else:
                 t_info['active'] = False
-                # print(f"[TrackerManager] Tracker ID {t_info['id']} perdeu o objeto.")
+                t_info['lost_frames'] = 1
+                t_info['expired'] = self.detect_fn is None # Sem detector não há como recuperar
+                logger.debug("Tracker ID %s perdeu o objeto.", t_info['id'])
+            updated.append(t_info)
+            statuses.append(STATUS_ACTIVE if success else STATUS_LOST)
+        self._record(frame_index, updated, statuses)
+
+        if self.detect_fn is not None:
+            recovered = self._recover_lost(frame)
+            self._record(frame_index, recovered, [STATUS_ACTIVE] * len(recovered))
+            successful_updates += len(recovered)
+
+            self._frames_since_redetect += 1
+            if self._frames_since_redetect >= self.redetect_interval:
+                self._frames_since_redetect = 0
+                self.add_detections(frame, self.detect_fn(frame), frame_index)
+
+        self._prune_expired()
         return successful_updates
 
+    def _prune_expired(self):
+        """Descarta os tracks que não serão mais recuperados (a linha LOST já foi gravada)."""
+        live = [t for t in self.trackers if not t['expired']]
+        if len(live) != len(self.trackers):
+            self.finished_tracks += len(self.trackers) - len(live)
+            self.trackers = live
+
+    def close(self):
+        """Encerra o pool de threads da atualização paralela (se houver)."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def has_live_tracks(self):
+        """True enquanto houver tracks ativos ou perdidos ainda recuperáveis."""
+        return any(t['active'] or not t['expired'] for t in self.trackers)
+
     def get_tracked_objects_info(self):
         return [t for t in self.trackers if t['active']] # Retorna apenas os ativos
     
-    def get_all_objects_info(self): # Para desenhar trajetórias mesmo se inativo
-        return self.trackers
\ No newline at end of file
+    def get_all_objects_info(self): # Ativos e perdidos ainda recuperáveis (os expirados são descartados)
+        return self.trackers
+
+def create_tracker_manager(tracker_type=None, detect_fn=None, config=Config, **kwargs):
+    """
+    Cria o gerenciador de tracking conforme o tipo (padrão: config.TRACKER_TYPE): "KALMAN"
+    usa associação de detecções (KalmanTrackerManager, requer `detect_fn`); os demais
+    usam os trackers do OpenCV.
+    """
+    tracker_type = tracker_type or config.TRACKER_TYPE
+    if tracker_type == "KALMAN":
+        from .kalman_tracker import KalmanTrackerManager
+        return KalmanTrackerManager(detect_fn, config=config, **kwargs)
+    return TrackerManager(tracker_type=tracker_type, detect_fn=detect_fn, config=config, **kwargs)
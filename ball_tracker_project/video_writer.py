@@ -0,0 +1,163 @@
+# video_writer.py
+import logging
+import queue
+import threading
+import cv2
+from .config import Config
+from . import visualization_utils as viz
+
+logger = logging.getLogger(__name__)
+
+_CLOSE = object()
+
+def snapshot_tracks(tracks):
+    """
+    Cópia mínima dos tracks para desenho em outra thread: (id, bbox, cor, ativo).
+    Os dicionários do gerenciador continuam sendo alterados pelo tracking, então não
+    podem ser repassados diretamente.
+    """
+    return [(t['id'], tuple(t['bbox']), t['color'], t['active']) for t in tracks]
+
+class AnnotatedVideoWriter:
+    """
+    Grava um vídeo anotado (ROI, bboxes, IDs, trajetórias e HUD) numa thread separada.
+    A thread do tracking só envia o frame original e os dados das anotações (submit);
+    o desenho e a codificação (cv2.VideoWriter) acontecem aqui.
+
+    - `render_every`: só 1 a cada N frames é desenhado e gravado (os demais enviam apenas
+      as anotações, para as trajetórias continuarem completas).
+    - `scale`: fator de redução do vídeo gravado.
+    - `frame_size`: (largura, altura) dos frames recebidos.
+    - `origin`: canto (x, y) dos frames recebidos no frame inteiro (ex: recorte da ROI);
+      as anotações chegam em coordenadas do frame inteiro.
+    - `trail_length`: rastros limitados aos últimos N pontos (None = completos).
+    ROI, rótulos do HUD e trajetórias ficam numa camada persistente (TrajectoryOverlay).
+    - Fila cheia não bloqueia o tracking: o item é descartado e contado em `dropped`.
+
+    Os frames enviados não são copiados; quem chama não deve modificá-los depois.
+    """
+    def __init__(self, path, fps, frame_size, render_every=1, scale=1.0, origin=(0, 0), roi_points=None,
+                 trail_length=None, queue_size=32, fourcc='mp4v', config=Config):
+        self.path = path
+        self.fps = fps / max(1, render_every)
+        self.render_every = max(1, int(render_every))
+        self.scale = scale
+        self.origin = origin
+        self.fourcc = fourcc
+        self.config = config
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._writer = None
+        self._error = None
+        self._frame_index = 0
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+
+        # Camadas no tamanho do vídeo gravado (pontos da ROI chegam no frame inteiro)
+        out_shape = (int(frame_size[1] * scale), int(frame_size[0] * scale))
+        roi_out = [self._to_output(x, y) for x, y in roi_points] if roi_points else None
+        self._static = viz.StaticOverlay(out_shape, roi_out, config=config)
+        self._overlay = viz.TrajectoryOverlay(out_shape, trail_length=trail_length, base=self._static, config=config)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="AnnotatedVideoWriter", daemon=True)
+        self._thread.start()
+        return self
+
+    def should_render(self, frame_index):
+        return frame_index % self.render_every == 0
+
+    def submit(self, frame_index, frame, tracks, detections=(), hud=None):
+        """
+        Envia as anotações de um frame. `tracks` vem de snapshot_tracks; `detections` são as
+        bolas detectadas neste frame; `hud` = (fps, ativos, total, status) ou None.
+        O frame só é enviado nos frames que serão desenhados.
+        """
+        if self._thread is None:
+            self.start()
+        item = (frame_index, frame if self.should_render(frame_index) else None, tracks, detections, hud)
+        self.submitted += 1
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _to_output(self, x, y):
+        return (int((x - self.origin[0]) * self.scale), int((y - self.origin[1]) * self.scale))
+
+    def _update_trails(self, tracks):
+        self._overlay.add_points((track_id, self._to_output(x + w / 2, y + h / 2), color)
+                                 for track_id, (x, y, w, h), color, active in tracks if active)
+
+    def _render(self, frame, tracks, detections, hud):
+        if frame.ndim == 2: # Frames do cache em tons de cinza (FRAME_CACHE_GRAYSCALE)
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        else:
+            frame = frame.copy()
+        config = self.config
+        self._overlay.composite(frame) # ROI, rótulos do HUD e trajetórias numa cópia mascarada
+
+        boxes = [{'id': track_id, 'active': active, 'color': color,
+                  'bbox': self._to_output(x, y) + (w * self.scale, h * self.scale)}
+                 for track_id, (x, y, w, h), color, active in tracks if active]
+        viz.draw_tracked_boxes(frame, boxes, config=config)
+
+        if detections:
+            viz.draw_detected_balls(frame, [{'id': b['id'], 'center': self._to_output(*b['center']),
+                                             'radius': max(1, int(b['radius'] * self.scale))}
+                                            for b in detections], config=config)
+        if hud is not None:
+            fps, active, total, status = hud
+            viz.draw_hud_values(frame, fps, self._frame_index, active, total, status=status, config=config)
+        return frame
+
+    def _write(self, frame):
+        if self._writer is None:
+            h, w = frame.shape[:2]
+            self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (w, h))
+            if not self._writer.isOpened():
+                raise IOError(f"Não foi possível criar o vídeo anotado em '{self.path}'")
+        self._writer.write(frame)
+        self.written += 1
+
+    def _run(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _CLOSE:
+                    return
+                self._frame_index, frame, tracks, detections, hud = item
+                self._update_trails(tracks)
+                if frame is not None:
+                    self._write(self._render(frame, tracks, detections, hud))
+        except Exception as e:
+            self._error = e
+            logger.error("Falha ao gravar o vídeo anotado: %s", e)
+            # Continua consumindo a fila para não travar quem chama
+            while self.queue.get() is not _CLOSE:
+                pass
+        finally:
+            if self._writer is not None:
+                self._writer.release()
+
+    def close(self):
+        """Espera a fila esvaziar, fecha o arquivo e retorna as estatísticas."""
+        if self._thread is not None:
+            self.queue.put(_CLOSE) # Bloqueante: o marcador de fim nunca é descartado
+            self._thread.join()
+        if self.dropped:
+            logger.warning("Vídeo anotado: %d de %d frame(s) descartados (fila cheia).", self.dropped, self.submitted)
+        return self.stats()
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'submitted': self.submitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'error': f"{type(self._error).__name__}: {self._error}" if self._error else None,
+        }
@@ -3,58 +3,218 @@ import cv2
 import numpy as np
 from .config import Config
 
-def draw_roi_on_frame(frame, roi_points):
+def draw_roi_on_frame(frame, roi_points, config=Config):
     if roi_points:
         cv2.polylines(frame, [np.array(roi_points, dtype=np.int32)],
-                      isClosed=True, color=Config.ROI_COLOR, thickness=2)
+                      isClosed=True, color=config.ROI_COLOR, thickness=2)
 
-def draw_detected_balls(frame, detected_balls_info):
+def draw_detected_balls(frame, detected_balls_info, config=Config):
     """Desenha as bolas detectadas inicialmente."""
     for ball in detected_balls_info:
         center = ball['center']
         radius = ball['radius']
-        cv2.circle(frame, center, radius, Config.BALL_DETECT_COLOR, Config.BOUNDING_BOX_THICKNESS)
-        cv2.circle(frame, center, 2, Config.BALL_DETECT_CENTER_COLOR, -1)
+        cv2.circle(frame, center, radius, config.BALL_DETECT_COLOR, config.BOUNDING_BOX_THICKNESS)
+        cv2.circle(frame, center, 2, config.BALL_DETECT_CENTER_COLOR, -1)
         cv2.putText(frame, f"ID: {ball['id']}",
                     (center[0] - radius, center[1] - radius - 7),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, Config.BALL_DETECT_COLOR, 1)
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, config.BALL_DETECT_COLOR, 1)
 
-def draw_tracked_objects(frame, tracked_objects_info, draw_trajectory=True):
-    """Desenha os objetos rastreados (bounding box, ID, trajetória)."""
-    for t_info in tracked_objects_info: # Iterar sobre todos para desenhar trajetórias mesmo se inativos
-        if t_info['active']: # Desenha bbox e ID apenas para ativos
+def draw_tracked_boxes(frame, tracked_objects_info, config=Config):
+    """Desenha só bounding box e ID dos objetos ativos (a parte que muda a cada frame)."""
+    for t_info in tracked_objects_info:
+        if t_info['active']:
             bbox = t_info['bbox']
             p1 = (int(bbox[0]), int(bbox[1]))
             p2 = (int(bbox[0] + bbox[2]), int(bbox[1] + bbox[3]))
-            cv2.rectangle(frame, p1, p2, t_info['color'], Config.BOUNDING_BOX_THICKNESS, 1)
+            cv2.rectangle(frame, p1, p2, t_info['color'], config.BOUNDING_BOX_THICKNESS, 1)
             cv2.putText(frame, f"ID: {t_info['id']}", (p1[0], p1[1] - 7),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.5, t_info['color'], 1)
 
-        if draw_trajectory and len(t_info['trajectory']) > 1:
+def draw_tracked_objects(frame, tracked_objects_info, draw_trajectory=True, config=Config):
+    """
+    Desenha os objetos rastreados (bounding box, ID, trajetória).
+    Redesenha todas as trajetórias a cada chamada; para exibição contínua use TrajectoryOverlay.
+    """
+    draw_tracked_boxes(frame, tracked_objects_info, config=config)
+    if not draw_trajectory:
+        return
+    for t_info in tracked_objects_info: # Iterar sobre todos para desenhar trajetórias mesmo se inativos
+        if len(t_info['trajectory']) > 1:
             for i in range(1, len(t_info['trajectory'])):
                 if t_info['trajectory'][i - 1] is None or t_info['trajectory'][i] is None:
                     continue
                 cv2.line(frame, t_info['trajectory'][i - 1], t_info['trajectory'][i],
-                         t_info['color'], Config.TRAJECTORY_LINE_THICKNESS)
+                         t_info['color'], config.TRAJECTORY_LINE_THICKNESS)
 
-def draw_hud(frame, fps, frame_count, active_trackers, total_trackers, status="N/A"):
+_HUD_FONT = cv2.FONT_HERSHEY_SIMPLEX
+_HUD_STATUS_COLOR = (0, 255, 255) # Amarelo para dar destaque ao status
+# (rótulo, posição y) de cada linha do HUD
+_HUD_LINES = [("FPS: ", 30), ("Frame: ", 50), ("Trackers Ativos: ", 70), ("Status: ", 90)]
+
+def draw_hud(frame, fps, frame_count, active_trackers, total_trackers, status="N/A", config=Config):
     """
     Desenha o Heads-Up Display (HUD) com informações de status no frame.
     """
     # Textos de informação existentes
-    cv2.putText(frame, f"FPS: {fps:.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, Config.HUD_TEXT_COLOR, 2)
-    cv2.putText(frame, f"Frame: {frame_count}", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.6, Config.HUD_TEXT_COLOR, 2)
-    cv2.putText(frame, f"Trackers Ativos: {active_trackers} / {total_trackers}", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.6, Config.HUD_TEXT_COLOR, 2)
+    cv2.putText(frame, f"FPS: {fps:.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, config.HUD_TEXT_COLOR, 2)
+    cv2.putText(frame, f"Frame: {frame_count}", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.6, config.HUD_TEXT_COLOR, 2)
+    cv2.putText(frame, f"Trackers Ativos: {active_trackers} / {total_trackers}", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.6, config.HUD_TEXT_COLOR, 2)
 
     # --- LINHAS ADICIONADAS ---
     # Adiciona o status do sistema (Aguardando Movimento / Rastreando)
-    status_color = (0, 255, 255) # Amarelo para dar destaque ao status
+    status_color = _HUD_STATUS_COLOR # Amarelo para dar destaque ao status
     cv2.putText(frame, f"Status: {status}", (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, status_color, 2)
 
-def resize_display_frame(frame, window_name):
+def _hud_colors(config):
+    return [config.HUD_TEXT_COLOR] * 3 + [_HUD_STATUS_COLOR]
+
+def draw_hud_labels(frame, config=Config):
+    """Parte fixa do HUD (rótulos), para a camada estática de StaticOverlay."""
+    for (label, y), color in zip(_HUD_LINES, _hud_colors(config)):
+        cv2.putText(frame, label.strip(), (10, y), _HUD_FONT, 0.6, color, 2)
+
+def draw_hud_values(frame, fps, frame_count, active_trackers, total_trackers, status="N/A", config=Config):
+    """Parte variável do HUD, desenhada à direita dos rótulos de draw_hud_labels."""
+    values = [f"{fps:.2f}", f"{frame_count}", f"{active_trackers} / {total_trackers}", f"{status}"]
+    for (label, y), color, value in zip(_HUD_LINES, _hud_colors(config), values):
+        (label_w, _), _ = cv2.getTextSize(label, _HUD_FONT, 0.6, 2)
+        cv2.putText(frame, value, (10 + label_w, y), _HUD_FONT, 0.6, color, 2)
+
+def _copy_masked(frame, layer, mask, bbox):
+    """
+    Copia para o frame os pixels desenhados da camada (mask != 0), só dentro de `bbox`
+    (x0, y0, x1, y1), o retângulo que contém desenhos. cv2.copyTo escreve direto na view
+    do frame; np.copyto(where=...) com máscara booleana é bem mais lento em frames grandes.
+    """
+    if bbox is None:
+        return
+    x0, y0, x1, y1 = bbox
+    cv2.copyTo(layer[y0:y1, x0:x1], mask[y0:y1, x0:x1], frame[y0:y1, x0:x1])
+
+def _mask_bbox(mask):
+    """Retângulo (x0, y0, x1, y1) dos pixels não nulos da máscara, ou None se vazia."""
+    if not cv2.countNonZero(mask):
+        return None
+    x, y, w, h = cv2.boundingRect(mask)
+    return (x, y, x + w, y + h)
+
+class StaticOverlay:
+    """
+    Camada pré-desenhada (ROI e rótulos do HUD) aplicada ao frame com uma única cópia
+    mascarada, em vez de redesenhar os polígonos e textos a cada frame.
+    """
+    def __init__(self, frame_shape, roi_points=None, hud=True, config=Config):
+        h, w = frame_shape[:2]
+        self.layer = np.zeros((h, w, 3), dtype=np.uint8)
+        draw_roi_on_frame(self.layer, roi_points, config=config)
+        if hud:
+            draw_hud_labels(self.layer, config=config)
+        self.mask = self.layer.any(axis=2).astype(np.uint8) # (h, w): 1 nos pixels desenhados
+        self.bbox = _mask_bbox(self.mask)
+
+    def composite(self, frame):
+        _copy_masked(frame, self.layer, self.mask, self.bbox)
+
+class TrajectoryOverlay:
+    """
+    Camada persistente de trajetórias: a cada frame só os segmentos novos são desenhados
+    (um cv2.line por track atualizado) e a camada é aplicada ao frame com uma cópia mascarada
+    limitada ao retângulo que contém desenhos (cv2.copyTo). O custo por frame deixa de crescer
+    com o total de pontos do vídeo.
+
+    Com `trail_length`, cada rastro guarda só os últimos N pontos; como apagar um segmento
+    antigo estragaria os que cruzam com ele, a camada é redesenhada a partir dos pontos
+    guardados a cada `trail_length // 4` frames (rastros com entre N e 1.25N pontos).
+    Nessa reconstrução, rastros sem ponto novo há `trail_length` frames (tracks perdidos ou
+    encerrados) são descartados: o custo acompanha os tracks vivos, não todos os já vistos.
+    `base` (opcional, ex: StaticOverlay) fica por baixo das trajetórias na mesma camada.
+    """
+    def __init__(self, frame_shape, trail_length=None, base=None, config=Config):
+        h, w = frame_shape[:2]
+        self.shape = (h, w)
+        self.trail_length = trail_length
+        self.thickness = config.TRAJECTORY_LINE_THICKNESS
+        self.base = base
+        self.rebuild_interval = max(1, trail_length // 4) if trail_length else None
+        self._trails = {} # id -> (cor, pontos); sem trail_length só o último ponto é guardado
+        self._last_seen = {} # id -> frame do último ponto recebido
+        self._frame = 0
+        self._frames_since_rebuild = 0
+        self._reset_layer()
+
+    def _reset_layer(self):
+        if self.base is not None:
+            self.layer = self.base.layer.copy()
+            self.mask = self.base.mask.copy()
+            self.bbox = self.base.bbox
+        else:
+            self.layer = np.zeros(self.shape + (3,), dtype=np.uint8)
+            self.mask = np.zeros(self.shape, dtype=np.uint8)
+            self.bbox = None
+
+    def _draw_segment(self, p0, p1, color):
+        cv2.line(self.layer, p0, p1, color, self.thickness)
+        cv2.line(self.mask, p0, p1, 1, self.thickness)
+        # Amplia o retângulo com desenhos (espessura da linha como margem)
+        pad = self.thickness
+        h, w = self.shape
+        x0, y0 = max(0, min(p0[0], p1[0]) - pad), max(0, min(p0[1], p1[1]) - pad)
+        x1, y1 = min(w, max(p0[0], p1[0]) + pad + 1), min(h, max(p0[1], p1[1]) + pad + 1)
+        if self.bbox is not None:
+            x0, y0 = min(x0, self.bbox[0]), min(y0, self.bbox[1])
+            x1, y1 = max(x1, self.bbox[2]), max(y1, self.bbox[3])
+        if x1 > x0 and y1 > y0:
+            self.bbox = (x0, y0, x1, y1)
+
+    def add_point(self, track_id, point, color):
+        """Acrescenta um ponto ao rastro do track e desenha só o segmento novo."""
+        trail = self._trails.get(track_id)
+        self._last_seen[track_id] = self._frame
+        if trail is None:
+            self._trails[track_id] = (color, [point])
+            return
+        points = trail[1]
+        if points[-1] == point:
+            return
+        self._draw_segment(points[-1], point, color)
+        if self.trail_length is None:
+            points[-1] = point
+        else:
+            points.append(point)
+
+    def add_points(self, points):
+        """Pontos de um frame: [(id, ponto, cor), ...]."""
+        for track_id, point, color in points:
+            self.add_point(track_id, point, color)
+        self._trim()
+        self._frame += 1
+
+    def update(self, tracks):
+        """Lê o último ponto da trajetória de cada track (dicionários do gerenciador de tracking)."""
+        self.add_points((t['id'], t['trajectory'][-1], t['color']) for t in tracks if t['trajectory'])
+
+    def _trim(self):
+        if self.trail_length is None:
+            return
+        self._frames_since_rebuild += 1
+        if self._frames_since_rebuild < self.rebuild_interval:
+            return
+        self._frames_since_rebuild = 0
+        self._reset_layer()
+        for track_id in [i for i, seen in self._last_seen.items() if self._frame - seen >= self.trail_length]:
+            del self._trails[track_id], self._last_seen[track_id]
+        for color, points in self._trails.values():
+            del points[:-self.trail_length]
+            for p0, p1 in zip(points, points[1:]):
+                self._draw_segment(p0, p1, color)
+
+    def composite(self, frame):
+        _copy_masked(frame, self.layer, self.mask, self.bbox)
+
+def resize_display_frame(frame, window_name, config=Config):
     """Redimensiona a janela se o frame for maior que WINDOW_MAX_HEIGHT."""
     h, w = frame.shape[:2]
-    if h > Config.WINDOW_MAX_HEIGHT:
+    if h > config.WINDOW_MAX_HEIGHT:
         aspect_ratio = w / h
-        display_width = int(Config.WINDOW_MAX_HEIGHT * aspect_ratio)
-        cv2.resizeWindow(window_name, display_width, Config.WINDOW_MAX_HEIGHT)
\ No newline at end of file
+        display_width = int(config.WINDOW_MAX_HEIGHT * aspect_ratio)
+        cv2.resizeWindow(window_name, display_width, config.WINDOW_MAX_HEIGHT)
\ No newline at end of file
@@ -0,0 +1,175 @@
+# zones.py
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+import cv2
+from .config import Config
+from .roi_handler import crop_to_rect
+from .pipeline import TrackingPipeline, preprocess_frame, open_frame_stream, live_options
+from .frame_source import open_capture
+from .track_store import TrackStore, open_track_writer
+from .kinematics import KinematicsAnalyzer, KinematicsWriter
+from .instrumentation import NULL_PROFILER, StageProfiler
+
+logger = logging.getLogger(__name__)
+
+_CLOSE = object()
+
+def zone_output_path(path, zone):
+    """'resultados.csv' + 'canal_1' -> 'resultados_canal_1.csv'."""
+    root, ext = os.path.splitext(path)
+    return f"{root}_{zone}{ext}"
+
+class ZoneWorker:
+    """
+    Pipeline completo de uma zona (detector de movimento, Hough e tracking próprios)
+    numa thread, alimentado por uma fila limitada de frames inteiros já pré-processados.
+    Cada zona trabalha só no seu recorte; o frame é compartilhado e apenas lido.
+    A fila cheia bloqueia quem envia (backpressure): a decodificação anda no ritmo da zona mais lenta.
+    """
+    def __init__(self, name, roi_manager, frame_shape, track_store, tracker_type=None, fps=None,
+                 kinematics_output=None, queue_size=8, profiler=NULL_PROFILER, config=Config):
+        self.name = name
+        self.track_store = track_store
+        self.roi_crop = roi_manager.get_crop(frame_shape)
+        self.profiler = profiler
+        self.pipeline = TrackingPipeline.for_roi(self.roi_crop, tracker_type=tracker_type, track_store=track_store,
+                                                 trajectory_maxlen=1, profiler=profiler, config=config)
+        self.kinematics = self.kinematics_sink = None
+        if kinematics_output:
+            self.kinematics = KinematicsAnalyzer(roi_manager.get_points(), fps=fps, config=config)
+            self.kinematics_sink = KinematicsWriter(kinematics_output)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self.error = None
+        self.frames = 0
+        self.busy_s = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"Zone-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, frame_index, frame):
+        self.queue.put((frame_index, frame))
+
+    def _run(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _CLOSE:
+                    return
+                frame_index, frame = item
+                t0 = time.perf_counter()
+                self.pipeline.process_frame(crop_to_rect(frame, self.roi_crop.rect), frame_index)
+                if self.kinematics is not None:
+                    with self.profiler.stage('kinematics'):
+                        self.kinematics_sink.write(
+                            self.kinematics.update(frame_index, self.pipeline.tracker_mgr.get_all_objects_info()))
+                self.busy_s += time.perf_counter() - t0
+                self.frames += 1
+        except Exception as e:
+            self.error = e
+            logger.error("Falha na zona '%s': %s", self.name, e)
+            # Continua consumindo a fila para não travar a decodificação
+            while self.queue.get() is not _CLOSE:
+                pass
+
+    def close(self):
+        """Processa o que restou na fila, encerra a thread e retorna o resumo da zona."""
+        if self._thread is not None:
+            self.queue.put(_CLOSE)
+            self._thread.join()
+        self.pipeline.close()
+        if self.kinematics_sink is not None:
+            self.kinematics_sink.write(self.kinematics.flush())
+            self.kinematics_sink.close()
+        self.track_store.close()
+        return self.stats()
+
+    def stats(self):
+        summary = {
+            'frames': self.frames,
+            'busy_s': self.busy_s,
+            'tracks': self.pipeline.next_ball_id,
+            'rows': len(self.track_store),
+            'output': self.track_store.writer.path if self.track_store.writer is not None else None,
+            'error': f"{type(self.error).__name__}: {self.error}" if self.error else None,
+        }
+        if self.kinematics_sink is not None:
+            summary['kinematics'] = {'output': self.kinematics_sink.path, 'windows': self.kinematics_sink.rows}
+        if self.profiler.enabled:
+            summary['stages'] = self.profiler.snapshot()['stages']
+        return summary
+
+def process_zones(video_path, zones, output_path, tracker_type=None, prefetch=0, profiler=NULL_PROFILER,
+                  config=Config, live=None, kinematics_output=None, queue_size=8):
+    """
+    Roda uma pipeline por zona ({nome: ROIHandler}, ver load_roi_zones) com uma única
+    decodificação do vídeo. As zonas rodam em paralelo, cada uma na sua thread (o OpenCV
+    libera o GIL), e gravam as trajetórias em `output_path` com o nome da zona no sufixo.
+    `profiler` mede a decodificação; cada zona tem os próprios tempos no resumo.
+    Retorna o resumo da execução (ou None em erro).
+    """
+    cap = open_capture(video_path)
+    if not cap.isOpened():
+        logger.error("Não foi possível abrir o vídeo em '%s'", video_path)
+        return None
+    ret, first_frame_raw = cap.read()
+    if not ret:
+        logger.error("Não foi possível ler o primeiro frame de '%s'.", video_path)
+        cap.release()
+        return None
+    first_frame = preprocess_frame(first_frame_raw, config)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    workers = {}
+    for name, roi_manager in zones.items():
+        track_store = TrackStore(writer=open_track_writer(zone_output_path(output_path, name)))
+        workers[name] = ZoneWorker(name, roi_manager, first_frame.shape, track_store, tracker_type=tracker_type,
+                                   fps=fps, queue_size=queue_size, config=config,
+                                   kinematics_output=zone_output_path(kinematics_output, name) if kinematics_output else None,
+                                   # StageProfiler não é thread-safe: um por zona
+                                   profiler=StageProfiler() if profiler.enabled else NULL_PROFILER).start()
+
+    live_opts = live_options(cap, **live) if live is not None else None
+    frames, prefetcher = open_frame_stream(cap, prefetch=prefetch, profiler=profiler, config=config, live=live_opts)
+    frames = itertools.chain([first_frame], frames)
+    frames_read = 0
+    start_time = time.perf_counter()
+    try:
+        for frames_read, frame in enumerate(frames, start=1):
+            frame_index = 1 + prefetcher.frame_number if live is not None else frames_read
+            for worker in workers.values():
+                worker.submit(frame_index, frame)
+            profiler.maybe_dump()
+    finally:
+        if prefetcher is not None:
+            prefetcher.stop()
+        cap.release()
+        zone_summaries = {name: worker.close() for name, worker in workers.items()}
+        profiler.dump()
+
+    elapsed = time.perf_counter() - start_time
+    summary = {
+        'video': video_path,
+        'frames': frames_read,
+        'seconds': elapsed,
+        'fps': frames_read / elapsed if elapsed > 0 else 0.0,
+        'tracks': sum(z['tracks'] for z in zone_summaries.values()),
+        'rows': sum(z['rows'] for z in zone_summaries.values()),
+        'zones': zone_summaries,
+    }
+    if prefetcher is not None:
+        summary['live' if live is not None else 'prefetch'] = prefetcher.stats()
+    return summary
+
+def print_zone_summary(summary):
+    print(f"Processamento de {len(summary['zones'])} zona(s) concluído: {summary['frames']} frames em "
+          f"{summary['seconds']:.1f}s ({summary['fps']:.1f} FPS, uma decodificação).")
+    for name, zone in summary['zones'].items():
+        status = "ERRO: " + zone['error'] if zone['error'] else f"{zone['tracks']} tracks"
+        print(f"  [{name}] {status}, ocupada {zone['busy_s']:.1f}s. Resultados em '{zone['output']}'.")
@@ -0,0 +1,299 @@
+# run_benchmarks.py
+"""
+Benchmark por estágio com vídeo sintético. Rode a partir da raiz do repositório:
+
+    python -m benchmarks.run_benchmarks --frames 300 --balls 20 --output bench.json
+
+Limites (a execução termina com status 1 se algum for violado), por estágio ou backend:
+
+    python -m benchmarks.run_benchmarks --max detect_balls_hough.mean_ms=8 --min detect_balls_hough.f1=0.9 \
+        --min CSRT.coverage=0.95 --max KALMAN.id_switches=2
+
+A métrica é procurada nas estatísticas de latência e depois em 'accuracy'. Os mesmos limites
+podem vir de um JSON (--thresholds): {"max": {"CSRT.mean_ms": 5}, "min": {"CSRT.coverage": 0.95}}.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from ball_tracker_project.config import Config
+from ball_tracker_project.roi_handler import ROIHandler, crop_to_rect
+from ball_tracker_project.ball_detector import HoughBallDetector
+from ball_tracker_project.motion_detector import MotionDetector
+from ball_tracker_project.pipeline import TrackingPipeline, preprocess_frame
+from ball_tracker_project.evaluation import match_centers, summarize_scores
+import ball_tracker_project.visualization_utils as viz
+from benchmarks.synthetic_video import SyntheticParticleVideo
+
+TRACKER_BACKENDS = ["CSRT", "KCF", "MOSSE", "KALMAN"]
+
+def latency_stats(samples_ns):
+    """Vazão e percentis de latência (ms) a partir de amostras em nanossegundos."""
+    samples_ms = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    if len(samples_ms) == 0:
+        return {'n': 0}
+    total_s = samples_ms.sum() / 1e3
+    return {
+        'n': int(len(samples_ms)),
+        'fps': len(samples_ms) / total_s if total_s > 0 else None,
+        'mean_ms': float(samples_ms.mean()),
+        'p50_ms': float(np.percentile(samples_ms, 50)),
+        'p90_ms': float(np.percentile(samples_ms, 90)),
+        'p99_ms': float(np.percentile(samples_ms, 99)),
+        'max_ms': float(samples_ms.max()),
+    }
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter_ns()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter_ns() - t0
+
+@contextlib.contextmanager
+def _quiet(enabled=True):
+    """Descarta os prints dos módulos durante as medições."""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def _ground_truth_balls(gt):
+    return [{'id': i, 'center': (int(cx), int(cy)), 'radius': int(r),
+             'bbox_initial': (int(cx - r), int(cy - r), int(2 * r), int(2 * r))}
+            for i, (cx, cy, r) in enumerate(gt)]
+
+def _make_roi(video, frame_shape):
+    roi = ROIHandler(None, config_file=None)
+    roi.points = list(video.roi_points)
+    roi.is_defined = True
+    return roi.get_crop(frame_shape)
+
+def bench_frame_stages(frames, truth, roi_crop, match_distance):
+    """preprocess_frame, MotionDetector.detect e HoughBallDetector.detect (com acurácia)."""
+    results = {}
+    samples = [_timed(preprocess_frame, frame)[1] for frame in frames]
+    results['preprocess_frame'] = latency_stats(samples)
+
+    for name, downscale, grayscale in [('motion_detect_full', 1.0, False),
+                                       ('motion_detect', Config.MOTION_DOWNSCALE, Config.MOTION_GRAYSCALE)]:
+        motion = MotionDetector(min_contour_area=Config.MIN_MOTION_AREA, show_debug=False, roi_mask=roi_crop.mask,
+                                downscale=downscale, grayscale=grayscale)
+        samples = [_timed(motion.detect, crop_to_rect(frame, roi_crop.rect))[1] for frame in frames]
+        results[name] = latency_stats(samples)
+
+    detector = HoughBallDetector(roi_crop.points, roi_crop.mask, offset=roi_crop.rect[:2])
+    samples = []
+    tp = fp = fn = 0
+    error_sum = 0.0
+    for frame, gt in zip(frames, truth):
+        roi_frame = crop_to_rect(frame, roi_crop.rect)
+        (balls, _), elapsed = _timed(detector.detect, roi_frame)
+        samples.append(elapsed)
+        predicted = [b['center'] for b in balls]
+        pred_idx, _, distances = match_centers(predicted, gt[:, :2], match_distance)
+        tp += len(pred_idx)
+        fp += len(predicted) - len(pred_idx)
+        fn += len(gt) - len(pred_idx)
+        error_sum += float(distances.sum())
+    results['detect_balls_hough'] = latency_stats(samples)
+    results['detect_balls_hough']['accuracy'] = summarize_scores(tp, fp, fn, error_sum)
+    return results
+
+def bench_tracker(backend, frames, truth, roi_crop, match_distance):
+    """
+    Inicializa o backend com o ground truth do primeiro frame e mede update_trackers
+    nos demais. Acurácia: fração das bolas reais cobertas por um track ativo e
+    trocas de ID (a bola real passa a ser coberta por outro track).
+    """
+    pipeline = TrackingPipeline.for_roi(roi_crop, tracker_type=backend)
+    manager = pipeline.tracker_mgr
+    first_roi_frame = crop_to_rect(frames[0], roi_crop.rect)
+    if not manager.initialize_trackers(first_roi_frame, _ground_truth_balls(truth[0]), frame_index=1):
+        return {'error': 'falha ao inicializar'}
+
+    samples = []
+    covered = 0
+    total = 0
+    id_switches = 0
+    last_id_for_gt = {}
+    for frame_index, (frame, gt) in enumerate(zip(frames[1:], truth[1:]), start=2):
+        roi_frame = crop_to_rect(frame, roi_crop.rect)
+        _, elapsed = _timed(manager.update_trackers, roi_frame, frame_index)
+        samples.append(elapsed)
+
+        active = manager.get_tracked_objects_info()
+        centers = [(t['bbox'][0] + t['bbox'][2] / 2, t['bbox'][1] + t['bbox'][3] / 2) for t in active]
+        pred_idx, gt_idx, _ = match_centers(centers, gt[:, :2], match_distance)
+        covered += len(pred_idx)
+        total += len(gt)
+        for p, g in zip(pred_idx, gt_idx):
+            track_id = active[p]['id']
+            if g in last_id_for_gt and last_id_for_gt[g] != track_id:
+                id_switches += 1
+            last_id_for_gt[g] = track_id
+
+    stats = latency_stats(samples)
+    stats['accuracy'] = {
+        'coverage': covered / total if total else 0.0,
+        'id_switches': id_switches,
+        'tracks_created': manager.next_id,
+    }
+    return stats
+
+def bench_visualization(frames, truth, roi_crop):
+    """
+    draw_roi_on_frame, draw_tracked_objects (com trajetórias) e draw_hud, comparados às
+    camadas persistentes (StaticOverlay + TrajectoryOverlay + draw_tracked_boxes/draw_hud_values).
+    """
+    tracks = [{'id': i, 'active': True, 'bbox': (0, 0, 1, 1), 'color': (0, 255, 0), 'trajectory': []}
+              for i in range(truth.shape[1])]
+    roi_points = [(x + roi_crop.rect[0], y + roi_crop.rect[1]) for x, y in roi_crop.points]
+    static_layer = viz.StaticOverlay(frames[0].shape, roi_points)
+    trajectory_layer = viz.TrajectoryOverlay(frames[0].shape, base=static_layer)
+
+    def overlay_render(display):
+        trajectory_layer.update(tracks)
+        trajectory_layer.composite(display)
+        viz.draw_tracked_boxes(display, tracks)
+        viz.draw_hud_values(display, 30.0, 1, len(tracks), len(tracks), "Rastreando")
+
+    roi_samples, tracked_samples, hud_samples, overlay_samples = [], [], [], []
+    for frame, gt in zip(frames, truth):
+        for t, (cx, cy, r) in zip(tracks, gt):
+            t['bbox'] = (cx - r, cy - r, 2 * r, 2 * r)
+            t['trajectory'].append((int(cx), int(cy)))
+        display = frame.copy()
+        roi_samples.append(_timed(viz.draw_roi_on_frame, display, roi_points)[1])
+        tracked_samples.append(_timed(viz.draw_tracked_objects, display, tracks)[1])
+        hud_samples.append(_timed(viz.draw_hud, display, 30.0, 1, len(tracks), len(tracks), "Rastreando")[1])
+        overlay_samples.append(_timed(overlay_render, frame.copy())[1])
+    return {
+        'draw_roi_on_frame': latency_stats(roi_samples),
+        'draw_tracked_objects': latency_stats(tracked_samples),
+        'draw_hud': latency_stats(hud_samples),
+        'overlay_render': latency_stats(overlay_samples), # Substitui os três acima
+    }
+
+def parse_threshold(text):
+    """'NOME.MÉTRICA=VALOR' -> ('NOME.MÉTRICA', valor)."""
+    key, sep, value = text.partition('=')
+    if not sep or '.' not in key:
+        raise argparse.ArgumentTypeError(f"limite inválido '{text}' (use NOME.MÉTRICA=VALOR)")
+    try:
+        return key, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"valor inválido em '{text}'") from None
+
+def _metric(report, key):
+    """Valor de 'NOME.MÉTRICA' no relatório (estágio ou backend), ou uma mensagem de erro."""
+    name, _, metric = key.rpartition('.')
+    stats = report['stages'].get(name, report['trackers'].get(name))
+    if stats is None:
+        return None, f"{name}: não medido"
+    if 'error' in stats:
+        return None, f"{name}: {stats['error']}"
+    value = stats.get(metric, stats.get('accuracy', {}).get(metric))
+    if value is None:
+        return None, f"{key}: métrica inexistente"
+    return value, None
+
+def check_thresholds(report, thresholds):
+    """
+    Compara o relatório com {'max': {'NOME.MÉTRICA': limite}, 'min': {...}}.
+    Retorna a lista de violações (vazia se tudo passou); estágio ausente ou com erro também viola.
+    """
+    failures = []
+    for kind, breached in (('max', lambda v, limit: v > limit), ('min', lambda v, limit: v < limit)):
+        for key, limit in thresholds.get(kind, {}).items():
+            value, error = _metric(report, key)
+            if error is not None:
+                failures.append(error)
+            elif breached(value, limit):
+                failures.append(f"{key} = {value:.4g} ({kind} {limit:g})")
+    return failures
+
+def run(args):
+    video = SyntheticParticleVideo(width=args.width, height=args.height, n_balls=args.balls,
+                                   radius_range=(args.radius_min, args.radius_max),
+                                   speed=args.speed, noise_sigma=args.noise, seed=args.seed)
+    generated = list(video.frames(args.frames, static_frames=args.static_frames))
+    frames = [f for f, _ in generated]
+    truth = np.stack([gt for _, gt in generated])
+    roi_crop = _make_roi(video, frames[0].shape)
+    match_distance = args.radius_max
+
+    report = {
+        'params': vars(args),
+        'opencv_version': cv2.__version__,
+        'stages': {},
+        'trackers': {},
+    }
+    with _quiet(not args.verbose):
+        report['stages'].update(bench_frame_stages(frames, truth, roi_crop, match_distance))
+        # Os trackers partem do primeiro frame em movimento
+        moving = slice(args.static_frames, None)
+        for backend in args.backends:
+            try:
+                report['trackers'][backend] = bench_tracker(backend, frames[moving], truth[moving],
+                                                            roi_crop, match_distance)
+            except Exception as e: # Ex.: backend ausente no build do OpenCV
+                report['trackers'][backend] = {'error': f"{type(e).__name__}: {e}"}
+        report['stages'].update(bench_visualization(frames, truth, roi_crop))
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark por estágio com vídeo sintético.")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--static-frames", type=int, default=20, help="Frames iniciais sem movimento.")
+    parser.add_argument("--balls", type=int, default=10)
+    parser.add_argument("--radius-min", type=int, default=Config.HOUGH_MIN_RADIUS)
+    parser.add_argument("--radius-max", type=int, default=Config.HOUGH_MAX_RADIUS)
+    parser.add_argument("--speed", type=float, default=4.0, help="Velocidade das bolas (px/frame).")
+    parser.add_argument("--noise", type=float, default=6.0, help="Desvio padrão do ruído gaussiano.")
+    parser.add_argument("--width", type=int, default=540)
+    parser.add_argument("--height", type=int, default=960)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", nargs='+', default=TRACKER_BACKENDS, choices=TRACKER_BACKENDS)
+    parser.add_argument("--output", default=None, help="Arquivo JSON do relatório (padrão: stdout).")
+    parser.add_argument("--verbose", action="store_true", help="Não descarta os prints dos módulos.")
+    parser.add_argument("--max", type=parse_threshold, action='append', default=[], metavar="NOME.MÉTRICA=VALOR",
+                        help="Limite superior (ex: detect_balls_hough.mean_ms=8, KALMAN.id_switches=2).")
+    parser.add_argument("--min", type=parse_threshold, action='append', default=[], metavar="NOME.MÉTRICA=VALOR",
+                        help="Limite inferior (ex: detect_balls_hough.f1=0.9, CSRT.coverage=0.95).")
+    parser.add_argument("--thresholds", default=None,
+                        help="JSON com os limites: {\"max\": {\"NOME.MÉTRICA\": valor}, \"min\": {...}}.")
+    args = parser.parse_args(argv)
+
+    thresholds = {'max': {}, 'min': {}}
+    if args.thresholds:
+        with open(args.thresholds, 'r') as f:
+            for kind, limits in json.load(f).items():
+                thresholds[kind].update(limits)
+    thresholds['max'].update(args.max) # A linha de comando prevalece sobre o arquivo
+    thresholds['min'].update(args.min)
+
+    report = run(args)
+    if thresholds['max'] or thresholds['min']:
+        report['thresholds'] = {**thresholds, 'failures': check_thresholds(report, thresholds)}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+        print(f"Relatório salvo em '{args.output}'.")
+    else:
+        print(text)
+    failures = report.get('thresholds', {}).get('failures', [])
+    for failure in failures:
+        print(f"LIMITE VIOLADO: {failure}", file=sys.stderr)
+    return report
+
+def exit_status(report):
+    """0 se nenhum limite foi violado, 1 caso contrário."""
+    return 1 if report.get('thresholds', {}).get('failures') else 0
+
+if __name__ == "__main__":
+    sys.exit(exit_status(main()))
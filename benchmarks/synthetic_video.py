@@ -0,0 +1,89 @@
+# synthetic_video.py
+import cv2
+import numpy as np
+from ball_tracker_project.config import Config
+
+class SyntheticParticleVideo:
+    """
+    Gera frames com círculos em movimento (quicando dentro de uma ROI retangular) sobre
+    um fundo estático com gradiente, mais ruído gaussiano. O ground truth de cada frame
+    é um array (N, 3) com (cx, cy, raio). Os frames já estão na orientação final
+    (equivalente à saída de preprocess_frame).
+    """
+    def __init__(self, width=540, height=960, n_balls=10,
+                 radius_range=(Config.HOUGH_MIN_RADIUS, Config.HOUGH_MAX_RADIUS),
+                 speed=4.0, noise_sigma=6.0, margin=40, seed=0):
+        self.width = width
+        self.height = height
+        self.noise_sigma = noise_sigma
+        self.rng = np.random.default_rng(seed)
+        self.roi_points = [(margin, margin), (width - margin, margin),
+                           (width - margin, height - margin), (margin, height - margin)]
+
+        low, high = radius_range
+        self.radii = self.rng.integers(low, high + 1, size=n_balls).astype(np.float64)
+        self._bounds_min = margin + self.radii
+        self._bounds_max = np.stack([width - margin - self.radii, height - margin - self.radii], axis=1)
+        self.positions = self._initial_positions(n_balls, margin)
+        angles = self.rng.uniform(0, 2 * np.pi, size=n_balls)
+        self.velocities = speed * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        self.colors = self.rng.integers(150, 256, size=(n_balls, 3))
+
+        # Fundo fixo com gradiente suave (o MOG2 aprende e ignora)
+        gx = np.linspace(40, 90, width, dtype=np.float32)
+        gy = np.linspace(0, 30, height, dtype=np.float32)[:, None]
+        self.background = np.repeat((gx[None, :] + gy)[:, :, None], 3, axis=2).astype(np.uint8)
+
+    def _initial_positions(self, n_balls, margin):
+        """Sorteia posições sem sobreposição (até um número limitado de tentativas)."""
+        positions = np.zeros((n_balls, 2))
+        for i in range(n_balls):
+            for _ in range(100):
+                candidate = self.rng.uniform(self._bounds_min[i], self._bounds_max[i])
+                if i == 0 or np.all(np.linalg.norm(positions[:i] - candidate, axis=1)
+                                    > self.radii[:i] + self.radii[i] + 4):
+                    break
+            positions[i] = candidate
+        return positions
+
+    def _step(self):
+        self.positions += self.velocities
+        low = self._bounds_min[:, None]
+        high = self._bounds_max
+        bounce = (self.positions < low) | (self.positions > high)
+        self.velocities[bounce] *= -1
+        self.positions = np.clip(self.positions, low, high)
+
+    def ground_truth(self):
+        return np.column_stack([self.positions, self.radii])
+
+    def render(self):
+        frame = self.background.copy()
+        for (cx, cy), r, color in zip(self.positions, self.radii, self.colors):
+            cv2.circle(frame, (int(round(cx)), int(round(cy))), int(r), tuple(int(c) for c in color), -1)
+        if self.noise_sigma > 0:
+            noise = self.rng.normal(0, self.noise_sigma, size=frame.shape)
+            frame = np.clip(frame.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+        return frame
+
+    def frames(self, n_frames, static_frames=0):
+        """
+        Gera (frame, ground_truth) por `n_frames` frames. Os primeiros `static_frames`
+        não têm movimento, para o detector de movimento aprender o fundo.
+        """
+        for i in range(n_frames):
+            if i >= static_frames:
+                self._step()
+            yield self.render(), self.ground_truth()
+
+    def write(self, path, n_frames, fps=30, static_frames=0):
+        """Grava o vídeo em `path` e o ground truth em `path` + '.gt.npy' (N_frames, N_bolas, 3)."""
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (self.width, self.height))
+        truth = []
+        for frame, gt in self.frames(n_frames, static_frames):
+            writer.write(frame)
+            truth.append(gt)
+        writer.release()
+        truth = np.stack(truth)
+        np.save(path + '.gt.npy', truth)
+        return truth
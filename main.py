@@ -1,24 +1,26 @@
 # main_tracker.py
+import argparse
+import itertools
+import logging
 import cv2
 import time
 import numpy as np # Necessário para np.array em algumas chamadas de visualização
-from ball_tracker_project.config import Config
-from ball_tracker_project.roi_handler import ROIHandler
-from ball_tracker_project.ball_detector import detect_balls_hough
-from ball_tracker_project.tracker_manager import TrackerManager
-from ball_tracker_project.motion_detector import MotionDetector
+from ball_tracker_project.config import Config, add_profile_arguments, profile_from_args
+from ball_tracker_project.roi_handler import ROIHandler, crop_to_rect
+from ball_tracker_project.pipeline import (TrackingPipeline, preprocess_frame, run_headless, open_frame_stream,
+                                           print_prefetch_stats, live_options, print_live_stats)
+from ball_tracker_project.frame_source import open_capture, DROP_POLICIES, DROP_LATEST
+from ball_tracker_project.frame_cache import FrameCache
+from ball_tracker_project.instrumentation import StageProfiler, NULL_PROFILER, LOG_FORMAT
+from ball_tracker_project.video_writer import AnnotatedVideoWriter, snapshot_tracks
 import ball_tracker_project.visualization_utils as viz
 
-def preprocess_frame(frame):
-    """Aplica pré-processamentos consistentes ao frame (ex: rotação)."""
-    if Config.ROTATE_VIDEO_CLOCKWISE:
-        return cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-    return frame
-
-def main():
-    cap = cv2.VideoCapture(Config.VIDEO_PATH)
+def main(video_path=None, roi_file=None, prefetch=0, tracker_type=None, profiler=NULL_PROFILER, config=Config,
+         annotated_output=None, render_every=1, render_scale=1.0, trail_length=None, live=None, zone=None):
+    video_path = video_path or config.VIDEO_PATH
+    cap = open_capture(video_path) # Arquivo, URL ou índice de câmera
     if not cap.isOpened():
-        print(f"Erro: Não foi possível abrir o vídeo em '{Config.VIDEO_PATH}'")
+        print(f"Erro: Não foi possível abrir o vídeo em '{video_path}'")
         return
 
     ret, first_frame_raw = cap.read()
@@ -27,10 +29,10 @@ def main():
         cap.release()
         return
     
-    first_frame = preprocess_frame(first_frame_raw)
+    first_frame = preprocess_frame(first_frame_raw, config)
 
     # 1. Gerenciamento da ROI
-    roi_manager = ROIHandler(first_frame)
+    roi_manager = ROIHandler(first_frame, config_file=roi_file, config=config, zone=zone)
     if not roi_manager.load_roi():
         print("Nenhuma ROI salva encontrada ou falha ao carregar. Iniciando seleção manual.")
         if not roi_manager.select_roi_interactively():
@@ -48,97 +50,168 @@ def main():
             roi_manager.save_roi()
 
     roi_points = roi_manager.get_points()
-    roi_mask = roi_manager.get_mask(first_frame.shape)
+    roi_crop = roi_manager.get_crop(first_frame.shape)
 
-    if roi_points is None or roi_mask is None:
+    if roi_points is None or roi_crop is None:
         print("Falha ao obter ROI. Encerrando.")
         cap.release()
         return
-    tracker_mgr = TrackerManager(tracker_type=Config.TRACKER_TYPE)
-    motion_detector = MotionDetector(min_contour_area=Config.MIN_MOTION_AREA)  # Inicializa o detector de movimento
-    is_tracking_active = False
-    total_initial_trackers = 0
+    # O pipeline recebe só o recorte da ROI; a exibição continua no frame inteiro
+    pipeline = TrackingPipeline.for_roi(roi_crop, tracker_type=tracker_type, show_debug=True,
+                                        profiler=profiler, config=config)
+
+    # Vídeo anotado opcional: desenhado e codificado numa thread separada
+    video_sink = None
+    if annotated_output:
+        frame_size = (first_frame.shape[1], first_frame.shape[0])
+        video_sink = AnnotatedVideoWriter(annotated_output, cap.get(cv2.CAP_PROP_FPS) or 30.0, frame_size,
+                                          render_every=render_every, scale=render_scale, roi_points=roi_points,
+                                          trail_length=trail_length, config=config).start()
+
+    # ROI e rótulos do HUD pré-desenhados; trajetórias numa camada que só recebe os segmentos novos
+    static_layer = viz.StaticOverlay(first_frame.shape, roi_points, config=config)
+    trajectory_layer = viz.TrajectoryOverlay(first_frame.shape, trail_length=trail_length, base=static_layer,
+                                             config=config)
 
-    # 2. Loop Principal (lógica de detecção e tracking agora está aqui dentro)
+    # 2. Loop Principal (lógica de detecção e tracking em TrackingPipeline)
     print("\n--- Iniciando processamento do vídeo ---")
     frame_count = 0
     output_window_name = "Rastreamento de Bolas"
     cv2.namedWindow(output_window_name, cv2.WINDOW_NORMAL)
 
-    # Reinicia o vídeo para começar do início
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-
-    while True:
-        ret, frame_raw = cap.read()
-        if not ret:
-            print("Fim do vídeo ou erro ao ler frame.")
-            break
-
-        current_frame = preprocess_frame(frame_raw)
-        frame_count += 1
+    # O primeiro frame (já lido para a ROI) entra no início do fluxo, sem voltar o vídeo com um seek
+    live_opts = live_options(cap, **live) if live is not None else None
+    frames, prefetcher = open_frame_stream(cap, prefetch=prefetch, profiler=profiler, config=config, live=live_opts)
+    frames = itertools.chain([first_frame], frames)
+    for frame_count, current_frame in enumerate(frames, start=1):
+        if live is not None:
+            frame_count = 1 + prefetcher.frame_number # Numeração da captura (com lacunas nos descartes)
         start_time = time.time()
         
-        display_frame = current_frame.copy()
-        viz.draw_roi_on_frame(display_frame, roi_points)
-        
-        successful_updates = 0
-
-        if not is_tracking_active:
-            # --- ESTADO: AGUARDANDO MOVIMENTO ---
-            
-            # Aplica a máscara da ROI para focar a detecção de movimento
-            frame_in_roi = cv2.bitwise_and(current_frame, current_frame, mask=roi_mask)
-            
-            if motion_detector.detect(frame_in_roi):
-                print(f"[Frame {frame_count}] Movimento detectado! Tentando encontrar bolas...")
-                
-                # Movimento detectado, agora rode a detecção de bolas
-                initial_balls, _ = detect_balls_hough(current_frame, roi_points, roi_mask)
-                
-                if initial_balls:
-                    print(f"Bolas encontradas! Inicializando {len(initial_balls)} tracker(s).")
-                    if tracker_mgr.initialize_trackers(current_frame, initial_balls):
-                        is_tracking_active = True # Muda para o estado de tracking
-                        total_initial_trackers = len(tracker_mgr.get_all_objects_info())
-                        
-                        # Desenha a detecção que iniciou o tracking
-                        viz.draw_detected_balls(display_frame, initial_balls)
-                    else:
-                        print("Falha ao inicializar trackers, continuará procurando movimento.")
-                else:
-                    print("Movimento detectado, mas nenhuma bola encontrada. Continuando...")
-        else:
-            # --- ESTADO: RASTREAMENTO ATIVO ---
-            
-            # Atualiza trackers
-            successful_updates = tracker_mgr.update_trackers(current_frame)
-            
-            # Obtém informações dos objetos rastreados (ativos e inativos)
-            all_tracked_objects = tracker_mgr.get_all_objects_info()
-            viz.draw_tracked_objects(display_frame, all_tracked_objects)
-
-            # Condição para resetar: se todos os trackers forem perdidos
-            if not tracker_mgr.get_tracked_objects_info():
-                print("Todos os trackers perderam o objeto. Voltando a aguardar por novo movimento.")
-                is_tracking_active = False # Volta para o estado de espera
-
-        # Calcula FPS
+        initial_balls, successful_updates = pipeline.process_frame(crop_to_rect(current_frame, roi_crop.rect), frame_count)
+
+        # Calcula FPS (apenas detecção e tracking)
         fps = 1.0 / (time.time() - start_time) if (time.time() - start_time) > 0 else 0
-        
-        # Desenha HUD
-        hud_status = "Rastreando" if is_tracking_active else "Aguardando Movimento"
-        viz.draw_hud(display_frame, fps, frame_count, successful_updates, total_initial_trackers, status=hud_status) # Adicione um status no HUD
-        
-        viz.resize_display_frame(display_frame, output_window_name)
-        cv2.imshow(output_window_name, display_frame)
+
+        if video_sink is not None:
+            video_sink.submit(frame_count, current_frame, snapshot_tracks(pipeline.tracker_mgr.get_all_objects_info()),
+                              initial_balls, (fps, successful_updates, pipeline.total_initial_trackers, pipeline.status))
+
+        with profiler.stage('render'):
+            display_frame = current_frame.copy()
+            tracked_objects = pipeline.tracker_mgr.get_all_objects_info() # Ativos e perdidos recuperáveis
+            trajectory_layer.update(tracked_objects)
+
+            if initial_balls:
+                # Desenha a detecção que iniciou o tracking
+                static_layer.composite(display_frame)
+                viz.draw_detected_balls(display_frame, initial_balls, config=config)
+            elif pipeline.is_tracking_active:
+                trajectory_layer.composite(display_frame) # ROI + HUD fixo + trajetórias
+                viz.draw_tracked_boxes(display_frame, tracked_objects, config=config)
+            else:
+                static_layer.composite(display_frame)
+
+            # Desenha a parte variável do HUD
+            viz.draw_hud_values(display_frame, fps, frame_count, successful_updates, pipeline.total_initial_trackers,
+                                status=pipeline.status, config=config)
+
+            viz.resize_display_frame(display_frame, output_window_name, config=config)
+            cv2.imshow(output_window_name, display_frame)
+        profiler.maybe_dump()
 
         if cv2.waitKey(1) & 0xFF == ord('q'):
             print("Loop interrompido pelo usuário.")
             break
-            
+    else:
+        print("Fim do vídeo ou erro ao ler frame.")
+
+    if prefetcher is not None:
+        prefetcher.stop()
+        if live is not None:
+            print_live_stats(prefetcher.stats())
+        else:
+            print_prefetch_stats(prefetcher.stats())
+    if video_sink is not None:
+        video = video_sink.close()
+        print(f"Vídeo anotado em '{video['path']}': {video['written']} frame(s) gravado(s), "
+              f"{video['dropped']} descartado(s).")
+    pipeline.close()
+    profiler.dump()
     print(f"Processamento concluído. Total de frames processados: {frame_count}")
     cap.release()
     cv2.destroyAllWindows()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Detecção e rastreamento de bolas em vídeo.")
+    parser.add_argument("--headless", action="store_true",
+                        help="Processa sem janelas nem desenho e grava os resultados em arquivo.")
+    parser.add_argument("--video", default=None, help="Caminho do vídeo de entrada (padrão: VIDEO_PATH do perfil).")
+    parser.add_argument("--roi", default=None, help="Arquivo JSON com os pontos da ROI (padrão: ROI_CONFIG_FILE do perfil).")
+    parser.add_argument("--zone", default=None,
+                        help="Zona do arquivo de ROI exibida/selecionada na janela (criada se não existir). "
+                             "No modo headless, todas as zonas do arquivo rodam em paralelo com uma decodificação.")
+    parser.add_argument("--output", default="tracking_results.csv",
+                        help="Arquivo de trajetórias (modo headless): .csv, .npz ou .parquet (requer pyarrow).")
+    parser.add_argument("--tracker", default=None, choices=["CSRT", "KCF", "MOSSE", "KALMAN"],
+                        help="Backend de tracking (KALMAN = associação de detecções, mais leve). "
+                             "Padrão: TRACKER_TYPE do perfil.")
+    parser.add_argument("--tracker-workers", type=int, default=None,
+                        help="Threads para atualizar os trackers OpenCV em paralelo (0 = núcleos da máquina). "
+                             "Padrão: TRACKER_UPDATE_WORKERS do perfil.")
+    parser.add_argument("--kinematics", default=None,
+                        help="Grava velocidade/aceleração média e densidade na ROI por janela de tempo "
+                             "neste CSV (modo headless).")
+    parser.add_argument("--frame-cache", default=None,
+                        help="Pasta do cache de frames pré-processados (modo headless): a primeira execução "
+                             "grava, as seguintes leem sem decodificar o vídeo.")
+    parser.add_argument("--prefetch", type=int, default=0,
+                        help="Tamanho da fila de frames decodificados numa thread separada (0 = desativado).")
+    parser.add_argument("--stats", default=None,
+                        help="Liga a medição por estágio e grava as estatísticas neste arquivo (.json ou .csv).")
+    parser.add_argument("--stats-interval", type=float, default=10.0,
+                        help="Intervalo (s) entre gravações do arquivo de estatísticas.")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Nível de log (DEBUG mostra cada detecção e contorno de movimento).")
+    parser.add_argument("--annotated-output", default=None,
+                        help="Grava um vídeo anotado (ex: revisao.mp4), desenhado numa thread separada.")
+    parser.add_argument("--render-every", type=int, default=1,
+                        help="No vídeo anotado, grava só 1 a cada N frames.")
+    parser.add_argument("--render-scale", type=float, default=1.0,
+                        help="Fator de escala do vídeo anotado (ex: 0.5).")
+    parser.add_argument("--live", action="store_true",
+                        help="Fonte ao vivo (--video pode ser índice de câmera, URL RTSP ou pipe): "
+                             "captura numa thread e descarta frames quando o tracking atrasa.")
+    parser.add_argument("--realtime", action="store_true",
+                        help="Reproduz um arquivo no ritmo do vídeo, como uma câmera (implica --live).")
+    parser.add_argument("--drop-policy", default=DROP_LATEST, choices=DROP_POLICIES,
+                        help="Descarte quando atrasado: latest = só o mais recente, "
+                             "every-k = 1 a cada --keep-every, none = sem descarte.")
+    parser.add_argument("--keep-every", type=int, default=2, help="k da política every-k.")
+    parser.add_argument("--trail-length", type=int, default=None,
+                        help="Limita as trajetórias desenhadas aos últimos N pontos (padrão: completas).")
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    logging.basicConfig(level=args.log_level, format=LOG_FORMAT)
+    config = profile_from_args(args)
+    if args.tracker_workers is not None:
+        config = config.replace(TRACKER_UPDATE_WORKERS=args.tracker_workers)
+    profiler = StageProfiler(args.stats, dump_interval_s=args.stats_interval) if args.stats else NULL_PROFILER
+    video_path = args.video or config.VIDEO_PATH
+    roi_file = args.roi or config.ROI_CONFIG_FILE
+    render_options = dict(annotated_output=args.annotated_output, render_every=args.render_every,
+                          render_scale=args.render_scale, trail_length=args.trail_length)
+    if args.live or args.realtime:
+        render_options['live'] = {'policy': args.drop_policy, 'keep_every': args.keep_every,
+                                  'realtime': args.realtime}
+    if args.headless:
+        frame_cache = FrameCache(args.frame_cache, config=config) if args.frame_cache else None
+        run_headless(video_path, roi_file, args.output, tracker_type=args.tracker, prefetch=args.prefetch,
+                     profiler=profiler, config=config, frame_cache=frame_cache,
+                     kinematics_output=args.kinematics, **render_options)
+    else:
+        main(video_path, roi_file, prefetch=args.prefetch, tracker_type=args.tracker, profiler=profiler, config=config,
+             zone=args.zone, **render_options)
\ No newline at end of file
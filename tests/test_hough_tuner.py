@@ -0,0 +1,37 @@
+# test_hough_tuner.py
+import json
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from ball_tracker_project.config import Config
+from ball_tracker_project.hough_tuner import default_grid_values, tune
+
+BALLS = [(50, 60, 17), (110, 60, 17)]
+
+def _write_video(path, n_frames=2, size=(160, 120)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 10.0, size)
+    if not writer.isOpened():
+        pytest.skip("Sem codec MJPG para gravar o vídeo de teste")
+    for _ in range(n_frames):
+        frame = np.full((size[1], size[0], 3), 40, dtype=np.uint8)
+        for cx, cy, r in BALLS:
+            cv2.circle(frame, (cx, cy), r, (230, 230, 230), -1)
+        writer.write(frame)
+    writer.release()
+
+def test_tune_without_grid_values_uses_default_grid(tmp_path):
+    video = tmp_path / "balls.avi"
+    _write_video(video)
+    annotations = tmp_path / "annotations.json"
+    annotations.write_text(json.dumps({"video": video.name, "frames": {"0": [list(b) for b in BALLS]}}))
+
+    config = Config.replace(ROTATE_VIDEO_CLOCKWISE=False)
+    best, results, _ = tune(str(annotations), workers=1, cache_path=None, config=config)
+
+    expected = 1
+    for values in default_grid_values(config).values():
+        expected *= len(set(values))
+    assert len(results) == expected
+    assert best['scores']['f1'] > 0
@@ -0,0 +1,67 @@
+# test_kinematics.py
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ball_tracker_project.kinematics import KinematicsAnalyzer
+
+FPS = 30.0
+V0 = np.array([60.0, -30.0])   # px/s
+ACCEL = np.array([90.0, -45.0]) # px/s²
+
+def _center(frame_index):
+    t = frame_index / FPS
+    return np.array([100.0, 200.0]) + V0 * t + 0.5 * ACCEL * t ** 2
+
+def _track(track_id, frame_index, offset=(0.0, 0.0)):
+    cx, cy = _center(frame_index) + offset
+    return {'id': track_id, 'active': True, 'bbox': (cx - 5.0, cy - 5.0, 10.0, 10.0)}
+
+def test_constant_acceleration_is_recovered():
+    analyzer = KinematicsAnalyzer(None, fps=FPS, window=9, polyorder=2, stats_window=1000)
+    for frame_index in range(1, 31):
+        analyzer.update(frame_index, [_track(0, frame_index)])
+
+    position, velocity, accel = analyzer.estimates[0]
+    t = 30 / FPS
+    assert position == pytest.approx(_center(30), abs=1e-6)
+    assert velocity == pytest.approx(V0 + ACCEL * t, abs=1e-6)
+    assert accel == pytest.approx(ACCEL, abs=1e-6)
+
+def test_tracks_shorter_than_the_window_have_no_estimate():
+    analyzer = KinematicsAnalyzer(None, fps=FPS, window=9, polyorder=2, stats_window=1000)
+    for frame_index in range(1, 21):
+        tracks = [_track(0, frame_index)]
+        if frame_index > 14:
+            tracks.append(_track(1, frame_index, offset=(50.0, 0.0))) # Só 6 pontos até o fim
+        analyzer.update(frame_index, tracks)
+        assert 1 not in analyzer.estimates
+        assert (0 in analyzer.estimates) == (frame_index >= 9)
+
+    stats = analyzer.flush()
+    assert stats['frames'] == 20
+    assert stats['samples'] == 12 # Frames 9..20 do track 0; o track 1 não entra nas médias
+    expected_speeds = [np.linalg.norm(V0 + ACCEL * (k / FPS)) for k in range(9, 21)]
+    assert stats['mean_speed'] == pytest.approx(np.mean(expected_speeds), rel=1e-6)
+    assert stats['mean_accel'] == pytest.approx(np.linalg.norm(ACCEL), rel=1e-6)
+
+def test_gap_restarts_the_window():
+    analyzer = KinematicsAnalyzer(None, fps=FPS, window=5, polyorder=2, stats_window=1000)
+    for frame_index in range(1, 8):
+        analyzer.update(frame_index, [_track(0, frame_index)])
+    assert 0 in analyzer.estimates
+
+    analyzer.update(8, []) # Track some por um frame
+    for frame_index in range(9, 13):
+        analyzer.update(frame_index, [_track(0, frame_index)])
+        assert 0 not in analyzer.estimates # Só 4 pontos desde a lacuna
+    analyzer.update(13, [_track(0, 13)])
+    assert analyzer.estimates[0][2] == pytest.approx(ACCEL, abs=1e-6)
+
+def test_without_fps_units_are_per_frame():
+    analyzer = KinematicsAnalyzer(None, window=9, polyorder=2, stats_window=1000)
+    for frame_index in range(1, 10):
+        analyzer.update(frame_index, [_track(0, frame_index)])
+    _, velocity, accel = analyzer.estimates[0]
+    assert velocity == pytest.approx((V0 + ACCEL * (9 / FPS)) / FPS, abs=1e-9)
+    assert accel == pytest.approx(ACCEL / FPS ** 2, abs=1e-9)
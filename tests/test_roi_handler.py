@@ -0,0 +1,52 @@
+# test_roi_handler.py
+import json
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from ball_tracker_project.roi_handler import ROIHandler, read_roi_zones
+
+def _reselect(handler, points):
+    """Equivale a select_roi_interactively concluída com `points`."""
+    handler.points = list(points)
+    handler.is_defined = True
+
+def test_reselect_and_save_keeps_other_zones(tmp_path):
+    roi_file = tmp_path / "roi.json"
+    roi_file.write_text(json.dumps({"canal_1": [[0, 0], [10, 0], [10, 10]],
+                                    "canal_2": [[20, 20], [30, 20], [30, 30]]}))
+    handler = ROIHandler(None, config_file=str(roi_file))
+    assert handler.load_roi(verbose=False)
+    assert handler.zone == "canal_1"
+    assert handler.points == [(0, 0), (10, 0), (10, 10)]
+
+    _reselect(handler, [(1, 1), (5, 1), (5, 5)])
+    handler.save_roi()
+
+    assert read_roi_zones(str(roi_file)) == {"canal_1": [(1, 1), (5, 1), (5, 5)],
+                                             "canal_2": [(20, 20), (30, 20), (30, 30)]}
+
+def test_save_without_load_updates_first_zone(tmp_path):
+    roi_file = tmp_path / "roi.json"
+    roi_file.write_text(json.dumps({"canal_1": [[0, 0], [10, 0], [10, 10]],
+                                    "canal_2": [[20, 20], [30, 20], [30, 30]]}))
+    handler = ROIHandler(None, config_file=str(roi_file))
+    _reselect(handler, [(1, 1), (5, 1), (5, 5)])
+    handler.save_roi()
+
+    zones = read_roi_zones(str(roi_file))
+    assert list(zones) == ["canal_1", "canal_2"]
+    assert zones["canal_1"] == [(1, 1), (5, 1), (5, 5)]
+
+def test_single_roi_file_keeps_legacy_format(tmp_path):
+    roi_file = tmp_path / "roi.json"
+    roi_file.write_text(json.dumps([[0, 0], [10, 0], [10, 10]]))
+    handler = ROIHandler(None, config_file=str(roi_file))
+    assert handler.load_roi(verbose=False)
+    assert handler.zone is None
+
+    _reselect(handler, [(1, 1), (5, 1), (5, 5)])
+    handler.save_roi()
+
+    assert json.loads(roi_file.read_text()) == [[1, 1], [5, 1], [5, 5]]
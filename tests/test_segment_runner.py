@@ -0,0 +1,74 @@
+# test_segment_runner.py
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from ball_tracker_project.segment_runner import count_unique_frames, match_tracks, plan_segments, stitch_segments
+from ball_tracker_project.track_store import STATUS_ACTIVE, TRACK_DTYPE
+
+def _rows(track_id, frames, fx, fy):
+    """Linhas ativas de um track com centro (fx(f), fy(f)) em cada frame f."""
+    frames = np.asarray(list(frames))
+    rows = np.zeros(len(frames), dtype=TRACK_DTYPE)
+    rows['frame'] = frames
+    rows['track_id'] = track_id
+    rows['center_x'] = [fx(f) for f in frames]
+    rows['center_y'] = [fy(f) for f in frames]
+    rows['status'] = STATUS_ACTIVE
+    return rows
+
+def _by_frame(rows):
+    return rows[np.argsort(rows['frame'], kind='stable')]
+
+def test_plan_segments_covers_video_with_overlap():
+    segments = plan_segments(1000, 4, 60)
+    assert segments == [(0, 250, 0), (190, 500, 250), (440, 750, 500), (690, None, 750)]
+
+def test_plan_segments_limits_short_videos():
+    # Trechos menores que 2x a sobreposição não compensam
+    assert plan_segments(100, 8, 30) == [(0, None, 0)]
+    assert len(plan_segments(100, 8, 20)) == 2
+
+def test_count_unique_frames_discounts_overlap():
+    segments = plan_segments(100, 2, 20) # [(0, 50, 0), (30, None, 50)]
+    assert count_unique_frames([50, 70], segments) == 100
+
+def test_track_crossing_boundary_keeps_one_global_id():
+    segments = plan_segments(100, 2, 20)
+    # Os frames do trecho [start, end) são numerados de start + 1 a end
+    seg0 = _rows(0, range(1, 51), lambda f: 10 + 2 * f, lambda f: 50)
+    seg1 = _rows(3, range(31, 101), lambda f: 10 + 2 * f, lambda f: 50)
+    stitched, n_stitched = stitch_segments([seg0, seg1], [b for _, _, b in segments],
+                                           max_distance=5, max_gap=10)
+    rows = np.concatenate(stitched)
+    assert n_stitched == 1
+    assert set(rows['track_id']) == {0}
+    assert list(_by_frame(rows)['frame']) == list(range(1, 101)) # Sobreposição sem duplicatas
+
+def test_two_balls_crossing_boundary_do_not_swap_ids():
+    segments = plan_segments(100, 2, 20)
+    boundaries = [b for _, _, b in segments]
+
+    def ball_a(frames, track_id):
+        return _rows(track_id, frames, lambda f: 10 + 2 * f, lambda f: 50)
+
+    def ball_b(frames, track_id):
+        return _rows(track_id, frames, lambda f: 200 - 2 * f, lambda f: 60)
+
+    # As bolas se cruzam perto da fronteira (frame ~48) e os IDs locais do trecho 1 vêm invertidos
+    seg0 = np.concatenate([ball_a(range(1, 51), 0), ball_b(range(1, 51), 1)])
+    seg1 = np.concatenate([ball_a(range(31, 101), 1), ball_b(range(31, 101), 0)])
+    stitched, n_stitched = stitch_segments([seg0, seg1], boundaries, max_distance=5, max_gap=10)
+    assert n_stitched == 2
+
+    rows = np.concatenate(stitched)
+    ids_a = set(rows[rows['center_y'] == 50]['track_id'])
+    ids_b = set(rows[rows['center_y'] == 60]['track_id'])
+    assert len(ids_a) == 1 and len(ids_b) == 1 and ids_a != ids_b
+
+def test_match_tracks_extrapolates_across_a_gap():
+    prev = _rows(7, range(40, 51), lambda f: 2.0 * f, lambda f: 30)
+    cur = _rows(0, range(54, 70), lambda f: 2.0 * f, lambda f: 30) # 3 frames sem detecção
+    assert match_tracks(prev, cur, max_distance=5, max_gap=10) == {0: 7}
+    assert match_tracks(prev, cur, max_distance=5, max_gap=2) == {} # Lacuna maior que STITCH_MAX_GAP_FRAMES
@@ -0,0 +1,89 @@
+# test_tracker_manager.py
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from ball_tracker_project.tracker_manager import create_tracker_manager
+
+class _FailingTracker:
+    """Tracker que perde o objeto no próximo update."""
+    def update(self, frame):
+        return False, None
+
+class _FixedTracker:
+    """Tracker que segue sempre a mesma bbox."""
+    def __init__(self, bbox):
+        self.bbox = bbox
+
+    def update(self, frame):
+        return True, self.bbox
+
+def _ball(cx, cy, r, ball_id=0):
+    return {'id': ball_id, 'center': (cx, cy), 'radius': r, 'bbox_initial': (cx - r, cy - r, 2 * r, 2 * r)}
+
+def _frame_with_ball(cx, cy, r):
+    frame = np.zeros((200, 200, 3), dtype=np.uint8)
+    cv2.circle(frame, (cx, cy), r, (255, 255, 255), -1)
+    return frame
+
+def test_factory_wires_detect_fn_into_windowed_recovery():
+    frame = _frame_with_ball(100, 100, 10)
+    calls = []
+
+    def detect_fn(frame, rect=None):
+        calls.append(rect)
+        return [_ball(100, 100, 10)]
+
+    manager = create_tracker_manager("CSRT", detect_fn=detect_fn, max_lost_frames=5, redetect_interval=1000)
+    assert manager.detect_fn is detect_fn
+    assert manager.add_detections(frame, [_ball(100, 100, 10)]) == 1
+
+    manager.trackers[0]['tracker_obj'] = _FailingTracker()
+    assert manager.update_trackers(frame, frame_index=1) == 1 # Recuperado no mesmo frame
+
+    # A recuperação passou por _recover_lost: Hough só na janela em torno da posição prevista
+    assert calls and calls[0] is not None
+    x, y, w, h = calls[0]
+    assert x <= 100 < x + w and y <= 100 < y + h
+    (track,) = manager.trackers
+    assert track['id'] == 0 and track['active'] and track['lost_frames'] == 0
+    assert manager.next_id == 1
+
+def test_recovery_ignores_detection_of_a_live_track():
+    frame = _frame_with_ball(140, 100, 10)
+    manager = create_tracker_manager("CSRT", detect_fn=lambda frame, rect=None: [_ball(140, 100, 10)],
+                                     max_lost_frames=5, redetect_interval=1000, redetect_margin=50)
+    assert manager.add_detections(frame, [_ball(140, 100, 10, 0), _ball(100, 100, 10, 1)]) == 2
+    live, lost = manager.trackers
+    live['tracker_obj'] = _FixedTracker((130, 90, 20, 20))
+    lost['tracker_obj'] = _FailingTracker()
+
+    manager.update_trackers(frame, frame_index=1)
+
+    # A única bola na janela do track perdido já é do track ativo: nada de ID duplicado
+    assert live['active'] and not lost['active']
+    assert lost['last_center'] == (100.0, 100.0)
+
+def test_two_lost_tracks_do_not_share_a_detection():
+    frame = _frame_with_ball(130, 100, 10)
+    manager = create_tracker_manager("CSRT", detect_fn=lambda frame, rect=None: [_ball(130, 100, 10)],
+                                     max_lost_frames=5, redetect_interval=1000, redetect_margin=50)
+    assert manager.add_detections(frame, [_ball(100, 100, 10, 0), _ball(160, 100, 10, 1)]) == 2
+    for track in manager.trackers:
+        track['tracker_obj'] = _FailingTracker()
+
+    assert manager.update_trackers(frame, frame_index=1) == 1
+    assert [t['id'] for t in manager.trackers if t['active']] == [0]
+
+def test_expired_tracks_are_dropped():
+    frame = _frame_with_ball(100, 100, 10)
+    manager = create_tracker_manager("CSRT", detect_fn=lambda frame, rect=None: [], max_lost_frames=2,
+                                     redetect_interval=1000)
+    manager.add_detections(frame, [_ball(100, 100, 10)])
+    manager.trackers[0]['tracker_obj'] = _FailingTracker()
+    for frame_index in range(1, 5):
+        manager.update_trackers(frame, frame_index=frame_index)
+    assert manager.trackers == []
+    assert manager.finished_tracks == 1
+    assert not manager.has_live_tracks()